@@ -0,0 +1,118 @@
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+# spaCy is imported only when a pipeline is actually loaded; importing it
+# costs close to a second and IoC/TTP-only runs never need it.
+if TYPE_CHECKING:
+    from spacy.language import Language
+    from spacy.tokens import Doc
+
+
+def required_components(nlp: 'Language', components: Iterable[str]) -> Set[str]:
+    """Expand the requested components with the shared layers they listen to."""
+    required = set(components)
+    for name, pipe in nlp.components:
+        listeners = getattr(pipe, 'listening_components', None) or []
+        if required.intersection(listeners):
+            required.add(name)
+    return required
+
+
+def select_components(nlp: 'Language', components: Iterable[str]) -> 'Language':
+    """Enable only the components the extractors read from the Doc; disable the rest."""
+    required = required_components(nlp, components)
+    for name in nlp.component_names:
+        if name in required:
+            nlp.enable_pipe(name)
+        else:
+            nlp.disable_pipe(name)
+    return nlp
+
+
+def load_pipeline(model: str, *stage_components: Iterable[str]) -> 'Language':
+    """Load a spaCy model with only the components needed by the given stages."""
+    import spacy
+    components = set()
+    for names in stage_components:
+        components.update(names)
+    return select_components(spacy.load(model), components)
+
+
+class LazyPipeline:
+    """Stand-in for a spaCy Language that loads the model on first use.
+
+    Calling it, nlp.pipe(...) or any other Language attribute triggers
+    load_pipeline() (or the given loader); until then neither spaCy nor the
+    model is imported.
+    """
+
+    def __init__(self, model: str, *stage_components: Iterable[str],
+                 loader: Optional[Callable[[], 'Language']] = None):
+        self.model = model
+        self.requested_components = sorted(set().union(*stage_components))
+        self.loader = loader
+        self._nlp = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._nlp is not None
+
+    def load(self) -> 'Language':
+        if self._nlp is None:
+            if self.loader is not None:
+                self._nlp = self.loader()
+            else:
+                self._nlp = load_pipeline(self.model, self.requested_components)
+        return self._nlp
+
+    def __call__(self, text: str) -> 'Doc':
+        return self.load()(text)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_nlp':
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+def lazy_pipeline(model: str, *stage_components: Iterable[str]) -> LazyPipeline:
+    """load_pipeline() deferred until an NLP-based stage first needs the model."""
+    return LazyPipeline(model, *stage_components)
+
+
+class AnalysisContext:
+    """Per-report state shared by every extractor: the text, its single parsed Doc
+    and the hits of each keyword automaton run over it."""
+
+    def __init__(self, nlp, text: str, doc: Optional['Doc'] = None):
+        self.nlp = nlp
+        self.text = text
+        self._doc = doc
+        self._keyword_matches: Dict[int, List] = {}
+
+    @property
+    def doc(self) -> 'Doc':
+        """Parse the report on first access and reuse the Doc afterwards."""
+        if self._doc is None:
+            self._doc = self.nlp(self.text)
+        return self._doc
+
+    def keyword_matches(self, matcher) -> List:
+        """Run a keyword_matcher.KeywordMatcher over the text once and reuse its hits."""
+        matches = self._keyword_matches.get(id(matcher))
+        if matches is None:
+            matches = self._keyword_matches[id(matcher)] = matcher.findall(self.text)
+        return matches
+
+
+class EntityHit(NamedTuple):
+    label: str  # spaCy/rule label; THREAT_ACTOR for actor-pattern hits, SECTOR for sector phrases
+    name: str
+    start: int
+    end: int
+
+
+class ReportHits(NamedTuple):
+    """Every positioned hit of the extraction stages in one text, before grouping and deduplication."""
+    iocs: List  # ioc_scanner.IocMatch
+    keywords: List  # keyword_matcher.KeywordMatch: tactic, technique and group hits
+    entities: List[EntityHit]  # actor-pattern hits and target entities
+    proposed: List[EntityHit]  # names the legacy malware heuristic proposed
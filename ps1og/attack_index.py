@@ -0,0 +1,280 @@
+"""Compact, memory-mapped index of MITRE ATT&CK techniques, tactics, groups and software.
+
+The STIX bundle is compiled offline into one binary file: a UTF-8 string table
+plus fixed-width uint32 record arrays. Loading maps the file and casts the
+arrays in place, so it takes milliseconds and every process reading the same
+file shares its pages.
+
+    python attack_index.py build enterprise-attack.json [-o attack_index.bin]
+    python attack_index.py stats [attack_index.bin]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+MAGIC = b'ATTKIDX1'
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STIX_PATH = os.path.join(_BASE_DIR, 'enterprise-attack.json')
+DEFAULT_INDEX_PATH = os.getenv('ATTACK_INDEX_PATH', os.path.join(_BASE_DIR, 'attack_index.bin'))
+
+# Section name -> columns per row (0 for flat arrays / the string blob)
+SECTIONS = {
+    'strings': 0,
+    'stroffs': 0,
+    'tactics': 3,     # external id, name, shortname
+    'techs': 5,       # external id, name, description, tactic start, tactic count
+    'techtact': 0,    # tactic row numbers referenced by techs
+    'groups': 4,      # external id, name, alias start, alias count
+    'software': 5,    # external id, name, alias start, alias count, kind
+    'aliases': 0,     # string ids referenced by groups and software
+}
+SOFTWARE_KINDS = ('malware', 'tool')
+
+
+class Tactic(NamedTuple):
+    id: str
+    name: str
+    shortname: str
+
+
+class Technique(NamedTuple):
+    id: str
+    name: str
+    description: str
+    tactics: Tuple[str, ...]
+
+
+class Group(NamedTuple):
+    id: str
+    name: str
+    aliases: Tuple[str, ...]
+
+
+class Software(NamedTuple):
+    id: str
+    name: str
+    aliases: Tuple[str, ...]
+    kind: str
+
+
+def _external_id(obj: dict) -> Optional[str]:
+    for ref in obj.get('external_references', []):
+        if ref.get('source_name') == 'mitre-attack':
+            return ref.get('external_id')
+    return None
+
+
+def _active(obj: dict) -> bool:
+    return not obj.get('revoked') and not obj.get('x_mitre_deprecated')
+
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.blob = bytearray()
+        self.offsets = array('I', [0])
+
+    def add(self, value: str) -> int:
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.offsets) - 1
+            self.blob += value.encode('utf-8')
+            self.offsets.append(len(self.blob))
+        return sid
+
+
+def compile_bundle(bundle: dict) -> Dict[str, bytes]:
+    """Turn a STIX 2.x bundle into the index sections."""
+    objects = [obj for obj in bundle.get('objects', []) if _active(obj)]
+    strings = _StringTable()
+    sections = {name: array('I') for name in SECTIONS if name not in ('strings', 'stroffs')}
+
+    tactic_rows = {}
+    for obj in objects:
+        if obj.get('type') == 'x-mitre-tactic' and _external_id(obj):
+            shortname = obj.get('x_mitre_shortname', '')
+            tactic_rows[shortname] = len(tactic_rows)
+            sections['tactics'].extend((strings.add(_external_id(obj)), strings.add(obj['name']),
+                                        strings.add(shortname)))
+
+    for obj in objects:
+        kind = obj.get('type')
+        external_id = _external_id(obj)
+        if external_id is None:
+            continue
+        if kind == 'attack-pattern':
+            phases = [tactic_rows[phase['phase_name']] for phase in obj.get('kill_chain_phases', [])
+                      if phase.get('kill_chain_name') == 'mitre-attack' and phase['phase_name'] in tactic_rows]
+            sections['techs'].extend((strings.add(external_id), strings.add(obj['name']),
+                                      strings.add(obj.get('description', '')),
+                                      len(sections['techtact']), len(phases)))
+            sections['techtact'].extend(phases)
+        elif kind == 'intrusion-set':
+            aliases = [alias for alias in obj.get('aliases', []) if alias != obj['name']]
+            sections['groups'].extend((strings.add(external_id), strings.add(obj['name']),
+                                       len(sections['aliases']), len(aliases)))
+            sections['aliases'].extend(strings.add(alias) for alias in aliases)
+        elif kind in SOFTWARE_KINDS:
+            aliases = [alias for alias in obj.get('x_mitre_aliases', []) if alias != obj['name']]
+            sections['software'].extend((strings.add(external_id), strings.add(obj['name']),
+                                         len(sections['aliases']), len(aliases), SOFTWARE_KINDS.index(kind)))
+            sections['aliases'].extend(strings.add(alias) for alias in aliases)
+
+    compiled = {'strings': bytes(strings.blob), 'stroffs': strings.offsets}
+    compiled.update(sections)
+    for name, values in compiled.items():
+        if isinstance(values, array):
+            if sys.byteorder == 'big':
+                values.byteswap()
+            compiled[name] = values.tobytes()
+    return compiled
+
+
+def write_index(sections: Dict[str, bytes], out_path: str):
+    """Write sections as: magic, count, (name, offset, length)*, 8-byte aligned payloads."""
+    header_size = len(MAGIC) + 4 + len(sections) * 24
+    offset = header_size
+    entries = []
+    for name, payload in sections.items():
+        offset = (offset + 7) & ~7
+        entries.append((name, offset, len(payload)))
+        offset += len(payload)
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(MAGIC + struct.pack('<I', len(entries)))
+        for name, start, length in entries:
+            file.write(struct.pack('<8sQQ', name.encode(), start, length))
+        for (name, start, _), payload in zip(entries, sections.values()):
+            file.write(b'\0' * (start - file.tell()))
+            file.write(payload)
+    os.replace(tmp_path, out_path)
+
+
+def build(stix_path: str = DEFAULT_STIX_PATH, out_path: str = DEFAULT_INDEX_PATH) -> str:
+    """Compile a local enterprise-attack.json into the binary index."""
+    with open(stix_path, 'r', encoding='utf-8') as file:
+        bundle = json.load(file)
+    write_index(compile_bundle(bundle), out_path)
+    return out_path
+
+
+class AttackIndex:
+    """Read-only view over a memory-mapped index file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not an ATT&CK index file")
+        (count,) = struct.unpack_from('<I', view, len(MAGIC))
+        self._sections = {}
+        for i in range(count):
+            name, start, length = struct.unpack_from('<8sQQ', view, len(MAGIC) + 4 + i * 24)
+            section = view[start:start + length]
+            name = name.rstrip(b'\0').decode()
+            if name != 'strings':
+                section = section.cast('I')
+                if sys.byteorder == 'big':
+                    swapped = array('I', section.tobytes())
+                    swapped.byteswap()
+                    section = memoryview(swapped)
+            self._sections[name] = section
+        self._strings = self._sections['strings']
+        self._offsets = self._sections['stroffs']
+
+    def string(self, sid: int) -> str:
+        return str(self._strings[self._offsets[sid]:self._offsets[sid + 1]], 'utf-8')
+
+    def _rows(self, name: str) -> Iterator[List[int]]:
+        section = self._sections[name]
+        width = SECTIONS[name]
+        for start in range(0, len(section), width):
+            yield section[start:start + width].tolist()
+
+    def _strings_at(self, section: str, start: int, count: int) -> Tuple[str, ...]:
+        return tuple(self.string(sid) for sid in self._sections[section][start:start + count])
+
+    def tactics(self) -> List[Tactic]:
+        return [Tactic(*(self.string(sid) for sid in row)) for row in self._rows('tactics')]
+
+    def techniques(self) -> Iterator[Technique]:
+        tactic_ids = [tactic.id for tactic in self.tactics()]
+        techtact = self._sections['techtact']
+        for ext_id, name, description, start, count in self._rows('techs'):
+            yield Technique(self.string(ext_id), self.string(name), self.string(description),
+                            tuple(tactic_ids[row] for row in techtact[start:start + count]))
+
+    def groups(self) -> Iterator[Group]:
+        for ext_id, name, start, count in self._rows('groups'):
+            yield Group(self.string(ext_id), self.string(name), self._strings_at('aliases', start, count))
+
+    def software(self) -> Iterator[Software]:
+        for ext_id, name, start, count, kind in self._rows('software'):
+            yield Software(self.string(ext_id), self.string(name), self._strings_at('aliases', start, count),
+                           SOFTWARE_KINDS[kind])
+
+    def fingerprint(self) -> str:
+        """Content hash of the index file, e.g. for result cache keys."""
+        return hashlib.sha256(self._mmap).hexdigest()[:16]
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(self._sections[name]) // SECTIONS[name]
+                for name in ('tactics', 'techs', 'groups', 'software')}
+
+
+_loaded: Dict[str, AttackIndex] = {}
+
+
+def load_index(path: str = DEFAULT_INDEX_PATH) -> AttackIndex:
+    """Map the index once per process; build it first from the local STIX JSON if missing."""
+    index = _loaded.get(path)
+    if index is None:
+        if not os.path.exists(path):
+            if not os.path.exists(DEFAULT_STIX_PATH):
+                raise FileNotFoundError(
+                    f"{path} not found; run: python attack_index.py build enterprise-attack.json")
+            build(DEFAULT_STIX_PATH, path)
+        index = _loaded[path] = AttackIndex(path)
+    return index
+
+
+def try_load_index(path: str = DEFAULT_INDEX_PATH) -> Optional[AttackIndex]:
+    """load_index(), or None when neither the index nor the STIX JSON is available."""
+    try:
+        return load_index(path)
+    except FileNotFoundError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help='compile a STIX bundle into the binary index')
+    build_cmd.add_argument('stix_path', nargs='?', default=DEFAULT_STIX_PATH)
+    build_cmd.add_argument('-o', '--output', default=DEFAULT_INDEX_PATH)
+    stats_cmd = commands.add_parser('stats', help='print record counts and load time')
+    stats_cmd.add_argument('index_path', nargs='?', default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        path = build(args.stix_path, args.output)
+        print(f'wrote {path} ({os.path.getsize(path) / 1024:.0f} KB)')
+    else:
+        start = time.perf_counter()
+        index = AttackIndex(args.index_path)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'loaded {args.index_path} in {elapsed:.2f} ms: {index.counts()}')
+
+
+if __name__ == '__main__':
+    main()
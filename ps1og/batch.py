@@ -0,0 +1,50 @@
+import multiprocessing
+from collections import deque
+from itertools import islice
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+import prefork
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Yield lists of up to batch_size items without materialising the input."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def map_batches(func: Callable[[List], List], items: Iterable, batch_size: int = 32, n_process: int = 1,
+                initializer: Optional[Callable] = None, initargs: tuple = (),
+                max_pending: Optional[int] = None, mp_context: Optional[BaseContext] = None) -> Iterator[Any]:
+    """Apply func to batches of items, across worker processes, yielding results in input order.
+
+    At most max_pending batches (default: two per worker) are in flight at once,
+    so memory stays bounded no matter how long the input iterable is.
+    func must be a module-level function when n_process > 1. mp_context picks
+    the start method (prefork.worker_setup() returns a fork context).
+    """
+    if n_process == 1:
+        for batch in iter_batches(items, batch_size):
+            yield from func(batch)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * n_process
+    pool = (mp_context or multiprocessing).Pool(n_process, initializer=initializer, initargs=initargs)
+    prefork.unfreeze()
+    pending = deque()
+    try:
+        for batch in iter_batches(items, batch_size):
+            pending.append(pool.apply_async(func, (batch,)))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
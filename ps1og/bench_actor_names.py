@@ -0,0 +1,70 @@
+"""ATT&CK group names found in prose by the keyword automaton and the rule engine, with regression checks.
+
+Matches a few short texts against a small index of real ATT&CK groups,
+including groups named with ordinary words (Silence, Inception, Equation)
+and aliases that only count with ATT&CK's casing (HOLMIUM, Sofacy). Prints
+the groups each path finds and exits non-zero when a text gets other groups
+than expected.
+
+    python bench_actor_names.py
+"""
+import argparse
+
+from attack_index import Group
+from entity_rules import rule_pipeline
+from keyword_matcher import attack_matcher
+
+GROUPS = [
+    Group('G0064', 'APT33', ('HOLMIUM', 'Elfin', 'Peach Sandstorm')),
+    Group('G0007', 'APT28', ('Sofacy', 'Fancy Bear', 'Threat Group-4127')),
+    Group('G0091', 'Silence', ('Whisper Spider',)),
+    Group('G0100', 'Inception', ('Inception Framework', 'Cloud Atlas')),
+    Group('G0020', 'Equation', ()),
+]
+
+# (text, groups expected)
+CASES = [
+    ('After a long silence, the inception of the campaign followed a simple equation.', []),
+    ('Silence returned. Inception of the holmium mining project was announced.', []),
+    ('The sofacy question is unrelated to elfin folklore.', []),
+    ('HOLMIUM, also known as APT33, sent lures to energy firms.', ['APT33']),
+    ('Sofacy reused infrastructure; Threat Group 4127 was blamed as well.', ['APT28']),
+    ('Whisper Spider targeted banks, and Cloud Atlas went after embassies.', ['Silence', 'Inception']),
+]
+
+
+class Gazetteer:
+    """The minimal index interface the matchers read: tactics(), techniques() and groups()."""
+
+    def tactics(self):
+        return iter(())
+
+    def techniques(self):
+        return iter(())
+
+    def groups(self):
+        return iter(GROUPS)
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    index = Gazetteer()
+    matcher = attack_matcher(index)
+    nlp = rule_pipeline(index)
+    failures = []
+    print(f'{"automaton":<24}{"rules":<24}text')
+    for text, expected in CASES:
+        found = {
+            'automaton': sorted({match.payload[2] for match in matcher.finditer(text) if match.payload[0] == 'group'}),
+            'rules': sorted({ent.ent_id_ for ent in nlp(text).ents if ent.label_ == 'THREAT_ACTOR' and ent.ent_id_}),
+        }
+        print(f'{", ".join(found["automaton"]) or "-":<24}{", ".join(found["rules"]) or "-":<24}{text[:40]}')
+        for path, groups in found.items():
+            if groups != sorted(expected):
+                failures.append(f'{path}: {text!r}: found {groups}, expected {expected}')
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
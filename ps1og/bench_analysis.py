@@ -0,0 +1,63 @@
+"""Per-report NLP latency: one parse per extractor vs. one shared, trimmed Doc.
+
+    python bench_analysis.py
+    python bench_analysis.py --reports 50 --size-kb 20
+"""
+import argparse
+import time
+
+import spacy
+
+from analysis import AnalysisContext, select_components
+from bench_corpus import synthetic_report
+
+MODEL = "en_core_web_sm"
+
+
+def per_extractor(nlp, text, parses):
+    """What process_report used to do: every extractor parses the report itself."""
+    for _ in range(parses):
+        doc = nlp(text)
+        [ent.text for ent in doc.ents]
+
+
+def shared(nlp, text, parses):
+    """Parse once through the analysis context and hand the Doc to each extractor."""
+    context = AnalysisContext(nlp, text)
+    for _ in range(parses):
+        [ent.text for ent in context.doc.ents]
+
+
+def run(label, func, nlp, reports, parses):
+    start = time.perf_counter()
+    for text in reports:
+        func(nlp, text, parses)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<44}{elapsed / len(reports) * 1000:>10.1f} ms/report')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=20)
+    parser.add_argument('--size-kb', type=int, default=10)
+    args = parser.parse_args()
+
+    reports = [synthetic_report(args.size_kb * 1024, seed=i) for i in range(args.reports)]
+    full = spacy.load(MODEL)
+    print(f'pipeline: {", ".join(full.pipe_names)}')
+
+    # cltest3.process_report parsed three times, dsr1test2 twice
+    baseline = run('cltest3 before (3 parses, full pipeline)', per_extractor, full, reports, 3)
+    run('dsr1test2 before (2 parses, full pipeline)', per_extractor, full, reports, 2)
+
+    ner_only = select_components(spacy.load(MODEL), {'ner'})
+    after = run(f'cltest3 after ({", ".join(ner_only.pipe_names)})', shared, ner_only, reports, 3)
+    ner_parser = select_components(spacy.load(MODEL), {'ner', 'parser'})
+    run(f'dsr1test2 after ({", ".join(ner_parser.pipe_names)})', shared, ner_parser, reports, 2)
+
+    print(f'cltest3 speedup: {baseline / after:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
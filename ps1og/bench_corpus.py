@@ -0,0 +1,70 @@
+import random
+from typing import Dict, Optional, Tuple
+
+SAMPLE_REPORT = '''
+The APT33 group, suspected to be from Iran, has launched a new campaign targeting
+the energy sector organizations.
+The attack utilizes Shamoon malware, known for its destructive capabilities. The threat
+actor exploited a vulnerability in the network perimeter to gain initial access.
+The malware was delivered via spear-phishing emails containing a malicious
+attachment. The malware's behavior was observed communicating with IP address
+192.168.1.1 and domain example.com. The attack also involved lateral movement using
+PowerShell scripts.
+'''
+
+FILLER = (
+    'Analysts observed repeated beaconing over several weeks before the payload was staged. '
+    'Persistence was established through scheduled tasks and registry run keys. '
+)
+
+# What SAMPLE_REPORT states, in the truth layout of labeled_report()
+SAMPLE_TRUTH = {
+    'iocs': {'ip': ['192.168.1.1'], 'domain': ['example.com']},
+    'ttps': ['TA0001', 'TA0008', 'T1566.001', 'T1059.001'],
+    'actors': ['APT33'],
+    'malware': ['Shamoon'],
+    'targets': ['Energy Sector'],
+}
+
+
+def _random_ioc(rng: random.Random) -> Tuple[Optional[str], str]:
+    """(IoC type, text); the type is None for the version-number decoy."""
+    kind = rng.randrange(5)
+    if kind == 0:
+        return 'ip', '.'.join(str(rng.randrange(256)) for _ in range(4))
+    if kind == 1:
+        return 'domain', f'{rng.choice(["update", "cdn", "mail", "login"])}-{rng.randrange(10**4)}.{rng.choice(["com", "net", "ru", "info"])}'
+    if kind == 2:
+        return 'hash', ''.join(rng.choice('0123456789abcdef') for _ in range(rng.choice((32, 40, 64))))
+    if kind == 3:
+        return 'email', f'ops{rng.randrange(10**4)}@mail-{rng.randrange(100)}.org'
+    return None, 'version 1.2.3.4'
+
+
+def labeled_report(size_bytes: int, seed: int = 0) -> Tuple[str, Dict]:
+    """synthetic_report() and its truth: the IoCs, TTP codes, actors, malware and targets it contains."""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    iocs = {'ip': [], 'domain': [], 'hash': [], 'email': []}
+    sample = False
+    while total < size_bytes:
+        prose = rng.choice((SAMPLE_REPORT, FILLER))
+        kind, value = _random_ioc(rng)
+        chunk = prose + ' Indicator: ' + value + '.\n'
+        parts.append(chunk)
+        total += len(chunk)
+        sample |= prose is SAMPLE_REPORT
+        if kind:
+            iocs[kind].append(value)
+    truth = {field: list(SAMPLE_TRUTH[field]) if sample else [] for field in ('ttps', 'actors', 'malware', 'targets')}
+    truth['iocs'] = iocs
+    if sample:
+        for kind, values in SAMPLE_TRUTH['iocs'].items():
+            iocs[kind].extend(values)
+    return ''.join(parts), truth
+
+
+def synthetic_report(size_bytes: int, seed: int = 0) -> str:
+    """Build a report of roughly size_bytes mixing prose with random IoCs."""
+    return labeled_report(size_bytes, seed)[0]
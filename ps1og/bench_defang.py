@@ -0,0 +1,122 @@
+"""Overhead of recognizing defanged IoCs in the single scan.
+
+Builds a synthetic corpus and a defanged copy of it. In the copy every IoC
+found in the plain text is rewritten the way vendor reports write it
+(example[.]com, 10.0.0(.)1, ops[at]mail-3{.}org), cycling through the
+styles. Three scanners run on both corpora:
+
+- plain-only: the IoC pattern before defanged separators were added
+- refang, then scan: one substitution over the whole text, then the scan.
+  Its offsets point into the rewritten text, not the original.
+- ioc_scanner: the current single pass
+
+The defanged corpus must yield the same values as the plain one.
+
+    python bench_defang.py
+    python bench_defang.py --size-mb 16
+"""
+import argparse
+import itertools
+import re
+import time
+
+import ioc_scanner
+from bench_corpus import synthetic_report
+
+PLAIN_PATTERN = re.compile(r'''
+    (?<![\w.%+-])
+    (?:
+          (?P<email>[A-Za-z0-9._%+-]+@(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}\b)
+        | (?P<ip>(?:\d{1,3}\.){3}\d{1,3}(?!\.?\w))
+        | (?P<hash>[A-Fa-f0-9]{32,}\b)
+        | (?P<domain>(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}\b)
+    )
+''', re.VERBOSE)
+
+DOT_STYLES = ('[.]', '(.)', '{.}', '[dot]', '(DOT)')
+AT_STYLES = ('[@]', '[at]', '(at)')
+
+
+def plain_only(text):
+    """scan_iocs as it was before defanged separators were recognized."""
+    found = []
+    for match in PLAIN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'ip' and not ioc_scanner._valid_ip(value):
+            continue
+        if kind == 'hash' and len(value) not in ioc_scanner.HASH_LENGTHS:
+            continue
+        found.append(ioc_scanner.IocMatch(kind, value, match.start(), match.end()))
+    return found
+
+
+def refang_then_scan(text):
+    return list(ioc_scanner.scan_iocs(ioc_scanner.refang(text)))
+
+
+def single_pass(text):
+    return list(ioc_scanner.scan_iocs(text))
+
+
+CANDIDATES = {
+    'plain-only': plain_only,
+    'refang, then scan': refang_then_scan,
+    'ioc_scanner': single_pass,
+}
+
+
+def defang(text):
+    """text with every IoC's separators defanged, cycling through the styles."""
+    dots = itertools.cycle(DOT_STYLES)
+    ats = itertools.cycle(AT_STYLES)
+    parts = []
+    last = 0
+    for match in ioc_scanner.scan_iocs(text):
+        value = text[match.start:match.end]
+        if match.type != 'hash':
+            dot = next(dots)
+            value = value.replace('@', next(ats)).replace('.', dot)
+        parts.append(text[last:match.start])
+        parts.append(value)
+        last = match.end
+    parts.append(text[last:])
+    return ''.join(parts)
+
+
+def measure(func, text, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=4.0, help='size of the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per candidate; the best is reported')
+    args = parser.parse_args()
+
+    plain = synthetic_report(int(args.size_mb * 1024 * 1024))
+    corpora = {'plain': plain, 'defanged': defang(plain)}
+
+    expected = [(match.type, match.value) for match in single_pass(plain)]
+    found = single_pass(corpora['defanged'])
+    if [(match.type, match.value) for match in found] != expected:
+        raise SystemExit('the defanged corpus yields different IoCs')
+    defanged = sum(1 for match in found if match.end - match.start != len(match.value))
+    print(f'corpus: {len(plain) / (1024 * 1024):.2f} MB, {len(expected)} IoCs, {defanged} of them defanged in the copy')
+
+    print(f'{"candidate":<20}{"corpus":<10}{"seconds":>9}{"MB/s":>8}{"matches":>9}')
+    for name, func in CANDIDATES.items():
+        for label, text in corpora.items():
+            elapsed, result = measure(func, text, args.repeat)
+            size_mb = len(text) / (1024 * 1024)
+            print(f'{name:<20}{label:<10}{elapsed:>9.3f}{size_mb / elapsed:>8.1f}{len(result):>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Accuracy and throughput of the rule-based entity engine vs. the statistical spaCy model.
+
+Runs dsr1test2's extract_threat_actors and extract_targets over a labeled
+corpus (JSON lines: text, gold actors, gold targets) with Docs from each
+engine. It reports micro precision/recall/F1 and parse throughput, so each
+deployment can pick its speed/quality trade-off.
+
+Gold targets name industries plainly ("Energy"). The rule engine says
+"Energy Sector" and the statistical path the word the parser attaches
+"sector" to, so both sides are normalized (casefolded, a trailing "sector"
+or "industry" dropped) before they are compared.
+
+    python bench_entity_rules.py
+    python bench_entity_rules.py --corpus my_labeled.jsonl --repeat 50
+"""
+import argparse
+import json
+import time
+
+import attack_index
+import dsr1test2
+from analysis import load_pipeline
+from entity_rules import rule_pipeline
+
+DEFAULT_CORPUS = 'entity_corpus.jsonl'
+MODEL = 'en_core_web_sm'
+INDUSTRY_SUFFIXES = (' sector', ' industry')
+
+
+def load_corpus(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def normalize(name):
+    """Casefolded name without a trailing industry word: "Energy Sector" -> "energy"."""
+    name = name.casefold().strip()
+    for suffix in INDUSTRY_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def score(predicted, gold):
+    """(true positives, false positives, false negatives) of the normalized names."""
+    predicted = {normalize(name) for name in predicted}
+    gold = {normalize(name) for name in gold}
+    return len(predicted & gold), len(predicted - gold), len(gold - predicted)
+
+
+def prf(counts):
+    tp, fp, fn = counts
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def evaluate(nlp, corpus, repeat):
+    texts = [example['text'] for example in corpus]
+    list(nlp.pipe(texts[:1]))  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        docs = list(nlp.pipe(texts))
+    elapsed = time.perf_counter() - start
+
+    totals = {'actors': [0, 0, 0], 'targets': [0, 0, 0]}
+    for example, doc in zip(corpus, docs):
+        predictions = {'actors': dsr1test2.extract_threat_actors(example['text'], doc),
+                       'targets': dsr1test2.extract_targets(example['text'], doc)}
+        for field, predicted in predictions.items():
+            for i, value in enumerate(score(predicted, example[field])):
+                totals[field][i] += value
+    size = sum(len(text) for text in texts) * repeat
+    return {'docs_per_second': len(texts) * repeat / elapsed, 'kb_per_second': size / 1024 / elapsed,
+            **{field: prf(counts) for field, counts in totals.items()}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--repeat', type=int, default=20, help='passes over the corpus for throughput')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    index = attack_index.try_load_index()
+    engines = {'rules': lambda: rule_pipeline(index),
+               MODEL: lambda: load_pipeline(MODEL, *dsr1test2.NLP_COMPONENTS.values())}
+
+    print(f'corpus: {len(corpus)} labeled reports; ATT&CK index {"loaded" if index else "not built"}')
+    print(f'{"engine":<16}{"docs/s":>9}{"KB/s":>9}  {"actors P/R/F1":<20}{"targets P/R/F1":<20}')
+    for name, load in engines.items():
+        try:
+            nlp = load()
+        except OSError as e:
+            print(f'{name:<16}unavailable ({e.__class__.__name__}: install with python -m spacy download {MODEL})')
+            continue
+        result = evaluate(nlp, corpus, args.repeat)
+        columns = ['/'.join(f'{value:.2f}' for value in result[field]) for field in ('actors', 'targets')]
+        print(f'{name:<16}{result["docs_per_second"]:>9.0f}{result["kb_per_second"]:>9.0f}  '
+              f'{columns[0]:<20}{columns[1]:<20}')
+
+
+if __name__ == '__main__':
+    main()
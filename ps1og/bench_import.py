@@ -0,0 +1,75 @@
+"""Startup latency guard: import time of the extractor modules and of an IoC/TTP-only CLI run.
+
+Each measurement runs in a fresh interpreter (best of --repeat). Exits non-zero
+when a measurement exceeds --max-ms or when a heavy dependency that should be
+lazy (spaCy, requests, PyPDF2) is imported.
+
+    python bench_import.py
+    python bench_import.py --max-ms 300 --repeat 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_corpus import SAMPLE_REPORT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAZY_MODULES = ('spacy', 'requests', 'PyPDF2')
+
+# Imports the module, then reports which lazy modules got pulled in
+PROBE = ("import sys, json, {module}; "
+         "print(json.dumps([name for name in {lazy!r} if name in sys.modules]))")
+
+
+def timed_run(argv, repeat):
+    best = None
+    output = ''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(argv, cwd=HERE, capture_output=True, text=True, check=True).stdout
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modules', default='cltest3,dsr1test2,dstest1', help='modules to import')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-ms', type=float, default=500, help='fail above this wall time')
+    args = parser.parse_args()
+
+    failures = []
+    baseline, _ = timed_run([sys.executable, '-c', 'pass'], args.repeat)
+    print(f'{"run":<28}{"ms":>8}  heavy modules loaded')
+    print(f'{"python -c pass":<28}{baseline:>8.0f}')
+    for module in args.modules.split(','):
+        ms, output = timed_run([sys.executable, '-c', PROBE.format(module=module, lazy=LAZY_MODULES)], args.repeat)
+        loaded = json.loads(output)
+        print(f'{"import " + module:<28}{ms:>8.0f}  {", ".join(loaded) or "-"}')
+        if loaded:
+            failures.append(f'import {module} loaded {", ".join(loaded)}')
+        if ms > args.max_ms:
+            failures.append(f'import {module} took {ms:.0f} ms')
+
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as report:
+        report.write(SAMPLE_REPORT)
+    try:
+        ms, _ = timed_run([sys.executable, 'cltest3.py', '--only', 'iocs,ttps', report.name], args.repeat)
+    finally:
+        os.unlink(report.name)
+    print(f'{"cltest3.py --only iocs,ttps":<28}{ms:>8.0f}')
+    if ms > args.max_ms:
+        failures.append(f'cltest3.py --only iocs,ttps took {ms:.0f} ms')
+
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Cost of updating a growing report: rerunning the extractor on the whole text vs. incremental.py.
+
+Builds a synthetic report, feeds it paragraph by paragraph and times each
+update both ways (result cache and VirusTotal off). The final results are
+compared too; they must match for the regex and keyword stages.
+
+    python bench_incremental.py
+    python bench_incremental.py --size-kb 500 --only iocs,ttps,actors,targets --ner rules
+"""
+import argparse
+import os
+import time
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='')
+
+from bench_corpus import synthetic_report  # noqa: E402
+from cltest3 import ThreatIntelExtractor, parse_stages  # noqa: E402
+from incremental import IncrementalReport  # noqa: E402
+
+EXACT_KEYS = ('IoCs', 'TTPs', 'Threat Actor(s)')
+
+
+def paragraphs(text: str, size: int):
+    """Line-aligned pieces of about size characters."""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start + size)
+        end = len(text) if end < 0 else end + 1
+        yield text[start:end]
+        start = end
+
+
+def normalized(results):
+    return {key: sorted(map(str, value)) if isinstance(value, list) else
+            {label: sorted(map(str, items)) for label, items in value.items()}
+            for key, value in results.items() if key in EXACT_KEYS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=200, help='final report size')
+    parser.add_argument('--update-kb', type=float, default=2, help='text appended per update')
+    parser.add_argument('--only', type=parse_stages, default=['iocs', 'ttps', 'actors', 'malware'])
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='model')
+    args = parser.parse_args()
+
+    extractor = ThreatIntelExtractor(args.only, args.ner)
+    pieces = list(paragraphs(synthetic_report(args.size_kb * 1024), int(args.update_kb * 1024)))
+    report = IncrementalReport(extractor)
+    text = ''
+    full_times, incremental_times = [], []
+    for piece in pieces:
+        text += piece
+        start = time.perf_counter()
+        full = extractor.process_report(text)
+        full_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        incremental = report.append(piece)
+        incremental_times.append(time.perf_counter() - start)
+
+    print(f'{len(pieces)} updates of ~{args.update_kb:g} KB up to {len(text) / 1024:.0f} KB '
+          f'({", ".join(extractor.stages)}; {len(report.chunks)} settled chunks)')
+    print(f'{"":<14}{"first ms":>10}{"last ms":>10}{"total s":>10}')
+    for label, times in (('rerun whole', full_times), ('incremental', incremental_times)):
+        print(f'{label:<14}{times[0] * 1000:>10.2f}{times[-1] * 1000:>10.2f}{sum(times):>10.2f}')
+    print(f'speedup over the run: {sum(full_times) / sum(incremental_times):.1f}x')
+    if normalized(full) != normalized(incremental):
+        raise SystemExit('incremental results differ from a full run')
+    print('final IoCs, TTPs and actors match a full run')
+
+
+if __name__ == '__main__':
+    main()
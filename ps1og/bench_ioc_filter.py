@@ -0,0 +1,95 @@
+"""Cost of validating IoC candidates: per-match Python checks vs. ioc_filter's NumPy batches.
+
+Scans --reports synthetic reports once, then validates every candidate two
+ways. The first is a straightforward per-match implementation (ipaddress,
+str methods, a set of TLDs). The second is ioc_filter.check(), fed batches of
+--batch-size reports' candidates. Both must agree on every flag and
+canonical value. The scan itself is timed as a reference for the hot path.
+
+    python bench_ioc_filter.py
+    python bench_ioc_filter.py --reports 2000 --batch-size 32
+"""
+import argparse
+import ipaddress
+import time
+
+import ioc_filter
+import ioc_scanner
+from bench_corpus import synthetic_report
+from ioc_filter import (CONTEXT_CHARS, DEFANGED, INVALID, PRIVATE, REFANG, RESERVED, RESERVED_NETWORKS,
+                        UNKNOWN_TLD, VERSION, VERSION_WORDS)
+
+TLD_SET = set(ioc_filter.TLDS.tolist())
+RESERVED_SET = [ipaddress.ip_network(f'{address}/{bits}') for address, bits in RESERVED_NETWORKS]
+PRIVATE_SET = [ipaddress.ip_network(f'{address}/{bits}') for address, bits in ioc_filter.PRIVATE_NETWORKS]
+
+
+def python_check(kind: str, value: str, context: str):
+    """One candidate at a time; the reference for ioc_filter.check()."""
+    flags = 0
+    canonical = value.lower()
+    for defanged, plain in REFANG:
+        canonical = canonical.replace(defanged, plain)
+    if canonical != value.lower():
+        flags |= DEFANGED
+    if kind == 'ip':
+        octets = canonical.split('.')
+        if len(octets) != 4 or not all(octet.isascii() and octet.isdigit() and len(octet) <= 3
+                                       and int(octet) <= 255 and not (len(octet) > 1 and octet[0] == '0')
+                                       for octet in octets):
+            flags |= INVALID
+        else:
+            address = ipaddress.IPv4Address(canonical)
+            if any(address in network for network in PRIVATE_SET):
+                flags |= PRIVATE
+            if any(address in network for network in RESERVED_SET):
+                flags |= RESERVED
+        if (' ' + context.lower()).endswith(VERSION_WORDS):
+            flags |= VERSION
+    elif kind == 'hash':
+        if len(canonical) not in ioc_scanner.HASH_LENGTHS or canonical.strip('0123456789abcdef'):
+            flags |= INVALID
+    elif canonical.rpartition('.')[2] not in TLD_SET:
+        flags |= UNKNOWN_TLD
+    return canonical, flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=500)
+    parser.add_argument('--size-kb', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=64, help='reports whose candidates are checked together')
+    args = parser.parse_args()
+
+    texts = [synthetic_report(args.size_kb * 1024, seed=i) for i in range(args.reports)]
+    start = time.perf_counter()
+    matches = [list(ioc_scanner.scan_iocs(text)) for text in texts]
+    scan_seconds = time.perf_counter() - start
+    candidates = [(match.type, text[match.start:match.end], text[max(match.start - CONTEXT_CHARS, 0):match.start])
+                  for text, text_matches in zip(texts, matches) for match in text_matches]
+
+    start = time.perf_counter()
+    expected = [python_check(*candidate) for candidate in candidates]
+    python_seconds = time.perf_counter() - start
+
+    filter_ = ioc_filter.IocFilter()
+    start = time.perf_counter()
+    values, flags = [], []
+    for i in range(0, len(texts), args.batch_size):
+        verdicts = filter_.verdicts(texts[i:i + args.batch_size], matches[i:i + args.batch_size])
+        values.extend(verdicts.values)
+        flags.extend(verdicts.flags.tolist())
+    numpy_seconds = time.perf_counter() - start
+
+    if list(zip(values, flags)) != expected:
+        raise SystemExit('ioc_filter disagrees with the per-match checks')
+    dropped = sum(1 for flag in flags if flag & filter_.drop)
+    print(f'{len(candidates)} candidates from {args.reports} reports; {dropped} dropped by the default filter')
+    print(f'{"":<26}{"seconds":>9}{"candidates/s":>14}')
+    for label, seconds in (('scan (reference)', scan_seconds), ('per-match Python checks', python_seconds),
+                           (f'NumPy, {args.batch_size} reports/batch', numpy_seconds)):
+        print(f'{label:<26}{seconds:>9.3f}{len(candidates) / seconds:>14,.0f}')
+
+
+if __name__ == '__main__':
+    main()
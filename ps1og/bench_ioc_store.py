@@ -0,0 +1,144 @@
+"""Memory and lookup speed of ioc_store.IocStore vs. plain dicts of lists.
+
+Simulates a nightly run: --reports reports, each with --per-report IoC
+sightings drawn with a skew from --distinct indicators, so popular IPs and
+domains recur across many reports. Both stores answer "which reports mention
+X" and "how often was X seen". Build time is measured on a pre-generated
+corpus. Retained memory is measured with tracemalloc in a second build fed
+by a generator, so the corpus itself is not retained. Then --interleaved
+more reports are added to both stores with a query after each, as a live
+feed would, which must not get slower per query as the stores grow.
+
+    python bench_ioc_store.py
+    python bench_ioc_store.py --reports 50000 --distinct 200000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from collections import Counter
+
+from ioc_scanner import IocMatch
+from ioc_store import IocStore
+
+
+def indicator_pool(distinct: int, rng: random.Random):
+    pool = []
+    for i in range(distinct):
+        kind = ('ip', 'domain', 'hash', 'email')[i % 4]
+        if kind == 'ip':
+            value = '.'.join(str(rng.randrange(256)) for _ in range(4))
+        elif kind == 'domain':
+            value = f'{rng.choice(["update", "cdn", "mail", "login"])}-{i}.{rng.choice(["com", "net", "ru"])}'
+        elif kind == 'hash':
+            value = ''.join(rng.choice('0123456789abcdef') for _ in range(rng.choice((32, 40, 64))))
+        else:
+            value = f'ops{i}@mail-{rng.randrange(100)}.org'
+        pool.append((kind, value))
+    return pool
+
+
+def reports(pool, count: int, per_report: int, seed: int, prefix: str = 'reports/2024'):
+    """(report_id, matches) with Zipf-like reuse of the pool."""
+    rng = random.Random(seed)
+    for n in range(count):
+        matches = []
+        for _ in range(per_report):
+            # Fresh copies of the strings, as a regex scan would produce them
+            kind, value = pool[min(int(rng.paretovariate(1.2)) - 1, len(pool) - 1)
+                               if rng.random() < 0.5 else rng.randrange(len(pool))]
+            matches.append(IocMatch(kind, ''.join(value), 0, len(value)))
+        yield f'{prefix}/{n:06}.txt', matches
+
+
+def plain_add(mentions, sightings, report_id, matches):
+    for match in matches:
+        sightings[match.value] += 1
+        report_ids = mentions.setdefault(match.value, [])
+        if not report_ids or report_ids[-1] != report_id:
+            report_ids.append(report_id)
+
+
+def plain(corpus):
+    mentions = {}
+    sightings = Counter()
+    for report_id, matches in corpus:
+        plain_add(mentions, sightings, report_id, matches)
+    return mentions, sightings
+
+
+def compact(corpus):
+    store = IocStore()
+    for report_id, matches in corpus:
+        store.add(report_id, matches)
+    store.freeze()
+    return store
+
+
+def measure(build, corpus, make_corpus):
+    start = time.perf_counter()
+    result = build(corpus)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    traced = build(make_corpus())
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traced
+    return result, elapsed, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=20000)
+    parser.add_argument('--per-report', type=int, default=50)
+    parser.add_argument('--distinct', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=10000)
+    parser.add_argument('--interleaved', type=int, default=2000, help='reports added with a query after each')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pool = indicator_pool(args.distinct, rng)
+    queries = [value for _, value in rng.sample(pool, min(args.queries, len(pool)))]
+
+
+    def make_corpus():
+        return reports(pool, args.reports, args.per_report, seed=1)
+
+    corpus = list(make_corpus())
+    (mentions, counts), plain_seconds, plain_bytes = measure(plain, corpus, make_corpus)
+    store, store_seconds, store_bytes = measure(compact, corpus, make_corpus)
+    del corpus
+
+    start = time.perf_counter()
+    plain_answers = [(mentions.get(value, []), counts[value]) for value in queries]
+    plain_query = time.perf_counter() - start
+    start = time.perf_counter()
+    store_answers = [(store.reports(value), store.sightings(value)) for value in queries]
+    store_query = time.perf_counter() - start
+    if plain_answers != store_answers:
+        raise SystemExit('IocStore answers differ from the plain dicts')
+
+    interleaved = {}
+    for label, add, query in (('dict of lists', lambda report_id, matches: plain_add(mentions, counts, report_id,
+                                                                                    matches),
+                               lambda value: (mentions.get(value, []), counts[value])),
+                              ('IocStore', store.add, lambda value: (store.reports(value), store.sightings(value)))):
+        start = time.perf_counter()
+        for (report_id, matches), value in zip(reports(pool, args.interleaved, args.per_report, seed=2, prefix='live'), queries):
+            add(report_id, matches)
+            query(value)
+        interleaved[label] = time.perf_counter() - start
+
+    indicators = len(store)
+    print(f'{args.reports} reports x {args.per_report} sightings; {indicators} distinct indicators seen')
+    print(f'{"":<22}{"build s":>9}{"MiB":>9}{"bytes/indicator":>17}{"us/query":>10}{"us/add+query":>14}')
+    for label, seconds, retained, query in (('dict of lists', plain_seconds, plain_bytes, plain_query),
+                                            ('IocStore', store_seconds, store_bytes, store_query)):
+        print(f'{label:<22}{seconds:>9.2f}{retained / 2 ** 20:>9.1f}{retained / indicators:>17.0f}'
+              f'{query / len(queries) * 1e6:>10.1f}{interleaved[label] / args.interleaved * 1e6:>14.1f}')
+    top = store.most_sighted(3)
+    print('most sighted: ' + ', '.join(f'{item.value} ({item.sightings}x in {item.reports} reports)' for item in top))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Throughput benchmark: single-pass IoC scanner vs. the per-category findall loops.
+
+    python bench_iocs.py                 # 4 MB synthetic report
+    python bench_iocs.py --size-mb 16
+    python bench_iocs.py report.txt      # any plain-text dump
+"""
+import argparse
+import re
+import time
+
+import ioc_scanner
+from bench_corpus import synthetic_report
+
+
+def legacy_main(text):
+    """extract_iocs from main.py before the single-pass scanner."""
+    return {
+        "IP addresses": re.findall(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b', text),
+        "Domains": re.findall(r'[a-zA-Z0-9-]+\.[a-zA-Z]{2,}', text),
+        "File Hashes": re.findall(r'\b[a-fA-F0-9]{32}\b|\b[a-fA-F0-9]{40}\b|\b[a-fA-F0-9]{64}\b', text),
+        "Email Addresses": re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text),
+    }
+
+
+def legacy_dsr1test2(text):
+    """extract_iocs from dsr1test2.py (and dstest1.py) before the single-pass scanner."""
+    patterns = {
+        'IP addresses': r'\b(?:\d{1,3}\.){3}\d{1,3}\b',
+        'Domains': r'\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b',
+        'File hashes': r'\b[a-fA-F0-9]{32,}\b',
+        'Email addresses': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    }
+    return {key: re.findall(pattern, text) for key, pattern in patterns.items()}
+
+
+_CL_IP = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+_CL_DOMAIN = re.compile(r'\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b')
+_CL_EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_CL_HASH = re.compile(r'\b[A-Fa-f0-9]{32,64}\b')
+
+
+def legacy_cltest3(text):
+    """ThreatIntelExtractor.extract_iocs from cltest3.py before the single-pass scanner."""
+    return {
+        'IP addresses': list(set(re.findall(_CL_IP, text))),
+        'Domains': list(set(re.findall(_CL_DOMAIN, text))),
+        'Email addresses': list(set(re.findall(_CL_EMAIL, text))),
+        'Hashes': list(set(re.findall(_CL_HASH, text)))
+    }
+
+
+CANDIDATES = {
+    'legacy main.py': legacy_main,
+    'legacy dsr1test2.py': legacy_dsr1test2,
+    'legacy cltest3.py': legacy_cltest3,
+    'ioc_scanner': ioc_scanner.extract_iocs,
+    'ioc_scanner (unique)': lambda text: ioc_scanner.extract_iocs(text, unique=True),
+}
+
+
+def measure(func, text, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', help='plain-text report to scan (default: synthetic corpus)')
+    parser.add_argument('--size-mb', type=float, default=4.0, help='size of the synthetic corpus')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per candidate; the best is reported')
+    args = parser.parse_args()
+
+    if args.path:
+        with open(args.path, 'r', encoding='utf-8', errors='replace') as file:
+            text = file.read()
+    else:
+        text = synthetic_report(int(args.size_mb * 1024 * 1024))
+    size_mb = len(text.encode('utf-8')) / (1024 * 1024)
+
+    print(f'corpus: {size_mb:.2f} MB')
+    print(f'{"candidate":<24}{"seconds":>10}{"MB/s":>10}{"matches":>10}')
+    for name, func in CANDIDATES.items():
+        elapsed, result = measure(func, text, args.repeat)
+        matches = sum(len(values) for values in result.values())
+        print(f'{name:<24}{elapsed:>10.3f}{size_mb / elapsed:>10.1f}{matches:>10}')
+
+
+if __name__ == '__main__':
+    main()
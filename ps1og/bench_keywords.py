@@ -0,0 +1,74 @@
+"""Keyword matching cost as the ATT&CK vocabulary grows.
+
+Compares the per-keyword loops used by extract_ttps (a word-boundary re.search
+per keyword as in dsr1test2.py, and `keyword in text.lower()` as in main.py)
+with the single-pass KeywordMatcher automaton.
+
+    python bench_keywords.py
+    python bench_keywords.py --size-kb 512 --sizes 5,100,1000,3000
+"""
+import argparse
+import random
+import re
+import time
+
+import attack_index
+from bench_corpus import synthetic_report
+from keyword_matcher import KeywordMatcher, attack_keywords
+
+WORDS = ('access', 'credential', 'remote', 'service', 'script', 'token', 'registry', 'task', 'shell',
+         'process', 'injection', 'discovery', 'exfiltration', 'command', 'proxy', 'web', 'email', 'file')
+
+
+def vocabulary(size, seed=0):
+    """Real ATT&CK names when the index is built, padded with synthetic phrases."""
+    keywords = []
+    index = attack_index.try_load_index()
+    if index is not None:
+        keywords = [keyword for keyword, _ in attack_keywords(index)]
+    rng = random.Random(seed)
+    while len(keywords) < size:
+        keywords.append(' '.join(rng.sample(WORDS, rng.randint(1, 3))) + f' {len(keywords)}')
+    # The sample report's own keywords are always part of the vocabulary
+    return ['initial access', 'lateral movement', 'powershell'] + keywords[:size - 3]
+
+
+def legacy_regex(keywords, text):
+    return [keyword for keyword in keywords if re.search(rf'\b{re.escape(keyword)}\b', text, re.IGNORECASE)]
+
+
+def legacy_substring(keywords, text):
+    return [keyword for keyword in keywords if keyword.lower() in text.lower()]
+
+
+def automaton(matcher, text):
+    return {match.keyword for match in matcher.finditer(text)}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=256, help='report size')
+    parser.add_argument('--sizes', default='5,50,200,800,2000', help='vocabulary sizes to test')
+    args = parser.parse_args()
+
+    text = synthetic_report(args.size_kb * 1024)
+    print(f'report: {args.size_kb} KB')
+    print(f'{"keywords":>9}{"re.search ms":>15}{"substring ms":>15}{"automaton ms":>15}{"build ms":>10}')
+    for size in (int(value) for value in args.sizes.split(',')):
+        keywords = vocabulary(size)
+        start = time.perf_counter()
+        matcher = KeywordMatcher().add_all((keyword, None) for keyword in keywords).build()
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f'{size:>9}{timed(legacy_regex, keywords, text):>15.1f}'
+              f'{timed(legacy_substring, keywords, text):>15.1f}'
+              f'{timed(automaton, matcher, text):>15.1f}{build_ms:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
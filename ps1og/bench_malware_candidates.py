@@ -0,0 +1,62 @@
+"""VirusTotal lookups proposed vs. made by MalwareRanker, with regression checks.
+
+Ranks a few short texts against a small gazetteer of real ATT&CK software,
+including tools named with ordinary words (at, Net, Ping). Prints the
+capitalized words each text proposes and the lookups left after ranking.
+Exits non-zero when a text gets other lookups than expected.
+
+    python bench_malware_candidates.py
+"""
+import argparse
+import re
+
+from attack_index import Software
+from malware_candidates import MalwareRanker
+
+SOFTWARE = [
+    Software('S0110', 'at', ('at.exe',), 'tool'),
+    Software('S0039', 'Net', ('net.exe',), 'tool'),
+    Software('S0097', 'Ping', ('ping.exe',), 'tool'),
+    Software('S0002', 'Mimikatz', (), 'tool'),
+    Software('S0140', 'Shamoon', ('Disttrack',), 'malware'),
+    Software('S0013', 'PlugX', ('Korplug',), 'malware'),
+]
+
+# (text, names expected to be looked up)
+CASES = [
+    ('The attackers were seen at the office. We will ping the team about the net result.', []),
+    ('Net income rose at the firm. Ping us if the figures look off.', []),
+    ('The operators ran Mimikatz to dump credentials.', ['Mimikatz']),
+    ('Shamoon malware wiped the disks; a backdoor called PlugX followed.', ['Shamoon', 'PlugX']),
+    ('APT33 deployed Disttrack against the energy sector.', ['Shamoon']),
+]
+
+
+class Gazetteer:
+    """The minimal index interface MalwareRanker reads: software()."""
+
+    def software(self):
+        return iter(SOFTWARE)
+
+
+def proposed_names(text):
+    """The legacy heuristic: every capitalized word or phrase."""
+    return set(re.findall(r'\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b', text))
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    ranker = MalwareRanker(Gazetteer())
+    failures = []
+    print(f'{"proposed":>9}{"lookups":>9}  names')
+    for text, expected in CASES:
+        ranked = ranker.rank(text, proposed=proposed_names(text))
+        print(f'{ranked.proposed:>9}{len(ranked.candidates):>9}  {", ".join(ranked.names) or "-"}')
+        if sorted(ranked.names) != sorted(expected):
+            failures.append(f'{text!r}: looked up {ranked.names}, expected {expected}')
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Latency and peak RSS of PDF ingestion: whole-document vs. streaming vs. page-parallel.
+
+Each mode runs in a fresh interpreter so ru_maxrss reflects that mode only.
+
+    python bench_pdf.py                      # test.pdf
+    python bench_pdf.py big_report.pdf --n-process 4
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import ioc_scanner
+from keyword_matcher import KeywordMatcher
+from pdf_source import iter_pdf_pages
+from stream_scan import scan_chunks
+
+TTP_KEYWORDS = {'initial access': 'TA0001', 'execution': 'TA0002', 'lateral movement': 'TA0008',
+                'spear-phishing attachment': 'T1566.001', 'powershell': 'T1059.001'}
+
+
+def run_legacy(path, n_process):
+    """extract_text_from_pdf before streaming: repeated += then scan the full text."""
+    from PyPDF2 import PdfReader
+    start = time.perf_counter()
+    text = ""
+    for page in PdfReader(path).pages:
+        text += page.extract_text()
+    first_result = time.perf_counter() - start
+    matcher = KeywordMatcher.from_mapping(TTP_KEYWORDS)
+    matches = list(ioc_scanner.scan_iocs(text)) + matcher.findall(text)
+    return first_result, len(matches)
+
+
+def run_stream(path, n_process):
+    matcher = KeywordMatcher.from_mapping(TTP_KEYWORDS)
+    start = time.perf_counter()
+    first_result = None
+    count = 0
+    scanners = {'iocs': ioc_scanner.scan_iocs, 'ttps': matcher.finditer}
+    for _ in scan_chunks(iter_pdf_pages(path, n_process), scanners):
+        if first_result is None:
+            first_result = time.perf_counter() - start
+        count += 1
+    return first_result, count
+
+
+MODES = {'legacy': run_legacy, 'stream': run_stream}
+
+
+def child(mode, path, n_process):
+    start = time.perf_counter()
+    first_result, matches = MODES[mode](path, n_process)
+    elapsed = time.perf_counter() - start
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'first_result': first_result, 'matches': matches,
+                      'rss_mb': rss_kb / 1024, 'worker_rss_mb': children_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', default='test.pdf')
+    parser.add_argument('--n-process', type=int, default=4, help='workers for the page-parallel mode')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'N_PROCESS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child[0], args.path, int(args.child[1]))
+
+    runs = [('legacy', 'legacy', 1), ('stream', 'stream', 1), (f'stream x{args.n_process}', 'stream', args.n_process)]
+    print(f'{"mode":<14}{"seconds":>9}{"first hit s":>13}{"matches":>9}{"peak RSS MB":>13}{"worker RSS MB":>15}')
+    for label, mode, n_process in runs:
+        output = subprocess.run([sys.executable, __file__, args.path, '--child', mode, str(n_process)],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output)
+        first = result['first_result'] if result['first_result'] is not None else float('nan')
+        print(f'{label:<14}{result["seconds"]:>9.2f}{first:>13.3f}{result["matches"]:>9}'
+              f'{result["rss_mb"]:>13.1f}{result["worker_rss_mb"]:>15.1f}')
+
+
+if __name__ == '__main__':
+    main()
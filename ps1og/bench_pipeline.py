@@ -0,0 +1,103 @@
+"""Throughput and latency of pipeline.py against the sequential process_report() loop.
+
+Writes --reports synthetic report files. Each names its own ransomware
+family, so every report costs one VirusTotal search that is neither cached
+nor coalesced. VirusTotal is mock_vt_server, which waits --vt-latency
+seconds per request. The result cache is off.
+
+The sequential path reads a file, then extracts it (lookups included), then
+moves on. Its latency is that one report's time. Pipeline latency runs from
+the start of reading to the end of enrichment, so it includes time queued
+behind other reports.
+
+    python bench_pipeline.py
+    python bench_pipeline.py --reports 400 --workers 4 --vt-latency 0.3 --ner model
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='bench', VT_TIER='unlimited',
+                  VT_CACHE_PATH=':memory:')
+
+import mock_vt_server  # noqa: E402
+import vt_client  # noqa: E402
+from bench_corpus import synthetic_report  # noqa: E402
+from cltest3 import ThreatIntelExtractor  # noqa: E402
+from pipeline import read_source, run_pipeline  # noqa: E402
+
+
+def sequential(extractor, paths):
+    latencies, results = [], {}
+    for path in paths:
+        start = time.perf_counter()
+        results[path] = extractor.process_report(read_source(path))
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+async def pipelined(extractor, paths, args):
+    latencies, results = [], {}
+    async for result in run_pipeline(paths, extractor, args.workers, args.queue_size, args.lookups):
+        latencies.append(result.latency)
+        results[result.source] = result.results
+    return latencies, results
+
+
+def report(label, seconds, latencies):
+    ordered = sorted(latencies)
+    print(f'{label:<14}{seconds:>9.2f}{len(latencies) / seconds:>11.1f}{statistics.mean(latencies) * 1000:>10.0f}'
+          f'{ordered[len(ordered) // 2] * 1000:>9.0f}{ordered[int(0.95 * (len(ordered) - 1))] * 1000:>9.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=100)
+    parser.add_argument('--size-kb', type=int, default=8)
+    parser.add_argument('--vt-latency', type=float, default=0.1, help='seconds the mock VirusTotal waits per request')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue-size', type=int, default=16)
+    parser.add_argument('--lookups', type=int, default=32)
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='rules')
+    args = parser.parse_args()
+
+    server = mock_vt_server.start(latency=args.vt_latency)
+    os.environ['VT_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}/api/v3'
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.reports):
+            path = os.path.join(directory, f'report-{i:04}.txt')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(synthetic_report(args.size_kb * 1024, seed=i)
+                           + f' The operators deployed a ransomware called Blackfang{i}.\n')
+            paths.append(path)
+
+        extractor = ThreatIntelExtractor(ner=args.ner)
+        extractor.process_report(read_source(paths[0]))  # load the NER pipeline before timing
+        start = time.perf_counter()
+        sequential_latencies, expected = sequential(extractor, paths)
+        sequential_seconds = time.perf_counter() - start
+
+        # A fresh VirusTotal client and cache, so the pipeline makes the same requests
+        vt_client.shared_client().close()
+        vt_client._shared_clients.clear()
+        extractor = ThreatIntelExtractor(ner=args.ner)
+        start = time.perf_counter()
+        pipeline_latencies, results = asyncio.run(pipelined(extractor, paths, args))
+        pipeline_seconds = time.perf_counter() - start
+
+    if results != expected:
+        raise SystemExit('pipeline results differ from the sequential path')
+    print(f'{args.reports} reports of {args.size_kb} KB, {args.vt_latency * 1000:.0f} ms per VirusTotal request, '
+          f'{args.workers} workers, {args.lookups} concurrent lookups')
+    print(f'{"":<14}{"seconds":>9}{"reports/s":>11}{"mean ms":>10}{"p50 ms":>9}{"p95 ms":>9}')
+    report('sequential', sequential_seconds, sequential_latencies)
+    report('pipeline', pipeline_seconds, pipeline_latencies)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Resident memory per worker process: workers that load their own extractor vs. preforked ones.
+
+Each mode runs in a fresh process. It starts a pool of --workers through
+ThreatIntelExtractor.worker_pool_setup(), runs --reports synthetic reports
+through cltest3._process_batch, then reads /proc/<pid>/smaps_rollup of the
+parent and of every worker:
+
+- RSS: resident pages, shared ones included
+- PSS: shared pages split evenly between the processes that map them
+- USS: pages private to the process; what it really adds
+
+Total is the sum of PSS across the parent and the workers: the memory the
+deployment actually uses. Wall time runs from setting up the pool to the
+last result, so it includes each worker's model loading, or the parent's.
+Linux only.
+
+    python bench_prefork.py
+    python bench_prefork.py --workers 8 --ner model
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='')
+
+import cltest3  # noqa: E402
+import prefork  # noqa: E402
+from bench_corpus import synthetic_report  # noqa: E402
+from cltest3 import ThreatIntelExtractor, parse_stages  # noqa: E402
+
+MODES = {'own extractor': False, 'preforked': True}
+
+
+def memory(pid) -> dict:
+    """RSS, PSS and USS of a process in MiB, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0]) / 1024
+    return {'rss': fields['Rss'], 'pss': fields['Pss'],
+            'uss': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def _pid(seconds):
+    time.sleep(seconds)  # keeps this worker busy so the others get the remaining tasks
+    return os.getpid()
+
+
+def worker_pids(pool, workers):
+    """Pids of all workers, once every one of them has started and run a task."""
+    pids = set()
+    while len(pids) < workers:
+        pids.update(pool.map(_pid, [0.1] * workers, chunksize=1))
+    return pids
+
+
+def measure(args, share_model, results):
+    extractor = ThreatIntelExtractor(args.only, args.ner)
+    texts = [synthetic_report(args.size_kb * 1024, seed=i) for i in range(args.reports)]
+    start = time.perf_counter()
+    context, initializer, initargs = extractor.worker_pool_setup(share_model)
+    pool = context.Pool(args.workers, initializer, initargs)
+    prefork.unfreeze()
+    batches = [texts[i:i + args.batch_size] for i in range(0, len(texts), args.batch_size)]
+    pool.map(cltest3._process_batch, batches, chunksize=1)
+    seconds = time.perf_counter() - start
+    workers = [memory(pid) for pid in worker_pids(pool, args.workers)]
+    results.put((seconds, memory(os.getpid()), workers))
+    pool.close()
+    pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--reports', type=int, default=200)
+    parser.add_argument('--size-kb', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--only', type=parse_stages)
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='rules')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    print(f'{args.workers} workers, {args.reports} reports, NER: {args.ner}; MiB')
+    print(f'{"":<15}{"wall s":>10}{"parent RSS":>11}{"RSS/worker":>11}{"PSS/worker":>11}'
+          f'{"USS/worker":>11}{"total PSS":>11}')
+    for label, share_model in MODES.items():
+        results = context.Queue()
+        process = context.Process(target=measure, args=(args, share_model, results))
+        process.start()
+        seconds, parent, workers = results.get()
+        process.join()
+        mean = {key: sum(worker[key] for worker in workers) / len(workers) for key in ('rss', 'pss', 'uss')}
+        total = parent['pss'] + sum(worker['pss'] for worker in workers)
+        print(f'{label:<15}{seconds:>10.2f}{parent["rss"]:>11.1f}{mean["rss"]:>11.1f}{mean["pss"]:>11.1f}'
+              f'{mean["uss"]:>11.1f}{total:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
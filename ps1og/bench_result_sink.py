@@ -0,0 +1,78 @@
+"""Export cost of extraction results: nested JSON per report vs. flat record sinks.
+
+Runs the IoC/TTP/actor stages over synthetic reports and writes the
+results four ways: the nested JSON lines cltest3.py prints, and
+result_sink's JSON-lines, Parquet and Arrow IPC records. For each it shows
+time, output size and peak traced memory (tracemalloc; Arrow's own buffers
+are not traced). Run it with two --reports values: peak memory of the record
+sinks should not grow with the corpus. Records keep every occurrence with its
+offset, so they outnumber the deduplicated values of the nested output.
+
+    python bench_result_sink.py
+    python bench_result_sink.py --reports 2000 --batch-rows 16384
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='')
+
+import pyarrow.compute  # noqa: E402,F401  imported up front so module import is not counted as peak memory
+import pyarrow.parquet  # noqa: E402,F401
+
+import result_sink  # noqa: E402
+from bench_corpus import synthetic_report  # noqa: E402
+from cltest3 import ThreatIntelExtractor  # noqa: E402
+
+
+def nested_json(extractor, reports, path, batch_rows):
+    with open(path, 'w', encoding='utf-8') as file:
+        for report_id, text in reports:
+            file.write(json.dumps({'report': report_id, **extractor.process_report(text)}) + '\n')
+
+
+def records(extractor, reports, path, batch_rows):
+    sink = result_sink.open_sink(path, batch_rows)
+    for report_records in extractor.process_records(reports):
+        sink.write(report_records)
+    sink.close()
+
+
+def run(label, export, extractor, reports, path, batch_rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    export(extractor, reports, path, batch_rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<22}{elapsed:>9.2f}{os.path.getsize(path) / 1024:>12.0f}{peak / 1024 / 1024:>12.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=500)
+    parser.add_argument('--size-kb', type=int, default=8)
+    parser.add_argument('--batch-rows', type=int, default=result_sink.DEFAULT_BATCH_ROWS)
+    args = parser.parse_args()
+
+    extractor = ThreatIntelExtractor(['iocs', 'ttps', 'actors'])
+
+    def corpus():
+        # Generated lazily so the corpus itself does not count towards peak memory
+        return ((f'report-{i}', synthetic_report(args.size_kb * 1024, seed=i)) for i in range(args.reports))
+
+    print(f'{args.reports} reports of {args.size_kb} KB; batches of {args.batch_rows} rows')
+    print(f'{"export":<22}{"seconds":>9}{"output KB":>12}{"peak MiB":>12}')
+    with tempfile.TemporaryDirectory() as directory:
+        run('nested JSON lines', nested_json, extractor, corpus(), os.path.join(directory, 'nested.jsonl'),
+            args.batch_rows)
+        for label, name in (('records JSON lines', 'records.jsonl'), ('records Parquet', 'records.parquet'),
+                            ('records Arrow IPC', 'records.arrow')):
+            run(label, records, extractor, corpus(), os.path.join(directory, name), args.batch_rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Technique recall and precision: keyword matching vs. semantic_ttps.py scoring.
+
+Builds --reports labeled reports from paraphrased technique sentences (most
+never name the technique) mixed with unrelated sentences. Each report goes
+through ThreatIntelExtractor's 'ttps' stage without and with the TTP scorer.
+Keyword techniques come from 'Techniques' and scored ones from 'Scored
+techniques'; "either" is their union. Latency is per report for each of
+those reports and for a --size-kb synthetic report. The vectors are built
+first if missing (TTP_VECTORS_PATH), outside the timing.
+
+    python bench_semantic_ttps.py
+    python bench_semantic_ttps.py --min-confidence 0.35 --top-k 3
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='')
+
+import attack_index  # noqa: E402
+import semantic_ttps  # noqa: E402
+from bench_corpus import synthetic_report  # noqa: E402
+from cltest3 import ThreatIntelExtractor  # noqa: E402
+
+PARAPHRASES = {
+    'T1566.001': ['The malware was delivered via spear-phishing emails containing a malicious attachment.',
+                  'Victims received targeted emails with a weaponized Word document attached.',
+                  'The initial lure was an email carrying a malicious attachment sent to finance staff.'],
+    'T1059.001': ['The operators ran obfuscated PowerShell scripts to download the second stage.',
+                  'An encoded powershell command line fetched the payload from the server.',
+                  'The loader abuses PowerShell commands to execute code in memory.'],
+    'T1190': ['They exploited a vulnerability in the internet-facing web server to get in.',
+              'Access was gained by exploiting a flaw in a public-facing application.',
+              'The intruders exploited an unpatched VPN appliance exposed to the internet.'],
+    'T1021': ['The actors moved laterally through RDP sessions with stolen valid accounts.',
+              'Using valid accounts, they logged into remote services on other hosts.',
+              'Lateral movement relied on remote connections to internal servers.'],
+    'T1053.005': ['A scheduled task was created with schtasks to relaunch the implant every hour.',
+                  'The backdoor registers a task in Task Scheduler that runs at startup.',
+                  'Execution was repeated by a scheduled task created on each host.'],
+    'T1547.001': ['The dropper added itself to the registry Run key so it starts at logon.',
+                  'Persistence came from a shortcut placed in the user startup folder.',
+                  'A value under the Run registry keys launches the payload at boot.'],
+}
+
+UNRELATED = [
+    'Analysts observed repeated beaconing over several weeks before the payload was staged.',
+    'The group targets energy companies in the Middle East.',
+    'The campaign was first reported by several vendors in the spring.',
+    'Infrastructure overlaps suggest the same operators were behind earlier attacks.',
+    'Victims included government agencies and telecommunications providers.',
+    'The samples were compiled shortly before the intrusions began.',
+    'Researchers shared the indicators with national response teams.',
+    'The operators appear to work during business hours in their time zone.',
+]
+
+
+def labeled_reports(count, seed=0):
+    """(text, set of technique ids) pairs; 1-3 technique sentences among 2-5 unrelated ones."""
+    rng = random.Random(seed)
+    reports = []
+    for _ in range(count):
+        truth = set(rng.sample(sorted(PARAPHRASES), rng.randint(1, 3)))
+        sentences = [rng.choice(PARAPHRASES[technique]) for technique in truth]
+        sentences += rng.sample(UNRELATED, rng.randint(2, 5))
+        rng.shuffle(sentences)
+        reports.append((' '.join(sentences), truth))
+    return reports
+
+
+def keyword_ids(result):
+    return {technique for technique, _ in result['TTPs']['Techniques']}
+
+
+def scored_ids(result):
+    return {technique for technique, _, _ in result['TTPs'].get('Scored techniques', [])}
+
+
+def timed(extractor, texts):
+    """Results and the mean milliseconds per report."""
+    start = time.perf_counter()
+    results = [extractor.process_report(text) for text in texts]
+    return results, (time.perf_counter() - start) * 1000 / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=300)
+    parser.add_argument('--size-kb', type=int, default=64, help='size of the latency-only synthetic report')
+    parser.add_argument('--min-confidence', type=float, default=semantic_ttps.DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument('--top-k', type=int, default=semantic_ttps.DEFAULT_TOP_K)
+    args = parser.parse_args()
+
+    index = attack_index.load_index()
+    scorer = semantic_ttps.try_load_matcher(index, min_confidence=args.min_confidence, top_k=args.top_k)
+    keywords_only = ThreatIntelExtractor(['ttps'])
+    with_scorer = ThreatIntelExtractor(['ttps'], ttp_scorer=scorer)
+
+    reports = labeled_reports(args.reports)
+    texts = [text for text, _ in reports]
+    keyword_results, keyword_ms = timed(keywords_only, texts)
+    scored_results, scored_ms = timed(with_scorer, texts)
+    large = [synthetic_report(args.size_kb * 1024)]
+    _, keyword_large_ms = timed(keywords_only, large)
+    _, scored_large_ms = timed(with_scorer, large)
+
+    print(f'{len(reports)} labeled reports, {len(scorer.vectors.ids)} techniques, '
+          f'min confidence {args.min_confidence}, top {args.top_k}')
+    print(f'{"":<10}{"recall":>8}{"precision":>11}{"ms/report":>11}{f"ms/{args.size_kb} KB":>11}')
+    modes = {
+        'keywords': ([keyword_ids(result) for result in keyword_results], keyword_ms, keyword_large_ms),
+        'scored': ([scored_ids(result) for result in scored_results], scored_ms, scored_large_ms),
+        'either': ([keyword_ids(result) | scored_ids(result) for result in scored_results],
+                   scored_ms, scored_large_ms),
+    }
+    for label, (found, ms, large_ms) in modes.items():
+        hits = sum(len(ids & truth) for ids, (_, truth) in zip(found, reports))
+        recall = hits / sum(len(truth) for _, truth in reports)
+        precision = hits / max(sum(len(ids) for ids in found), 1)
+        print(f'{label:<10}{recall:>8.2f}{precision:>11.2f}{ms:>11.2f}{large_ms:>11.1f}')
+
+
+if __name__ == '__main__':
+    main()
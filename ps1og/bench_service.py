@@ -0,0 +1,123 @@
+"""Loopback load test for service.py: sustained reports/sec and latency under concurrency.
+
+Starts the service in a subprocess (result cache off, no VirusTotal key, so
+every request does the full local work) unless --url points at a running one,
+then keeps --clients keep-alive connections posting distinct synthetic reports
+for --duration seconds.
+
+    python bench_service.py
+    python bench_service.py --clients 16 --workers 4 --only iocs,ttps,actors
+    python bench_service.py --url http://127.0.0.1:8080
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from bench_corpus import synthetic_report
+from service import LatencyWindow
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_service(args):
+    """Run service.py on a free port and return (process, base URL) once it answers."""
+    command = [sys.executable, 'service.py', '--port', '0', '--workers', str(args.workers),
+               '--queue-size', str(args.queue_size)]
+    if args.only:
+        command += ['--only', args.only]
+    if args.ner:
+        command += ['--ner', args.ner]
+    env = {**os.environ, 'RESULT_CACHE_ITEMS': '0', 'RESULT_CACHE_PATH': '', 'VIRUSTOTAL_API_KEY': ''}
+    process = subprocess.Popen(command, cwd=HERE, env=env, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith('listening on '):
+        process.kill()
+        raise SystemExit('service failed to start')
+    return process, line.split()[-1]
+
+
+def client(url, reports, offset, deadline, latency, counts, lock):
+    target = urlparse(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=120)
+    connection.connect()
+    # http.client writes headers and body separately; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every request
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    i = offset
+    while time.perf_counter() < deadline:
+        body = reports[i % len(reports)].encode()
+        i += 1
+        start = time.perf_counter()
+        connection.request('POST', '/extract', body, {'Content-Type': 'text/plain'})
+        response = connection.getresponse()
+        response.read()
+        with lock:
+            counts[response.status] = counts.get(response.status, 0) + 1
+        if response.status == 200:
+            latency.add(time.perf_counter() - start)
+        elif response.status == 503:
+            time.sleep(0.01)  # back off briefly; the queue is full
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='existing service; default starts one')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent connections')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load')
+    parser.add_argument('--report-kb', type=int, default=4, help='size of each report')
+    parser.add_argument('--reports', type=int, default=256, help='distinct reports to cycle through')
+    parser.add_argument('--workers', type=int, default=1, help='service extractor processes')
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--only', help='stages the started service runs')
+    parser.add_argument('--ner', help='NER engine of the started service (model or rules)')
+    args = parser.parse_args()
+
+    reports = [synthetic_report(args.report_kb * 1024, seed) for seed in range(args.reports)]
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_service(args)
+    try:
+        latency = LatencyWindow(size=10 ** 6)
+        counts = {}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=client, args=(url, reports, n * 7919, deadline, latency, counts, lock))
+                   for n in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        target = urlparse(url)
+        connection = http.client.HTTPConnection(target.hostname, target.port)
+        connection.request('GET', '/metrics')
+        metrics = json.loads(connection.getresponse().read())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    ok = counts.get(200, 0)
+    print(f'clients {args.clients}, workers {metrics["workers"]}, stages {",".join(metrics["stages"])}, '
+          f'report {args.report_kb} KB, {elapsed:.1f} s')
+    print(f'sustained: {ok / elapsed:.1f} reports/s ({ok} ok, {counts.get(503, 0)} rejected with 503, '
+          f'{sum(counts.values()) - ok - counts.get(503, 0)} other errors)')
+    client_ms = latency.percentiles()
+    print('client latency ms:  ' + '  '.join(f'{name} {value:.1f}' for name, value in client_ms.items()))
+    print('service latency ms: ' + '  '.join(f'{name} {value:.1f}' for name, value in metrics['latency_ms'].items()))
+    print(f'service batches: {metrics["batches"]}, avg batch {metrics["completed"] / max(metrics["batches"], 1):.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Wall-clock time of one very large report: a single whole-report parse vs. sharding.py.
+
+Builds one synthetic report of --size-kb and extracts it as a single Doc
+(MAX_DOC_CHARS lifted), then in shards with 1 and --processes worker
+processes. Each pass gets a fresh extractor, so each one builds its own Doc.
+Result cache and VirusTotal are off. Past spaCy's max_length (1,000,000
+characters) the whole-report parse fails, and the failure is shown. The
+sharded IoCs, TTPs and actors must match the whole-report ones.
+
+    python bench_sharding.py
+    python bench_sharding.py --size-kb 4000 --processes 8 --ner model
+"""
+import argparse
+import os
+import time
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='')
+
+from bench_corpus import synthetic_report  # noqa: E402
+from bench_incremental import normalized  # noqa: E402
+from cltest3 import ThreatIntelExtractor, parse_stages  # noqa: E402
+from sharding import DEFAULT_SHARD_SIZE, shard_bounds  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=800, help='report size')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='characters per shard')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--only', type=parse_stages, default=['iocs', 'ttps', 'actors', 'malware', 'targets'])
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='rules')
+    args = parser.parse_args()
+
+    text = synthetic_report(args.size_kb * 1024)
+    print(f'{len(text):,} characters, {len(shard_bounds(text, args.shard_size))} shards, '
+          f'{os.cpu_count()} CPUs')
+    print(f'{"":<24}{"seconds":>9}{"speedup":>9}')
+
+    extractor = ThreatIntelExtractor(args.only, args.ner)
+    extractor.MAX_DOC_CHARS = float('inf')
+    extractor.nlp.load()  # load the pipeline before timing
+    start = time.perf_counter()
+    try:
+        expected = extractor.process_report(text)
+    except ValueError as error:  # spaCy's [E088] max_length error
+        expected = None
+        print(f'{"whole report":<24}  failed: {str(error).splitlines()[0][:60]}')
+    else:
+        baseline = time.perf_counter() - start
+        print(f'{"whole report":<24}{baseline:>9.2f}{1:>9.1f}')
+
+    for processes in sorted({1, args.processes}):
+        extractor = ThreatIntelExtractor(args.only, args.ner)
+        if processes == 1:
+            extractor.nlp.load()
+        start = time.perf_counter()
+        results = extractor.process_large_report(text, processes, args.shard_size)
+        seconds = time.perf_counter() - start
+        speedup = f'{baseline / seconds:>9.1f}' if expected is not None else f'{"-":>9}'
+        print(f'{f"shards, {processes} processes":<24}{seconds:>9.2f}{speedup}')
+        if expected is not None and normalized(results) != normalized(expected):
+            raise SystemExit('sharded IoCs, TTPs or actors differ from the whole-report run')
+
+
+if __name__ == '__main__':
+    main()
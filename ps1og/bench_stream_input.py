@@ -0,0 +1,146 @@
+"""Peak resident memory of reading a huge multi-report file: whole vs. record_stream.py.
+
+Writes --size-mb of synthetic reports separated by blank lines to a
+temporary file (or reads --input). Each mode runs in a fresh process and
+hands every record to the IoC scan, or with --extract to
+dsr1test2.process_reports (set NER_ENGINE=rules without the spaCy model), with
+VirusTotal served by mock_vt_server on a local port:
+
+- read whole: file.read() and str.split(), as extract_text_from_input() reads files
+- chunks: record_stream.iter_chunked(), the path stdin and pipes take
+- mmap: record_stream.iter_records() on the file
+
+Peak RSS is ru_maxrss minus the RSS after imports, so it is what reading
+and extraction add. Linux only. With --extract it then checks that
+dsr1test2.stream_threat_intelligence() gives exactly one result per JSON
+line, for a line whose text is longer than spaCy's max_length too, and exits
+non-zero if not.
+
+    python bench_stream_input.py
+    python bench_stream_input.py --size-mb 2048 --extract
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+os.environ.update(RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='', VIRUSTOTAL_API_KEY='')
+
+import ioc_scanner  # noqa: E402
+import mock_vt_server  # noqa: E402
+import record_stream  # noqa: E402
+from bench_corpus import synthetic_report  # noqa: E402
+
+
+def read_whole(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        text = file.read()
+    return (record for record in text.split(record_stream.DEFAULT_DELIMITER) if record.strip())
+
+
+def chunks(path):
+    with open(path, 'rb') as file:
+        for record in record_stream.iter_chunked(file, record_stream.DEFAULT_DELIMITER.encode()):
+            if record.strip():
+                yield record.decode('utf-8', errors='replace')
+
+
+MODES = {'read whole': read_whole, 'chunks': chunks, 'mmap': record_stream.iter_records}
+
+
+def current_rss():
+    """Resident set size of this process in MiB, from /proc/self/status."""
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+
+
+def measure(mode, path, extract, results):
+    if extract:
+        import dsr1test2
+        dsr1test2.nlp.load()
+    baseline = current_rss()
+    start = time.perf_counter()
+    records = MODES[mode](path)
+    if extract:
+        count = sum(1 for _ in dsr1test2.process_reports(records))
+    else:
+        count = sum(1 for record in records if ioc_scanner.extract_iocs(record) is not None)
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results.put((count, seconds, peak - baseline))
+
+
+def write_input(path, size_mb):
+    """Blank-line separated synthetic reports of 4-32 KB."""
+    written = 0
+    with open(path, 'w', encoding='utf-8') as file:
+        seed = 0
+        while written < size_mb << 20:
+            report = synthetic_report(4096 << (seed % 4), seed=seed % 64).replace('\n\n', '\n').strip()
+            written += file.write(report + record_stream.DEFAULT_DELIMITER)
+            seed += 1
+
+
+def check_json_lines():
+    """Failures of streaming a JSON-lines file with one text over spaCy's max_length."""
+    import dsr1test2
+    texts = [synthetic_report(1 << 20, seed=1), synthetic_report(4096, seed=2)]
+    handle, path = tempfile.mkstemp(suffix='.jsonl')
+    with os.fdopen(handle, 'w', encoding='utf-8') as file:
+        for text in texts:
+            file.write(json.dumps({'text': text}) + '\n')
+    try:
+        results = list(dsr1test2.stream_threat_intelligence(path, json_field='text'))
+    finally:
+        os.remove(path)
+    failures = [f'JSON lines: {len(results)} results for {len(texts)} lines'] if len(results) != len(texts) else []
+    failures += [f'JSON line {i}: {result["Error"]}' for i, result in enumerate(results) if 'Error' in result]
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=256, help='size of the generated input')
+    parser.add_argument('--input', help='existing blank-line separated file instead of generated input')
+    parser.add_argument('--extract', action='store_true', help='run full extraction on every record')
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated modes to run')
+    args = parser.parse_args()
+
+    path = args.input
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.txt')
+        os.close(handle)
+        write_input(path, args.size_mb)
+    if args.extract:
+        server = mock_vt_server.start()
+        # Inherited by the spawned processes
+        os.environ.update(VT_BASE_URL=f'http://127.0.0.1:{server.server_address[1]}/api/v3',
+                          VIRUSTOTAL_API_KEY='bench', VT_TIER='unlimited', VT_CACHE_PATH=':memory:')
+    try:
+        context = multiprocessing.get_context('spawn')
+        print(f'{os.path.getsize(path) / 2**20:.0f} MiB input, '
+              f'{"full extraction" if args.extract else "IoC scan"} per record')
+        print(f'{"":<12}{"records":>9}{"seconds":>9}{"MiB/s":>8}{"peak RSS MiB":>14}')
+        for mode in args.modes.split(','):
+            results = context.Queue()
+            process = context.Process(target=measure, args=(mode, path, args.extract, results))
+            process.start()
+            count, seconds, peak = results.get()
+            process.join()
+            rate = os.path.getsize(path) / 2**20 / seconds
+            print(f'{mode:<12}{count:>9}{seconds:>9.2f}{rate:>8.1f}{peak:>14.1f}')
+        failures = check_json_lines() if args.extract else []
+    finally:
+        if args.input is None:
+            os.remove(path)
+    if failures:
+        raise SystemExit('\n'.join(failures))
+
+
+if __name__ == '__main__':
+    main()
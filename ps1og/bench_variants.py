@@ -0,0 +1,357 @@
+"""Speed, memory and accuracy of every extractor variant, with a regression check.
+
+Runs main.py, dstest1.py, dsr1test2.py (spaCy and rule NER) and cltest3.py
+(spaCy and rule NER, and rule NER with ioc_filter) over three labeled corpora:
+
+- synthetic: bench_corpus.labeled_report(), truth known by construction
+- pdf: the text of test.pdf, truth in golden_test_pdf.json
+- entities: entity_corpus.jsonl (actors and targets only)
+
+VirusTotal is mock_vt_server on a local port. It knows shamoon and the
+test.pdf malware families. The result cache is off.
+
+Each variant runs in its own fresh process, --jobs at a time. It warms up on
+one report, so model loading shows up as startup time. Then it records:
+
+- mean and p95 latency per report, and throughput
+- per-stage latency (from the variant's profiler, or wrapped functions)
+- peak RSS of the process
+- precision and recall per field against the truth
+
+A truth entry may list aliases. Finding any of them counts once, and none of
+them is a false positive.
+
+The script exits 1 when no variant produced results. With --baseline, the
+run is compared with a saved one, and it also exits 1 if any of these happens:
+
+- the --baseline file does not exist
+- a variant that ran before is unavailable, or was not run (--variants)
+- latency (overall or per stage) grows by more than --max-slowdown
+- peak RSS grows by more than --max-memory-growth
+- precision or recall drops by more than --max-quality-drop
+
+Timings only compare on the same machine, so write the baseline on the CI
+runner with --update-baseline.
+
+    python bench_variants.py
+    python bench_variants.py --jobs 4 --baseline bench_baseline.json
+    python bench_variants.py --baseline bench_baseline.json --update-baseline
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import time
+from typing import Callable, Dict, List, Set, Tuple
+
+import ioc_scanner
+import mock_vt_server
+import profiling
+from bench_corpus import SAMPLE_REPORT, labeled_report
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIELDS = ('iocs', 'ttps', 'actors', 'malware', 'targets')
+STAGES = ('nlp', 'iocs', 'ttps', 'actors', 'malware', 'vt', 'targets')
+
+# Variant -> environment set in its process before the import
+VARIANTS = {
+    'main': {},
+    'dstest1': {},
+    'dsr1test2': {'NER_ENGINE': 'model'},
+    'dsr1test2-rules': {'NER_ENGINE': 'rules'},
+    'cltest3': {},
+    'cltest3-rules': {},
+    'cltest3-rules-filtered': {},
+}
+
+# Malware of test.pdf, served by the mock next to its own samples. The hashes are placeholders.
+EXTRA_SAMPLES = {
+    name: {'md5': hashlib.md5(name.encode()).hexdigest(), 'sha1': hashlib.sha1(name.encode()).hexdigest(),
+           'sha256': hashlib.sha256(name.encode()).hexdigest(), 'tags': ['rat']}
+    for name in ('crimsonrat', 'obliquerat', 'caprarat', 'margulasrat')
+}
+SAMPLE_NAMES = {attributes['sha256']: name for name, attributes in {**mock_vt_server.SAMPLES, **EXTRA_SAMPLES}.items()}
+
+TTP_CODE = re.compile(r'\bTA?\d{4}(?:\.\d{3})?\b')
+
+
+def timed(profiler: profiling.Profiler, stage: str, function: Callable) -> Callable:
+    def wrapper(*args, **kwargs):
+        with profiler.stage(stage):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def load_main(profiler):
+    import main
+    extractor = main.ThreatIntelligenceExtractor()
+    for stage, method in (('iocs', 'extract_iocs'), ('ttps', 'extract_ttps'), ('actors', 'extract_threat_actors')):
+        setattr(extractor, method, timed(profiler, stage, getattr(extractor, method)))
+    return extractor.extract_threat_intelligence
+
+
+def load_dstest1(profiler):
+    import dstest1
+    import vt_client
+    ioc_scanner.extract_iocs = timed(profiler, 'iocs', ioc_scanner.extract_iocs)
+    dstest1.nlp = timed(profiler, 'nlp', dstest1.nlp)
+    dstest1.MALWARE_RANKER.rank = timed(profiler, 'malware', dstest1.MALWARE_RANKER.rank)
+    client = vt_client.shared_client()
+    client.file_reports = timed(profiler, 'vt', client.file_reports)
+    return dstest1.extract_threat_intelligence
+
+
+def load_dsr1test2(profiler):
+    import dsr1test2
+    dsr1test2.PROFILER = profiler
+    return dsr1test2.extract_threat_intelligence
+
+
+def load_cltest3(profiler, ner='model', ioc_filter=None):
+    from cltest3 import ThreatIntelExtractor
+    return ThreatIntelExtractor(ner=ner, profiler=profiler, ioc_filter=ioc_filter).process_report
+
+
+def load_cltest3_filtered(profiler):
+    from ioc_filter import IocFilter
+    return load_cltest3(profiler, ner='rules', ioc_filter=IocFilter())
+
+
+LOADERS = {
+    'main': load_main,
+    'dstest1': load_dstest1,
+    'dsr1test2': load_dsr1test2,
+    'dsr1test2-rules': load_dsr1test2,
+    'cltest3': load_cltest3,
+    'cltest3-rules': lambda profiler: load_cltest3(profiler, ner='rules'),
+    'cltest3-rules-filtered': load_cltest3_filtered,
+}
+
+
+def predictions(result: Dict) -> Dict[str, Set[str]]:
+    """Each field of a variant's output as a set of case-folded values."""
+    iocs = set()
+    for label, values in result.get('IoCs', {}).items():
+        kind = next((kind for kind in ioc_scanner.IOC_TYPES if kind in label.lower()), label.lower())
+        iocs.update(f'{kind}:{value}'.casefold() for value in values)
+    malware = set()
+    for details in result.get('Malware', []):
+        name = details.get('Name') or SAMPLE_NAMES.get(details.get('id') or details.get('sha256'))
+        if name:
+            malware.add(name.casefold())
+    return {
+        'iocs': iocs,
+        'ttps': {code.casefold() for code in TTP_CODE.findall(json.dumps(result.get('TTPs', {})))},
+        'actors': {name.casefold() for name in result.get('Threat Actor(s)', [])},
+        'malware': malware,
+        'targets': {name.casefold() for name in result.get('Targeted Entities', [])},
+    }
+
+
+def truth_entities(truth: Dict, field: str) -> List[Set[str]]:
+    """Alias sets of the true entities of a field."""
+    if field == 'iocs':
+        return [{f'{kind}:{value}'.casefold()} for kind, values in truth['iocs'].items() for value in values]
+    return [{alias.casefold() for alias in ([entity] if isinstance(entity, str) else entity)}
+            for entity in truth[field]]
+
+
+def score(truth: List[Set[str]], predicted: Set[str]) -> Tuple[int, int, int]:
+    """(true positives, false positives, false negatives)"""
+    unique = []
+    for aliases in truth:
+        if aliases not in unique:
+            unique.append(aliases)
+    found = sum(1 for aliases in unique if aliases & predicted)
+    known = set().union(*unique) if unique else set()
+    return found, len(predicted - known), len(unique) - found
+
+
+def run_variant(task: Tuple[str, List[Tuple[str, str, Dict]]]) -> Dict:
+    """Load one variant in this (fresh) process and run it over the corpus."""
+    name, corpus = task
+    os.environ.update(VARIANTS[name])
+    profiler = profiling.Profiler()
+    start = time.perf_counter()
+    try:
+        analyze = LOADERS[name](profiler)
+        analyze(SAMPLE_REPORT)
+    except Exception as error:  # missing model, ATT&CK index or dependency
+        return {'variant': name, 'status': 'unavailable', 'error': f'{type(error).__name__}: {error}'}
+    startup = time.perf_counter() - start
+
+    before = profiler.totals()
+    latencies = []
+    counts = {field: [0, 0, 0] for field in FIELDS}
+    try:
+        for source, text, truth in corpus:
+            start = time.perf_counter()
+            result = analyze(text)
+            latencies.append(time.perf_counter() - start)
+            predicted = predictions(result)
+            for field in FIELDS:
+                if field in truth:
+                    for i, count in enumerate(score(truth_entities(truth, field), predicted[field])):
+                        counts[field][i] += count
+    except Exception as error:
+        return {'variant': name, 'status': 'failed', 'error': f'{source}: {type(error).__name__}: {error}'}
+
+    stages = {}
+    for stage, totals in profiler.totals().items():
+        wall = totals.wall - (before[stage].wall if stage in before else 0.0)
+        if stage in STAGES and wall > 0:
+            stages[stage] = wall / len(corpus) * 1000
+    quality = {}
+    for field, (found, false, missed) in counts.items():
+        if found + false + missed:
+            quality[field] = {'precision': found / (found + false) if found + false else 1.0,
+                              'recall': found / (found + missed) if found + missed else 1.0}
+    seconds = sum(latencies)
+    return {
+        'variant': name,
+        'status': 'ok',
+        'startup_s': startup,
+        'reports': len(corpus),
+        'reports_per_s': len(corpus) / seconds,
+        'kb_per_s': sum(len(text) for _, text, _ in corpus) / 1024 / seconds,
+        'mean_ms': seconds / len(corpus) * 1000,
+        'p95_ms': sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000,
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stages_ms': stages,
+        'quality': quality,
+    }
+
+
+def corpus(reports: int, size_kb: int) -> List[Tuple[str, str, Dict]]:
+    """(source, text, truth) of the synthetic reports, test.pdf and the entity sentences."""
+    import pdf_source
+    items = []
+    for i in range(reports):
+        text, truth = labeled_report(size_kb * 1024, seed=i)
+        items.append((f'synthetic-{i}', text, truth))
+    with open(os.path.join(HERE, 'golden_test_pdf.json'), encoding='utf-8') as file:
+        golden = json.load(file)
+    text = ''.join(pdf_source.iter_pdf_pages(os.path.join(HERE, golden.pop('source'))))
+    items.append(('test.pdf', text, golden))
+    with open(os.path.join(HERE, 'entity_corpus.jsonl'), encoding='utf-8') as file:
+        for i, line in enumerate(file):
+            example = json.loads(line)
+            items.append((f'entity_corpus:{i + 1}', example['text'],
+                          {'actors': example['actors'], 'targets': example['targets']}))
+    return items
+
+
+def regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], args) -> List[str]:
+    found = []
+    for name, old in baseline.items():
+        new = results.get(name)
+        if old['status'] != 'ok':
+            continue
+        if new is None:
+            found.append(f'{name}: not run')
+            continue
+        if new['status'] != 'ok':
+            found.append(f'{name}: {new["status"]} ({new["error"]})')
+            continue
+
+        def slower(label, old_ms, new_ms):
+            if new_ms > old_ms * (1 + args.max_slowdown) and new_ms - old_ms > args.min_ms:
+                found.append(f'{name}: {label} {old_ms:.1f} -> {new_ms:.1f} ms/report')
+
+        slower('latency', old['mean_ms'], new['mean_ms'])
+        for stage, old_ms in old['stages_ms'].items():
+            slower(f'{stage} stage', old_ms, new['stages_ms'].get(stage, 0.0))
+        if new['peak_rss_mib'] > old['peak_rss_mib'] * (1 + args.max_memory_growth):
+            found.append(f'{name}: peak RSS {old["peak_rss_mib"]:.0f} -> {new["peak_rss_mib"]:.0f} MiB')
+        for field, old_quality in old['quality'].items():
+            for metric, old_value in old_quality.items():
+                new_value = new['quality'].get(field, {}).get(metric, 0.0)
+                if old_value - new_value > args.max_quality_drop:
+                    found.append(f'{name}: {field} {metric} {old_value:.3f} -> {new_value:.3f}')
+    return found
+
+
+def print_results(results: Dict[str, Dict]):
+    print(f'{"variant":<24}{"startup s":>10}{"reports/s":>11}{"KB/s":>9}{"mean ms":>9}{"p95 ms":>9}{"peak MiB":>10}')
+    for name, result in results.items():
+        if result['status'] != 'ok':
+            print(f'{name:<24}{result["status"]}: {result["error"]}')
+            continue
+        print(f'{name:<24}{result["startup_s"]:>10.2f}{result["reports_per_s"]:>11.1f}{result["kb_per_s"]:>9.0f}'
+              f'{result["mean_ms"]:>9.1f}{result["p95_ms"]:>9.1f}{result["peak_rss_mib"]:>10.0f}')
+    ran = {name: result for name, result in results.items() if result['status'] == 'ok'}
+    print('\nms/report by stage (- = not measured)')
+    print(f'{"variant":<24}' + ''.join(f'{stage:>9}' for stage in STAGES))
+    for name, result in ran.items():
+        print(f'{name:<24}' + ''.join(f'{result["stages_ms"][stage]:>9.2f}' if stage in result['stages_ms']
+                                      else f'{"-":>9}' for stage in STAGES))
+    print('\nprecision / recall')
+    print(f'{"variant":<24}' + ''.join(f'{field:>13}' for field in FIELDS))
+    for name, result in ran.items():
+        quality = result['quality']
+        print(f'{name:<24}' + ''.join(
+            f'{quality[field]["precision"]:>7.2f}/{quality[field]["recall"]:.2f}' if field in quality
+            else f'{"-":>13}' for field in FIELDS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='variants run in parallel')
+    parser.add_argument('--reports', type=int, default=20, help='synthetic reports')
+    parser.add_argument('--size-kb', type=int, default=8)
+    parser.add_argument('--vt-latency', type=float, default=0.0, help='seconds the mock VirusTotal waits per request')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='write this run to --baseline')
+    parser.add_argument('--max-slowdown', type=float, default=0.25)
+    parser.add_argument('--min-ms', type=float, default=0.5, help='ignore slowdowns smaller than this')
+    parser.add_argument('--max-memory-growth', type=float, default=0.25)
+    parser.add_argument('--max-quality-drop', type=float, default=0.02)
+    args = parser.parse_args()
+    if args.update_baseline and not args.baseline:
+        parser.error('--update-baseline needs --baseline PATH')
+    if args.baseline and not args.update_baseline and not os.path.exists(args.baseline):
+        parser.error(f'no baseline at {args.baseline}; write one with --update-baseline')
+
+    mock_vt_server.SAMPLES.update(EXTRA_SAMPLES)
+    server = mock_vt_server.start(latency=args.vt_latency)
+    # Inherited by the spawned variant processes
+    os.environ.update(VT_BASE_URL=f'http://127.0.0.1:{server.server_address[1]}/api/v3',
+                      VIRUSTOTAL_API_KEY='bench', VT_TIER='unlimited', VT_CACHE_PATH=':memory:',
+                      RESULT_CACHE_ITEMS='0', RESULT_CACHE_PATH='')
+
+    items = corpus(args.reports, args.size_kb)
+    print(f'{len(items)} reports ({sum(len(text) for _, text, _ in items) / 1024:.0f} KB); '
+          f'{len(args.variants)} variants, {args.jobs} at a time\n')
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(min(args.jobs, len(args.variants)), maxtasksperchild=1) as pool:
+        done = {result['variant']: result
+                for result in pool.imap_unordered(run_variant, [(name, items) for name in args.variants])}
+    results = {name: done[name] for name in args.variants}
+    print_results(results)
+    if not any(result['status'] == 'ok' for result in results.values()):
+        print('\nno variant produced results')
+        sys.exit(1)
+
+    if not args.baseline:
+        return
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f'\nbaseline written to {args.baseline}')
+        return
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    found = regressions(results, baseline, args)
+    if found:
+        print('\nregressions against ' + args.baseline + ':\n  ' + '\n  '.join(found))
+        sys.exit(1)
+    print(f'\nno regressions against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
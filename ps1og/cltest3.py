@@ -1,28 +1,114 @@
 import re
 import json
-import requests
-from typing import Dict, List, Any
-import spacy
+import argparse
+import sys
+import copy
+import multiprocessing
+from multiprocessing.context import BaseContext
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Any, Optional, Tuple
 from collections import defaultdict
 import os
 from dotenv import load_dotenv
+import ioc_scanner
+from analysis import AnalysisContext, EntityHit, ReportHits, lazy_pipeline
+from ioc_scanner import IocMatch
+from batch import map_batches
+import attack_index
+import entity_rules
+from keyword_matcher import KeywordMatch, group_ttps, ttp_matcher
+from malware_candidates import MalwareRanker, RankedCandidates
+import result_cache
+import result_sink
+import prefork
+import profiling
+import sharding
+
+# spaCy (and vt_client's requests) are imported on first use so IoC/TTP-only
+# runs start without them; so is NumPy, for the optional IoC filter and TTP scorer
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
+    from ioc_filter import IocFilter
+    from semantic_ttps import SemanticTtpMatcher
 
 # Load environment variables
 load_dotenv()
 
 class ThreatIntelExtractor:
-    def __init__(self):
-        # Initialize spaCy model
-        self.nlp = spacy.load("en_core_web_sm")
+    # Bump whenever extraction logic changes; part of the result cache key
+    EXTRACTOR_VERSION = '5'
+
+    # Extraction stages in output order, with the result key each one fills
+    STAGES = {
+        'iocs': 'IoCs',
+        'ttps': 'TTPs',
+        'actors': 'Threat Actor(s)',
+        'malware': 'Malware',
+        'targets': 'Targeted Entities'
+    }
+
+    # spaCy components each NLP-based stage reads from the shared Doc
+    NLP_COMPONENTS = {
+        'targets': {'ner'}
+    }
+
+    # Entity engines for the NLP-based stages: the statistical spaCy model, or
+    # the gazetteer rules of entity_rules.py (no tagger/parser, much faster)
+    NER_ENGINES = ('model', 'rules')
+
+    # Threat actor naming patterns (e.g., APT + number) beyond the ATT&CK groups
+    ACTOR_PATTERN = re.compile(r'APT\d+|[A-Z][a-z]+ Team|[A-Z][a-z]+ Group')
+
+    # Legacy malware heuristic; its names are only proposals for the ranker
+    MALWARE_PATTERN = re.compile(r'(?:malware|ransomware|trojan)\s+(?:called|named)?\s+([A-Za-z0-9-]+)', re.IGNORECASE)
+
+    # Entity labels reported as targets, and sector phrases looked up verbatim
+    TARGET_LABELS = ('ORG', 'GPE')
+    TARGET_SECTORS = ('energy sector', 'financial sector', 'healthcare sector')
+
+    # Longer reports are parsed in sentence-aligned shards (sharding.py); spaCy
+    # refuses texts over its max_length (1,000,000 characters by default)
+    MAX_DOC_CHARS = 500_000
+
+    def __init__(self, stages: Optional[Iterable[str]] = None, ner: str = 'model',
+                 profiler: Optional[profiling.Profiler] = None, ioc_filter: Optional['IocFilter'] = None,
+                 ttp_scorer: Optional['SemanticTtpMatcher'] = None):
+        # Stages to run; defaults to all of them
+        stages = set(self.STAGES if stages is None else stages)
+        unknown = stages.difference(self.STAGES)
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+        self.stages = [stage for stage in self.STAGES if stage in stages]
+        self.nlp_stages = [stage for stage in self.stages if stage in self.NLP_COMPONENTS]
+        if ner not in self.NER_ENGINES:
+            raise ValueError(f"Unknown NER engine: {ner}")
+        self.ner = ner
+
+        # Per-stage timings; disabled unless a profiler is passed in
+        self.profiler = profiler or profiling.DISABLED
+
+        # Single-pass automaton over the mappings and, when built, the ATT&CK index
+        self.attack_index = attack_index.try_load_index()
+
+        # spaCy model with only the components the selected stages need (or the
+        # rule pipeline), loaded the first time one of them parses a report
+        if ner == 'rules':
+            self.nlp = entity_rules.lazy_rule_pipeline(self.attack_index)
+        else:
+            self.nlp = lazy_pipeline("en_core_web_sm", *(self.NLP_COMPONENTS[stage] for stage in self.nlp_stages))
         
         # Initialize VirusTotal API key
         self.vt_api_key = os.getenv('VIRUSTOTAL_API_KEY')
         
-        # Compile regex patterns
-        self.ip_pattern = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
-        self.domain_pattern = re.compile(r'\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b')
-        self.email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
-        self.hash_pattern = re.compile(r'\b[A-Fa-f0-9]{32,64}\b')
+        # Batch validation and canonicalization of IoC candidates (ioc_filter.py); off by default
+        self.ioc_filter = ioc_filter
+
+        # Output keys for the single-pass IoC scanner
+        self.ioc_labels = {
+            'ip': 'IP addresses',
+            'domain': 'Domains',
+            'email': 'Email addresses',
+            'hash': 'Hashes'
+        }
 
         # MITRE ATT&CK mapping (simplified example)
         self.mitre_tactics = {
@@ -36,113 +122,364 @@ class ThreatIntelExtractor:
             'powershell': 'T1059.001'
         }
 
+        self.ttp_matcher = ttp_matcher(self.mitre_tactics, self.mitre_techniques, self.attack_index)
+
+        # Confidence-scored techniques by sentence similarity (semantic_ttps.py); off by default
+        self.ttp_scorer = ttp_scorer
+
+        # Scores malware names so only likely families reach VirusTotal
+        self.malware_ranker = MalwareRanker(self.attack_index)
+
+        # Results keyed by report content; any change to the rules or model changes the ruleset
+        self.result_cache = result_cache.from_env(result_cache.fingerprint(
+            self.EXTRACTOR_VERSION, ioc_scanner.IOC_PATTERN.pattern, self.stages, self.ioc_labels,
+            self.mitre_tactics, self.mitre_techniques,
+            result_cache.model_fingerprint(self.nlp.model, self.nlp.requested_components),
+            self.attack_index.fingerprint() if self.attack_index else None,
+            self.ioc_filter.fingerprint() if self.ioc_filter else None,
+            self.ttp_scorer.fingerprint() if self.ttp_scorer else None
+        ))
+
+    def for_worker(self) -> 'ThreatIntelExtractor':
+        """Shallow copy for a forked worker process (prefork.py): shares the loaded model,
+        index and matchers, with its own result cache and no profiler"""
+        worker = copy.copy(self)
+        worker.profiler = profiling.DISABLED
+        worker.result_cache = result_cache.from_env(self.result_cache.ruleset)
+        return worker
+
+    def worker_pool_setup(self, share_model: bool = True) -> Tuple[BaseContext, Callable, tuple]:
+        """Context, initializer and initargs for a pool of worker processes: preforked workers
+        sharing this extractor's loaded state, or (share_model False, or no fork) workers
+        that each build their own extractor"""
+        if share_model and prefork.available():
+            return prefork.worker_setup(self, _init_shared_worker)
+        return (multiprocessing.get_context(), _init_worker,
+                (self.stages, self.ner, self.ioc_filter, self.ttp_scorer))
+
     def get_malware_details(self, malware_name: str) -> Dict:
         """Get malware details from VirusTotal API"""
         if not self.vt_api_key:
             return {}
+        return self.get_malware_details_batch([malware_name])[malware_name]
 
-        headers = {'x-apikey': self.vt_api_key}
-        url = f'https://www.virustotal.com/api/v3/search?query={malware_name}'
-        
-        try:
-            response = requests.get(url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                # Process and return relevant malware details
-                return data.get('data', {})
-            return {}
-        except Exception as e:
-            print(f"Error fetching malware details: {e}")
-            return {}
+    def get_malware_details_batch(self, malware_names: List[str]) -> Dict[str, Dict]:
+        """Get malware details for many names with concurrent, cached VirusTotal searches"""
+        if not self.vt_api_key:
+            return {name: {} for name in malware_names}
+        import vt_client
+        with self.profiler.stage('vt'):
+            responses = vt_client.shared_client().searches(malware_names)
+        return {name: (data or {}).get('data', {}) for name, data in responses.items()}
+
+    async def get_malware_details_async(self, malware_names: List[str]) -> Dict[str, Dict]:
+        """get_malware_details_batch() for asyncio code: awaits the searches without blocking the event loop"""
+        if not self.vt_api_key:
+            return {name: {} for name in malware_names}
+        import vt_client
+        responses = await vt_client.shared_client().searches_async(malware_names)
+        return {name: (data or {}).get('data', {}) for name, data in responses.items()}
+
+    def scan_iocs(self, text: str) -> List[IocMatch]:
+        """Positioned IoC matches, validated by the IoC filter if there is one"""
+        if self.ioc_filter:
+            return self.ioc_filter.scan_batch([text])[0]
+        return list(ioc_scanner.scan_iocs(text))
 
-    def extract_iocs(self, text: str) -> Dict[str, List[str]]:
+    def extract_iocs(self, text: str, matches: Optional[List[IocMatch]] = None) -> Dict[str, List[str]]:
         """Extract IoCs from text"""
-        return {
-            'IP addresses': list(set(re.findall(self.ip_pattern, text))),
-            'Domains': list(set(re.findall(self.domain_pattern, text))),
-            'Email addresses': list(set(re.findall(self.email_pattern, text))),
-            'Hashes': list(set(re.findall(self.hash_pattern, text)))
-        }
+        if matches is None:
+            matches = self.scan_iocs(text)
+        return ioc_scanner.group_iocs(matches, self.ioc_labels, unique=True)
 
-    def extract_ttps(self, text: str) -> Dict[str, List]:
-        """Extract TTPs from text"""
-        doc = self.nlp(text.lower())
-        
-        tactics = []
-        techniques = []
-        
-        # Extract tactics and techniques based on keyword matching
-        for tactic, code in self.mitre_tactics.items():
-            if tactic in text.lower():
-                tactics.append([code, tactic.title()])
-                
-        for technique, code in self.mitre_techniques.items():
-            if technique in text.lower():
-                techniques.append([code, technique.title()])
-        
-        return {
-            'Tactics': tactics,
-            'Techniques': techniques
-        }
+    def extract_ttps(self, text: str, matches: Optional[List[KeywordMatch]] = None,
+                     doc: Optional['Doc'] = None) -> Dict[str, List]:
+        """Extract TTPs from text; with a TTP scorer, also 'Scored techniques' [[id, name, confidence]]"""
+        if matches is None:
+            matches = self.ttp_matcher.findall(text)
+        ttps = group_ttps(matches)
+        if self.ttp_scorer:
+            ttps['Scored techniques'] = self.ttp_scorer.group(self.ttp_scorer.score(text, doc))
+        return ttps
 
-    def extract_threat_actors(self, text: str) -> List[str]:
+    def extract_threat_actors(self, text: str, matches: Optional[List[KeywordMatch]] = None) -> List[str]:
         """Extract threat actor names"""
-        doc = self.nlp(text)
-        threat_actors = []
+        if matches is None:
+            matches = self.ttp_matcher.findall(text)
+        # ATT&CK group names and aliases found by the keyword automaton
+        threat_actors = [match.payload[2] for match in matches if match.payload[0] == 'group']
         
         # Look for potential threat actor patterns (e.g., APT + number)
-        apt_pattern = re.compile(r'APT\d+|[A-Z][a-z]+ Team|[A-Z][a-z]+ Group')
-        threat_actors.extend(re.findall(apt_pattern, text))
+        threat_actors.extend(self.ACTOR_PATTERN.findall(text))
         
         return list(set(threat_actors))
 
-    def extract_targeted_entities(self, text: str) -> List[str]:
+    def extract_targeted_entities(self, text: str, doc: Optional['Doc'] = None) -> List[str]:
         """Extract targeted entities and sectors"""
-        doc = self.nlp(text)
+        if doc is None:
+            doc = self.nlp(text)
         targets = []
         
         # Look for organization names and industry sectors
         for ent in doc.ents:
-            if ent.label_ in ['ORG', 'GPE']:
+            if ent.label_ in self.TARGET_LABELS:
                 targets.append(ent.text)
+            elif ent.label_ == 'SECTOR':
+                targets.append(entity_rules.entity_name(ent))
                 
         # Look for specific sector mentions
-        sectors = ['energy sector', 'financial sector', 'healthcare sector']
-        for sector in sectors:
+        for sector in self.TARGET_SECTORS:
             if sector.lower() in text.lower():
                 targets.append(sector.title())
                 
         return list(set(targets))
 
-    def process_report(self, report_text: str) -> Dict[str, Any]:
+    def process_report(self, report_text: str, doc: Optional['Doc'] = None,
+                       report_id: Optional[str] = None) -> Dict[str, Any]:
         """Process the entire threat report and extract all intelligence data"""
-        # Extract all components
-        iocs = self.extract_iocs(report_text)
-        ttps = self.extract_ttps(report_text)
-        threat_actors = self.extract_threat_actors(report_text)
-        targeted_entities = self.extract_targeted_entities(report_text)
-        
-        # Extract malware names and get details
+        with self.profiler.report(report_id):
+            return self.result_cache.get_or_compute(report_text, lambda text: self._analyze_report(text, doc))
+
+    def process_large_report(self, report_text: str, n_process: int = 1,
+                             shard_size: int = sharding.DEFAULT_SHARD_SIZE,
+                             report_id: Optional[str] = None) -> Dict[str, Any]:
+        """process_report() for one very large report: its shards are analyzed across
+        n_process worker processes and merged (sharding.py); no result cache"""
+        with self.profiler.report(report_id):
+            return sharding.analyze_sharded(self, report_text, n_process, shard_size)
+
+    def _needs_shards(self, report_text: str) -> bool:
+        return bool(self.nlp_stages) and len(report_text) > self.MAX_DOC_CHARS
+
+    def analyze_offline(self, report_text: str) -> Dict[str, Any]:
+        """process_report() without the VirusTotal lookups or the result cache: 'Malware'
+        holds the candidate names, for get_malware_details_async() to resolve (pipeline.py)"""
+        with self.profiler.report():
+            return self._analyze_report(report_text, lookup=False)
+
+    def _analyze_report(self, report_text: str, doc: Optional['Doc'] = None, lookup: bool = True,
+                        iocs: Optional[List[IocMatch]] = None) -> Dict[str, Any]:
+        """Run every extraction stage over a report (no result caching)"""
+        if doc is None and self._needs_shards(report_text):
+            return sharding.analyze_sharded(self, report_text, lookup=lookup)
+        # Parse once (only if an NLP-based stage runs) and share the Doc
+        context = AnalysisContext(self.nlp, report_text, doc)
+        if self.nlp_stages and doc is None:
+            with self.profiler.stage('nlp'):
+                context.doc
+        stages = {
+            'iocs': lambda: self.extract_iocs(report_text, iocs),
+            'ttps': lambda: self.extract_ttps(report_text, context.keyword_matches(self.ttp_matcher),
+                                              context.doc if self.nlp_stages else None),
+            'actors': lambda: self.extract_threat_actors(report_text, context.keyword_matches(self.ttp_matcher)),
+            'targets': lambda: self.extract_targeted_entities(report_text, context.doc)
+        }
+        results = {}
+        for stage in self.stages:
+            with self.profiler.stage(stage):
+                if stage == 'malware':
+                    # NER labels only count when the Doc is parsed for another stage anyway
+                    ranked = self.rank_malware(report_text, context.doc if self.nlp_stages else None,
+                                               context.keyword_matches(self.ttp_matcher))
+                    results['Malware'] = self.extract_malware(report_text, ranked) if lookup else ranked.names
+                    results['Malware lookups'] = ranked.summary()
+                else:
+                    results[self.STAGES[stage]] = stages[stage]()
+        return results
+
+    def find_hits(self, text: str, doc: Optional['Doc'] = None, offset: int = 0) -> ReportHits:
+        """Every hit of the selected stages with its position (plus offset), for
+        consumers that keep offsets: incremental.py and the columnar record sinks"""
+        stages = set(self.stages)
+        if doc is None and self.nlp_stages:
+            with self.profiler.stage('nlp'):
+                doc = self.nlp(text)
+        hits = ReportHits([], [], [], [])
+        if 'iocs' in stages:
+            with self.profiler.stage('iocs'):
+                hits.iocs.extend(match._replace(start=match.start + offset, end=match.end + offset)
+                                 for match in self.scan_iocs(text))
+        if stages.intersection(('ttps', 'actors', 'malware')):
+            with self.profiler.stage('ttps'):
+                hits.keywords.extend(match._replace(start=match.start + offset, end=match.end + offset)
+                                     for match in self.ttp_matcher.finditer(text))
+        if 'actors' in stages:
+            with self.profiler.stage('actors'):
+                hits.entities.extend(EntityHit('THREAT_ACTOR', match.group(), match.start() + offset,
+                                               match.end() + offset)
+                                     for match in self.ACTOR_PATTERN.finditer(text))
+        if 'malware' in stages:
+            hits.proposed.extend(EntityHit('MALWARE', match.group(1), match.start() + offset, match.end() + offset)
+                                 for match in self.MALWARE_PATTERN.finditer(text))
+        if 'targets' in stages:
+            with self.profiler.stage('targets'):
+                for ent in doc.ents:
+                    if ent.label_ == 'SECTOR':
+                        name = entity_rules.entity_name(ent)
+                    elif ent.label_ in self.TARGET_LABELS:
+                        name = ent.text
+                    else:
+                        continue
+                    hits.entities.append(EntityHit(ent.label_, name, ent.start_char + offset,
+                                                   ent.end_char + offset))
+                lowered = text.lower()
+                for sector in self.TARGET_SECTORS:
+                    i = lowered.find(sector)
+                    while i >= 0:
+                        hits.entities.append(EntityHit('SECTOR', sector.title(), i + offset,
+                                                       i + len(sector) + offset))
+                        i = lowered.find(sector, i + 1)
+        return hits
+
+    def rank_malware(self, text: str, doc: Optional['Doc'] = None,
+                     matches: Optional[List[KeywordMatch]] = None) -> RankedCandidates:
+        """Dedupe, score and filter malware-name candidates before any lookup"""
+        if matches is None:
+            matches = self.ttp_matcher.findall(text)
+        actors = [match.payload[2] for match in matches if match.payload[0] == 'group']
+        return self.malware_ranker.rank(text, doc, self.MALWARE_PATTERN.findall(text), exclude=actors)
+
+    def extract_malware(self, text: str, ranked: Optional[RankedCandidates] = None) -> List[Dict]:
+        """Extract malware names and get their details"""
+        if ranked is None:
+            ranked = self.rank_malware(text)
         malware_details = []
-        malware_pattern = re.compile(r'(?:malware|ransomware|trojan)\s+(?:called|named)?\s+([A-Za-z0-9-]+)', re.IGNORECASE)
-        malware_matches = malware_pattern.findall(report_text)
-        
-        for malware_name in malware_matches:
-            details = self.get_malware_details(malware_name)
+        malware_lookups = self.get_malware_details_batch(ranked.names)
+        for malware_name in ranked.names:
+            details = malware_lookups[malware_name]
             if details:
                 malware_details.append(details)
-        
-        return {
-            'IoCs': iocs,
-            'TTPs': ttps,
-            'Threat Actor(s)': threat_actors,
-            'Malware': malware_details,
-            'Targeted Entities': targeted_entities
-        }
+        return malware_details
 
-def main():
-    # Example usage
-    report_text = '''
+    def process_batch(self, reports: List[str]) -> List[Dict[str, Any]]:
+        """Process a batch of reports with a single batched nlp.pipe call"""
+        # Only reports not already in the result cache are parsed
+        with self.profiler.stage('cache'):
+            results = [self.result_cache.get(text) for text in reports]
+        misses = [i for i, result in enumerate(results) if result is None]
+        # The IoC filter validates the candidates of all misses in one pass
+        iocs = {}
+        if self.ioc_filter and 'iocs' in self.stages:
+            with self.profiler.stage('iocs'):
+                iocs = dict(zip(misses, self.ioc_filter.scan_batch([reports[i] for i in misses])))
+        docs = None
+        if self.nlp_stages:
+            docs = iter(self.nlp.pipe((reports[i] for i in misses if not self._needs_shards(reports[i])),
+                                      batch_size=len(reports)))
+        # One profiler report per input, in order; nlp.pipe parses a whole
+        # batch on the first next(), so that report carries the batch's nlp time
+        for i, text in enumerate(reports):
+            with self.profiler.report():
+                if results[i] is not None:
+                    continue
+                doc = None
+                if docs is not None and not self._needs_shards(text):
+                    with self.profiler.stage('nlp'):
+                        doc = next(docs)
+                results[i] = self._analyze_report(text, doc, iocs=iocs.get(i))
+                self.result_cache.put(text, results[i])
+        return results
+
+    def extract_records(self, report_text: str, report_id: str, doc: Optional['Doc'] = None) -> List[result_sink.Record]:
+        """Flat (report_id, type, value, offset) records for one report; no nested dicts, no result cache"""
+        evidence = None
+        if doc is None and self._needs_shards(report_text):
+            hits, evidence = sharding.find_hits_sharded(self, report_text)
+        else:
+            if doc is None and self.nlp_stages:
+                with self.profiler.stage('nlp'):
+                    doc = self.nlp(report_text)
+            hits = self.find_hits(report_text, doc)
+        malware = []
+        if 'malware' in self.stages:
+            with self.profiler.stage('malware'):
+                groups = [match.payload[2] for match in hits.keywords if match.payload[0] == 'group']
+                if evidence is None:
+                    evidence = self.malware_ranker.collect(report_text, doc, [hit.name for hit in hits.proposed])
+                ranked = self.malware_ranker.select(evidence, exclude=groups)
+                details = self.get_malware_details_batch(ranked.names)
+                malware = [name for name in ranked.names if details[name]]
+        types = {kind for stage in self.stages for kind in result_sink.STAGE_RECORD_TYPES[stage]}
+        return list(result_sink.report_records(report_id, hits, malware, types))
+
+    def records_batch(self, items: List[Tuple[str, str]]) -> List[List[result_sink.Record]]:
+        """Records for a batch of (report_id, text) pairs with a single batched nlp.pipe call"""
+        docs = None
+        if self.nlp_stages:
+            docs = iter(self.nlp.pipe((text for _, text in items if not self._needs_shards(text)),
+                                      batch_size=len(items)))
+        records = []
+        for report_id, text in items:
+            with self.profiler.report(report_id):
+                doc = None
+                if docs is not None and not self._needs_shards(text):
+                    with self.profiler.stage('nlp'):
+                        doc = next(docs)
+                records.append(self.extract_records(text, report_id, doc))
+        return records
+
+    def process_records(self, items: Iterable[Tuple[str, str]], batch_size: int = 32,
+                        n_process: int = 1, share_model: bool = True) -> Iterator[List[result_sink.Record]]:
+        """Stream (report_id, text) pairs to per-report record lists, in input order"""
+        if n_process == 1:
+            return map_batches(self.records_batch, items, batch_size)
+        context, initializer, initargs = self.worker_pool_setup(share_model)
+        return map_batches(_records_batch, items, batch_size, n_process, initializer, initargs,
+                           mp_context=context)
+
+    def process_reports(self, reports: Iterable[str], batch_size: int = 32,
+                        n_process: int = 1, share_model: bool = True) -> Iterator[Dict[str, Any]]:
+        """Process a stream of reports, yielding results in input order.
+
+        With n_process > 1 the workers run the spaCy, regex and TTP stages on
+        their batches; only results travel back. They share this extractor's
+        loaded model copy-on-write (prefork.py), or with share_model False each
+        loads its own.
+        """
+        if n_process == 1:
+            return map_batches(self.process_batch, reports, batch_size)
+        context, initializer, initargs = self.worker_pool_setup(share_model)
+        return map_batches(_process_batch, reports, batch_size, n_process, initializer, initargs,
+                           mp_context=context)
+
+
+# Per-process extractor used by process_reports workers
+_worker_extractor = None
+
+
+def _init_worker(stages: List[str], ner: str = 'model', ioc_filter: Optional['IocFilter'] = None,
+                 ttp_scorer: Optional['SemanticTtpMatcher'] = None):
+    global _worker_extractor
+    _worker_extractor = ThreatIntelExtractor(stages, ner, ioc_filter=ioc_filter, ttp_scorer=ttp_scorer)
+
+
+def _init_shared_worker(extractor: ThreatIntelExtractor):
+    global _worker_extractor
+    _worker_extractor = extractor.for_worker()
+
+
+def _process_batch(reports: List[str]) -> List[Dict[str, Any]]:
+    return _worker_extractor.process_batch(reports)
+
+
+def _analyze_offline(report_text: str) -> Dict[str, Any]:
+    return _worker_extractor.analyze_offline(report_text)
+
+
+def _records_batch(items: List[Tuple[str, str]]) -> List[List[result_sink.Record]]:
+    return _worker_extractor.records_batch(items)
+
+
+def read_reports(paths: Iterable[str], profiler: profiling.Profiler = profiling.DISABLED) -> Iterator[str]:
+    """Lazily read report files so only in-flight batches are held in memory"""
+    for path in paths:
+        with profiler.stage('io'), open(path, 'r', encoding='utf-8') as file:
+            text = file.read()
+        yield text
+
+
+# Report used when no paths are given
+EXAMPLE_REPORT = '''
     The APT33 group, suspected to be from Iran, has launched a new campaign targeting
     the energy sector organizations.
     The attack utilizes Shamoon malware, known for its destructive capabilities. The threat
@@ -152,10 +489,138 @@ def main():
     192.168.1.1 and domain example.com. The attack also involved lateral movement using
     PowerShell scripts.
     '''
-    
-    extractor = ThreatIntelExtractor()
+
+
+def parse_stages(value: str) -> List[str]:
+    stages = value.split(',')
+    unknown = set(stages).difference(ThreatIntelExtractor.STAGES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stages: {', '.join(sorted(unknown))}")
+    return stages
+
+
+def parse_ioc_filter(value: str) -> 'IocFilter':
+    from ioc_filter import FLAG_NAMES, IocFilter
+    try:
+        return IocFilter.from_names(value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"flags are {', '.join(FLAG_NAMES)}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Extract threat intelligence from reports')
+    parser.add_argument('paths', nargs='*', help='report files; one JSON result per line is printed')
+    parser.add_argument('--batch-size', type=int, default=32, help='reports per nlp.pipe batch')
+    parser.add_argument('--n-process', type=int, default=1, help='worker processes')
+    parser.add_argument('--no-shared-model', dest='share_model', action='store_false',
+                        help='let every worker process load its own model instead of sharing the parent\'s')
+    parser.add_argument('--shard-processes', type=int, metavar='N',
+                        help='analyze each report in sentence-aligned shards across N worker processes '
+                             '(for very large single reports)')
+    parser.add_argument('--only', type=parse_stages, metavar='STAGES',
+                        help=f"comma-separated stages to run ({','.join(ThreatIntelExtractor.STAGES)}); "
+                             "iocs,ttps never loads spaCy")
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='model',
+                        help='statistical spaCy model, or fast gazetteer rules (entity_rules.py)')
+    parser.add_argument('--drop-iocs', type=parse_ioc_filter, metavar='FLAGS',
+                        help='validate IoCs in batches, canonicalize them and drop the flagged ones: '
+                             'invalid,version,tld,private,reserved')
+    parser.add_argument('--semantic-ttps', action='store_true',
+                        help='also score techniques by sentence similarity to their ATT&CK descriptions '
+                             '(semantic_ttps.py; needs the ATT&CK index)')
+    parser.add_argument('--min-ttp-confidence', type=float, metavar='SCORE',
+                        help='lowest confidence of a scored technique (default 0.25)')
+    parser.add_argument('--records', metavar='PATH',
+                        help='write flat (report_id, type, value, offset) records instead of nested JSON: '
+                             '.parquet, .arrow/.feather, anything else (or -) for JSON lines')
+    parser.add_argument('--record-batch-rows', type=int, default=result_sink.DEFAULT_BATCH_ROWS,
+                        help='rows per Parquet/Arrow record batch; bounds memory')
+    parser.add_argument('--profile', action='store_true',
+                        help='print a per-stage breakdown for each report and the batch to stderr')
+    parser.add_argument('--profile-allocations', action='store_true',
+                        help='also count allocations per stage (tracemalloc; slows the run)')
+    parser.add_argument('--profile-sink', action='append', default=[], metavar='SPEC',
+                        help='export spans: jsonl:PATH, prometheus:PATH or otlp[:URL] (repeatable)')
+    args = parser.parse_args()
+    if (args.profile or args.profile_sink) and args.n_process > 1:
+        parser.error('profiling needs --n-process 1')
+    if args.shard_processes and (args.n_process > 1 or args.records):
+        parser.error('--shard-processes cannot be combined with --n-process or --records')
+    return args
+
+
+def load_ttp_scorer(args) -> Optional['SemanticTtpMatcher']:
+    if not args.semantic_ttps:
+        return None
+    import semantic_ttps
+    options = {} if args.min_ttp_confidence is None else {'min_confidence': args.min_ttp_confidence}
+    scorer = semantic_ttps.try_load_matcher(attack_index.try_load_index(), **options)
+    if scorer is None:
+        sys.exit('--semantic-ttps needs the ATT&CK index; run: python attack_index.py build enterprise-attack.json')
+    return scorer
+
+
+def make_profiler(args, labels: List[str]) -> profiling.Profiler:
+    """Profiler for the CLI flags; report ids 1..n are shown as the given labels."""
+    sinks = [profiling.make_sink(spec) for spec in args.profile_sink]
+    if args.profile:
+        sinks.append(profiling.BreakdownSink(labels={str(n): label for n, label in enumerate(labels, 1)}))
+    if not sinks and not args.profile_allocations:
+        return profiling.DISABLED
+    return profiling.Profiler(sinks, track_allocations=args.profile_allocations)
+
+
+def main():
+    args = parse_args()
+    profiler = make_profiler(args, args.paths or ['example'])
+    extractor = ThreatIntelExtractor(args.only, args.ner, profiler, args.drop_iocs, load_ttp_scorer(args))
+    if args.records:
+        write_records(args, extractor, profiler)
+        return
+    if args.paths and args.shard_processes:
+        for path, text in zip(args.paths, read_reports(args.paths, profiler)):
+            print(json.dumps({'report': path, **extractor.process_large_report(text, args.shard_processes)}))
+        print_batch_profile(args, profiler)
+        return
+    if args.paths:
+        results = extractor.process_reports(read_reports(args.paths, profiler), args.batch_size, args.n_process,
+                                            args.share_model)
+        for path, result in zip(args.paths, results):
+            print(json.dumps({'report': path, **result}))
+        print_batch_profile(args, profiler)
+        return
+
+    # Example usage
+    report_text = EXAMPLE_REPORT
     results = extractor.process_report(report_text)
     print(json.dumps(results, indent=2))
+    print_batch_profile(args, profiler)
+
+
+def write_records(args, extractor: ThreatIntelExtractor, profiler: profiling.Profiler):
+    """Stream every report's records into the --records sink"""
+    paths = args.paths or ['example']
+    texts = read_reports(args.paths, profiler) if args.paths else [EXAMPLE_REPORT]
+    sink = result_sink.open_sink(args.records, args.record_batch_rows)
+    try:
+        for records in extractor.process_records(zip(paths, texts), args.batch_size, args.n_process,
+                                                     args.share_model):
+            sink.write(records)
+    finally:
+        sink.close()
+    if args.records != '-':
+        print(f'{sink.rows} records from {len(paths)} reports written to {args.records}', file=sys.stderr)
+    print_batch_profile(args, profiler)
+
+
+def print_batch_profile(args, profiler: profiling.Profiler):
+    if args.profile:
+        print('batch', file=sys.stderr)
+        print(profiling.format_breakdown(profiler.totals()), file=sys.stderr)
+    profiler.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run as the importable module, so worker processes, prefork.py and sharding.py
+    # all see the same _worker_extractor
+    import cltest3
+    cltest3.main()
\ No newline at end of file
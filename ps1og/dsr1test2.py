@@ -1,18 +1,44 @@
 import re
-import requests
-import spacy
-from typing import Dict, List, Union
+import json
+import argparse
+import sys
+from functools import partial
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union
 from dotenv import load_dotenv
 import os
-from PyPDF2 import PdfReader
+import ioc_scanner
+from analysis import AnalysisContext, lazy_pipeline
+from batch import map_batches
+import attack_index
+import entity_rules
+from keyword_matcher import KeywordMatch, group_ttps, ttp_matcher
+from malware_candidates import MalwareRanker, RankedCandidates
+from incremental import sentence_cut
+from stream_scan import collect, scan_chunks
+import record_stream
+import result_cache
+import profiling
+
+# spaCy, PyPDF2 (pdf_source) and requests (vt_client) are imported on first use
+# so importing this module, or IoC/TTP-only work, does not pay for them
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
+    from semantic_ttps import SemanticTtpMatcher
 
 # Load environment variables from the .env file
 load_dotenv()
 
 # Access the VirusTotal API key
 VIRUSTOTAL_API_KEY = os.getenv("VIRUSTOTAL_API_KEY")
-# Load English language model for spaCy
-nlp = spacy.load("en_core_web_sm")
+
+# spaCy components each NLP-based stage reads from the shared Doc
+NLP_COMPONENTS = {
+    'actors': {'ner'},
+    'targets': {'ner', 'parser'}  # sentences and dependency heads
+}
+
+# Per-stage timings, exported to the sinks in PROFILE_SINKS (off when unset)
+PROFILER = profiling.from_env()
 
 MITRE_MAPPINGS = {
     'tactics': {
@@ -27,17 +53,92 @@ MITRE_MAPPINGS = {
     }
 }
 
+# One automaton over the mappings plus, when built, the full ATT&CK vocabulary
+# (techniques, tactics, groups and aliases); see attack_index.py
+ATTACK_INDEX = attack_index.try_load_index()
+ATTACK_MATCHER = ttp_matcher(MITRE_MAPPINGS['tactics'], MITRE_MAPPINGS['techniques'], ATTACK_INDEX)
+
+# NER_ENGINE=rules swaps the statistical model for the gazetteer rules of
+# entity_rules.py (no tagger or parser; faster, lower recall on unknown names)
+NER_ENGINE = os.getenv('NER_ENGINE', 'model')
+
+# English language model for spaCy with unused components disabled, loaded
+# the first time an NLP-based stage parses a report
+if NER_ENGINE == 'rules':
+    nlp = entity_rules.lazy_rule_pipeline(ATTACK_INDEX)
+else:
+    nlp = lazy_pipeline("en_core_web_sm", *NLP_COMPONENTS.values())
+
+# Scores malware names (ATT&CK software gazetteer, context cues, NER) so only
+# likely families are looked up on VirusTotal
+MALWARE_RANKER = MalwareRanker(ATTACK_INDEX)
+
+# Confidence-scored techniques by sentence similarity (semantic_ttps.py); off
+# by default, SEMANTIC_TTPS=1 turns them on when the ATT&CK index is built.
+# NumPy and the technique vectors are loaded when the first report is scored
+SEMANTIC_TTPS = ATTACK_INDEX is not None and os.getenv('SEMANTIC_TTPS', '0') != '0'
+_ttp_scorer: Optional['SemanticTtpMatcher'] = None
+
+# spaCy refuses texts over its max_length (1,000,000 characters by default):
+# longer reports are parsed in sentence-aligned pieces of at most this many
+# characters, joined into one Doc
+MAX_DOC_CHARS = 500_000
+# Delimited records are cut to at most this many bytes, so a missing delimiter
+# cannot pull the rest of the input into memory. JSON lines are never cut.
+MAX_RECORD_BYTES = 500_000
+
+# Bump whenever extraction logic changes; part of the result cache key
+EXTRACTOR_VERSION = '6'
+
+# Results keyed by report content; any change to the rules or model changes the ruleset
+RULESET = result_cache.fingerprint(
+    EXTRACTOR_VERSION, ioc_scanner.IOC_PATTERN.pattern, MITRE_MAPPINGS, ioc_scanner.DEFAULT_LABELS,
+    result_cache.model_fingerprint(nlp.model, nlp.requested_components),
+    ATTACK_INDEX.fingerprint() if ATTACK_INDEX else None,
+    'semantic-ttps' if SEMANTIC_TTPS else None
+)
+
+_result_caches: Dict[int, result_cache.ResultCache] = {}
+# Caches opened by a parent process; kept open but unused in a forked child,
+# since closing an inherited SQLite connection can touch the parent's files
+_inherited_caches: List[result_cache.ResultCache] = []
+
+def shared_result_cache() -> result_cache.ResultCache:
+    """Per-process result cache, opened on first use.
+
+    Workers forked by process_reports open their own instead of using the
+    parent's SQLite connection, which must not cross a fork.
+    """
+    pid = os.getpid()
+    cache = _result_caches.get(pid)
+    if cache is None:
+        _inherited_caches.extend(_result_caches.values())
+        _result_caches.clear()
+        cache = _result_caches[pid] = result_cache.from_env(RULESET)
+    return cache
+
 def extract_text_from_pdf(file_path):
     """Extract text from a PDF file."""
+    from pdf_source import iter_pdf_pages
     try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
+        with PROFILER.stage('io'):
+            return "".join(iter_pdf_pages(file_path))
     except Exception as e:
         raise ValueError(f"Error reading PDF file: {e}")
 
+def extract_indicators_from_pdf(file_path: str, n_process: int = 1) -> Dict[str, Dict]:
+    """Stream a PDF page by page through the IoC and TTP stages without holding its full text."""
+    from pdf_source import iter_pdf_pages
+    scanners = {'iocs': ioc_scanner.scan_iocs, 'ttps': ATTACK_MATCHER.finditer}
+    try:
+        matches = collect(scan_chunks(iter_pdf_pages(file_path, n_process), scanners))
+    except Exception as e:
+        raise ValueError(f"Error reading PDF file: {e}")
+    return {
+        'IoCs': ioc_scanner.group_iocs(matches.get('iocs', []), unique=True),
+        'TTPs': group_ttps(matches.get('ttps', []))
+    }
+
 def extract_text_from_input(input_data):
     """
     Extract text based on the input type (text, file, or PDF).
@@ -55,99 +156,207 @@ def extract_text_from_input(input_data):
     else:
         raise ValueError("Invalid input. Provide text, a text file, or a PDF file.")
     
-def extract_threat_intelligence(report_text: str) -> Dict[str, Union[Dict, List]]:
+def extract_threat_intelligence(report_text: str, doc: Optional['Doc'] = None) -> Dict[str, Union[Dict, List]]:
     """Main function to extract threat intelligence from reports."""
+    with PROFILER.report():
+        return shared_result_cache().get_or_compute(report_text, lambda text: _analyze_report(text, doc))
+
+def _analyze_report(report_text: str, doc: Optional['Doc'] = None) -> Dict[str, Union[Dict, List]]:
+    """Run every extraction stage over a report (no result caching)."""
+    context = AnalysisContext(nlp, report_text, doc)
+    if doc is None:
+        with PROFILER.stage('nlp'):
+            context.doc
+    with PROFILER.stage('iocs'):
+        iocs = extract_iocs(report_text)
+    with PROFILER.stage('ttps'):
+        ttps = extract_ttps(report_text, context.keyword_matches(ATTACK_MATCHER), context.doc)
+    with PROFILER.stage('actors'):
+        actors = extract_threat_actors(report_text, context.doc, context.keyword_matches(ATTACK_MATCHER))
+    with PROFILER.stage('malware'):
+        ranked = rank_malware(report_text, context.doc, actors)
+        malware = extract_malware_info(report_text, ranked)
+    with PROFILER.stage('targets'):
+        targets = extract_targets(report_text, context.doc)
     return {
-        'IoCs': extract_iocs(report_text),
-        'TTPs': extract_ttps(report_text),
-        'Threat Actor(s)': extract_threat_actors(report_text),
-        'Malware': extract_malware_info(report_text),
-        'Targeted Entities': extract_targets(report_text)
+        'IoCs': iocs,
+        'TTPs': ttps,
+        'Threat Actor(s)': actors,
+        'Malware': malware,
+        'Malware lookups': ranked.summary(),
+        'Targeted Entities': targets
     }
 
+def extract_threat_intelligence_batch(reports: List[str]) -> List[Dict[str, Union[Dict, List]]]:
+    """Extract threat intelligence from a batch of reports with one nlp.pipe call."""
+    # Only reports not already in the result cache are parsed
+    with PROFILER.stage('cache'):
+        cache = shared_result_cache()
+        results = [cache.get(text) for text in reports]
+    misses = [i for i, result in enumerate(results) if result is None and len(reports[i]) <= MAX_DOC_CHARS]
+    docs = iter(nlp.pipe((reports[i] for i in misses), batch_size=len(reports)))
+    for i, text in enumerate(reports):
+        with PROFILER.report():
+            if results[i] is not None:
+                continue
+            with PROFILER.stage('nlp'):
+                doc = next(docs) if len(text) <= MAX_DOC_CHARS else parse_long(text)
+            results[i] = _analyze_report(text, doc)
+            cache.put(text, results[i])
+    return results
+
+def parse_long(text: str) -> 'Doc':
+    """One Doc of a text longer than MAX_DOC_CHARS, parsed in sentence-aligned pieces."""
+    from spacy.tokens import Doc
+    pieces = []
+    start = 0
+    while len(text) - start > MAX_DOC_CHARS:
+        cut = sentence_cut(text, start + MAX_DOC_CHARS, MAX_DOC_CHARS // 2)
+        cut = cut if cut > start else start + MAX_DOC_CHARS
+        pieces.append(text[start:cut])
+        start = cut
+    pieces.append(text[start:])
+    return Doc.from_docs(list(nlp.pipe(pieces)), ensure_whitespace=False)
+
+def process_reports(reports: Iterable[str], batch_size: int = 32, n_process: int = 1) -> Iterator[Dict[str, Union[Dict, List]]]:
+    """Stream reports through batched workers, yielding results in input order."""
+    return map_batches(extract_threat_intelligence_batch, reports, batch_size, n_process)
+
+def stream_threat_intelligence(source: str, delimiter: str = record_stream.DEFAULT_DELIMITER,
+                               json_field: Optional[str] = None, batch_size: int = 32,
+                               n_process: int = 1) -> Iterator[Dict[str, Union[Dict, List]]]:
+    """Results for every record of a huge file or stdin ('-'), with memory bounded by the batches in flight.
+
+    Delimited records longer than MAX_RECORD_BYTES are analyzed in pieces; a
+    JSON line is parsed whole and gives one result however long its text. A
+    record that cannot be parsed or analyzed yields {'Error': message} in its place.
+    """
+    if json_field is None:
+        records = record_stream.iter_records(source, delimiter, max_record_bytes=MAX_RECORD_BYTES)
+    else:
+        records = record_stream.iter_records(source, '\n', max_record_bytes=None)
+    return map_batches(partial(_stream_batch, json_field=json_field), records, batch_size, n_process)
+
+def _stream_batch(records: List[str], json_field: Optional[str] = None) -> List[Dict[str, Union[Dict, List, str]]]:
+    """extract_threat_intelligence_batch() over raw records, one failing record at a time."""
+    results: List[Optional[Dict]] = [None] * len(records)
+    texts = {}
+    for i, record in enumerate(records):
+        try:
+            texts[i] = record if json_field is None else record_stream.json_text(record, json_field)
+        except ValueError as e:
+            results[i] = {'Error': str(e)}
+    try:
+        results_by_index = dict(zip(texts, extract_threat_intelligence_batch(list(texts.values()))))
+    except Exception:
+        # Retry one by one so only the failing record is lost
+        results_by_index = {}
+        for i, text in texts.items():
+            try:
+                results_by_index[i] = extract_threat_intelligence(text)
+            except Exception as e:
+                results_by_index[i] = {'Error': str(e)}
+    for i, result in results_by_index.items():
+        results[i] = result
+    return results
+
 def extract_iocs(text: str) -> Dict[str, List]:
-    """Extract Indicators of Compromise using regex patterns."""
-    patterns = {
-        'IP addresses': r'\b(?:\d{1,3}\.){3}\d{1,3}\b',
-        'Domains': r'\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b',
-        'File hashes': r'\b[a-fA-F0-9]{32,}\b',
-        'Email addresses': r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    }
-    return {key: re.findall(pattern, text) for key, pattern in patterns.items()}
+    """Extract Indicators of Compromise in a single scan of the text, each value once."""
+    return ioc_scanner.extract_iocs(text, unique=True)
 
-def extract_ttps(text: str) -> Dict[str, List]:
-    """Identify MITRE ATT&CK TTPs using keyword matching."""
-    tactics = []
-    techniques = []
-    
-    for tactic, code in MITRE_MAPPINGS['tactics'].items():
-        if re.search(rf'\b{tactic}\b', text, re.IGNORECASE):
-            tactics.append([code, tactic.title()])
-    
-    for technique, code in MITRE_MAPPINGS['techniques'].items():
-        if re.search(rf'\b{technique}\b', text, re.IGNORECASE):
-            techniques.append([code, technique.title()])
-    
-    return {'Tactics': tactics, 'Techniques': techniques}
+def extract_ttps(text: str, matches: Optional[List[KeywordMatch]] = None,
+                 doc: Optional['Doc'] = None) -> Dict[str, List]:
+    """Identify MITRE ATT&CK TTPs with one pass of the keyword automaton, plus
+    'Scored techniques' [[id, name, confidence]] by sentence similarity."""
+    if matches is None:
+        matches = ATTACK_MATCHER.findall(text)
+    ttps = group_ttps(matches)
+    scorer = ttp_scorer()
+    if scorer:
+        ttps['Scored techniques'] = scorer.group(scorer.score(text, doc))
+    return ttps
 
-def extract_threat_actors(text: str) -> List[str]:
-    """Detect threat actor groups using NER and patterns."""
-    doc = nlp(text)
-    actors = []
+def ttp_scorer() -> Optional['SemanticTtpMatcher']:
+    """The technique scorer, loaded on first use; None when SEMANTIC_TTPS is off."""
+    global _ttp_scorer
+    if SEMANTIC_TTPS and _ttp_scorer is None:
+        import semantic_ttps
+        _ttp_scorer = semantic_ttps.try_load_matcher(ATTACK_INDEX)
+    return _ttp_scorer
+
+def extract_threat_actors(text: str, doc: Optional['Doc'] = None,
+                          matches: Optional[List[KeywordMatch]] = None) -> List[str]:
+    """Detect threat actor groups using NER, patterns and ATT&CK group aliases."""
+    if doc is None:
+        doc = nlp(text)
+    if matches is None:
+        matches = ATTACK_MATCHER.findall(text)
+    actors = [match.payload[2] for match in matches if match.payload[0] == 'group']
     
     # Look for APT patterns
     apt_pattern = re.compile(r'\bAPT\d+\b', re.IGNORECASE)
     actors.extend(apt_pattern.findall(text))
     
-    # Look for ORG entities containing threat-related keywords
+    # Look for ORG entities containing threat-related keywords (or, with the
+    # rule engine, gazetteer actor names)
     threat_keywords = {'group', 'actor', 'campaign', 'malicious'}
     for ent in doc.ents:
         if ent.label_ == 'ORG' and any(keyword in ent.text.lower() for keyword in threat_keywords):
             actors.append(ent.text)
+        elif ent.label_ == 'THREAT_ACTOR':
+            actors.append(entity_rules.entity_name(ent))
     
     return list(set(actors))
 
-def extract_malware_info(text: str) -> List[Dict]:
-    """Extract and enrich malware information."""
+def rank_malware(text: str, doc: Optional['Doc'] = None, actors: Iterable[str] = ()) -> RankedCandidates:
+    """Dedupe, score and filter malware-name candidates before any lookup."""
     malware_names = re.findall(r'\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b', text)
+    candidates = [name for name in set(malware_names)
+                  if name.lower() not in ['apt', 'mitre']]  # Filter false positives
+    return MALWARE_RANKER.rank(text, doc, candidates, exclude=actors)
+
+def extract_malware_info(text: str, ranked: Optional[RankedCandidates] = None) -> List[Dict]:
+    """Extract and enrich malware information."""
+    if ranked is None:
+        ranked = rank_malware(text)
+    candidates = ranked.names
+
+    # Look every candidate up concurrently; cached and duplicate names cost nothing
+    import vt_client
+    with PROFILER.stage('vt'):
+        vt_results = vt_client.shared_client().file_reports(candidates)
     malware_info = []
-    
-    for name in set(malware_names):
-        if name.lower() in ['apt', 'mitre']:  # Filter false positives
-            continue
-            
+
+    for name in candidates:
         details = {'Name': name}
-        vt_data = query_virustotal(name)
-        if vt_data:
-            details.update(vt_data)
+        details.update(vt_details(vt_results[name]))
         malware_info.append(details)
     
     return malware_info
 
+def vt_details(vt_response: Optional[Dict]) -> Dict:
+    """Pick the malware details we report from a VirusTotal file object."""
+    if not vt_response:
+        return {}
+    attributes = vt_response.get('data', {}).get('attributes', {})
+    return {
+        'md5': attributes.get('md5', ''),
+        'sha1': attributes.get('sha1', ''),
+        'sha256': attributes.get('sha256', ''),
+        'ssdeep': attributes.get('ssdeep', ''),
+        'tags': attributes.get('tags', []),
+        'TLSH': attributes.get('tlsh', '')
+    }
+
 def query_virustotal(malware_name: str) -> Dict:
     """Query VirusTotal API for malware details."""
-    url = f"https://www.virustotal.com/api/v3/files/{malware_name}"
-    headers = {"x-apikey": VIRUSTOTAL_API_KEY}
-    
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            attributes = response.json().get('data', {}).get('attributes', {})
-            return {
-                'md5': attributes.get('md5', ''),
-                'sha1': attributes.get('sha1', ''),
-                'sha256': attributes.get('sha256', ''),
-                'ssdeep': attributes.get('ssdeep', ''),
-                'tags': attributes.get('tags', []),
-                'TLSH': attributes.get('tlsh', '')
-            }
-    except requests.exceptions.RequestException:
-        pass
-    return {}
-
-def extract_targets(text: str) -> List[str]:
+    import vt_client
+    return vt_details(vt_client.shared_client().file_report(malware_name))
+
+def extract_targets(text: str, doc: Optional['Doc'] = None) -> List[str]:
     """Identify targeted entities using NER and keywords."""
-    doc = nlp(text)
+    if doc is None:
+        doc = nlp(text)
     targets = []
     industry_keywords = {'sector', 'industry', 'organization', 'enterprise'}
     
@@ -158,15 +367,41 @@ def extract_targets(text: str) -> List[str]:
                 if ent.label_ in ['ORG', 'GPE'] and ent.text not in targets:
                     targets.append(ent.text)
     
-    # Look for industry mentions
-    for token in doc:
-        if token.text.lower() in industry_keywords and token.head.text.isalpha():
-            targets.append(token.head.text.title())
+    # Look for industry mentions: sector entities from the rule engine, or the
+    # words the parser attaches industry keywords to
+    for ent in doc.ents:
+        if ent.label_ == 'SECTOR':
+            targets.append(entity_rules.entity_name(ent))
+    if doc.has_annotation('DEP'):
+        for token in doc:
+            if token.text.lower() in industry_keywords and token.head.text.isalpha():
+                targets.append(token.head.text.title())
     
     return list(set(targets))
 
+def stream_main():
+    """Non-interactive mode: one JSON result per record of a file or stdin."""
+    parser = argparse.ArgumentParser(description='Extract threat intelligence from every record of a huge '
+                                                 'text file or stdin, one JSON result per line')
+    parser.add_argument('source', help="file path, or - for stdin")
+    parser.add_argument('--delimiter', type=record_stream.parse_delimiter, default=record_stream.DEFAULT_DELIMITER,
+                        help=r"record separator, with backslash escapes (default '\n\n': a blank line)")
+    parser.add_argument('--json-lines', metavar='FIELD', dest='json_field',
+                        help='records are JSON lines; FIELD holds the report text')
+    parser.add_argument('--batch-size', type=int, default=32, help='records per nlp.pipe batch')
+    parser.add_argument('--n-process', type=int, default=1, help='worker processes')
+    args = parser.parse_args()
+    try:
+        for result in stream_threat_intelligence(args.source, args.delimiter, args.json_field,
+                                                 args.batch_size, args.n_process):
+            print(json.dumps(result))
+    except (OSError, ValueError) as e:
+        sys.exit(f"Error: {e}")
+
 # Example Usage
-if __name__ == "__main__":
+if __name__ == "__main__" and len(sys.argv) > 1:
+    stream_main()
+elif __name__ == "__main__":
     # Prompt for input or use default text
     input_type = input("Enter input type (text/file/pdf): ").strip().lower()
     
@@ -181,6 +416,6 @@ if __name__ == "__main__":
     
     try:
         result = extract_threat_intelligence(report_text)
-        print(result)
+        print(json.dumps(result))
     except ValueError as e:
         print(f"Error: {e}")
\ No newline at end of file
@@ -1,8 +1,11 @@
 import re
-import requests
-import spacy
 from dotenv import load_dotenv
 import os
+import ioc_scanner
+from analysis import lazy_pipeline
+import attack_index
+from keyword_matcher import KeywordMatcher
+from malware_candidates import MalwareRanker
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -10,12 +13,20 @@ load_dotenv()
 # Access the VirusTotal API key
 VIRUSTOTAL_API_KEY = os.getenv("VIRUSTOTAL_API_KEY")
 
-# Ensure the API key is loaded
-if not VIRUSTOTAL_API_KEY:
-    raise ValueError("API key not found. Make sure it is set in the .env file.")
+# Load the spaCy model for named entity recognition on first use
+nlp = lazy_pipeline("en_core_web_sm", {'ner'})
 
-# Load the spaCy model for named entity recognition
-nlp = spacy.load("en_core_web_sm")
+# Tactics and techniques compiled into one keyword automaton
+TTP_MATCHER = KeywordMatcher().add_all([
+    ('Initial Access', ('Tactics', 'TA0001')),
+    ('Execution', ('Tactics', 'TA0002')),
+    ('Lateral Movement', ('Tactics', 'TA0008')),
+    ('Spear Phishing Attachment', ('Techniques', 'T1566.001')),
+    ('PowerShell', ('Techniques', 'T1059.001')),
+]).build()
+
+# Scores malware names so "The", "Iran" and repeats are not looked up
+MALWARE_RANKER = MalwareRanker(attack_index.try_load_index())
 
 def extract_threat_intelligence(report_text):
     # Initialize the output dictionary
@@ -36,27 +47,13 @@ def extract_threat_intelligence(report_text):
     }
 
     # Extract Indicators of Compromise (IoCs)
-    threat_intel['IoCs']['IP addresses'] = re.findall(r'\b(?:\d{1,3}\.){3}\d{1,3}\b', report_text)
-    threat_intel['IoCs']['Domains'] = re.findall(r'\b(?:[a-zA-Z0-9-]+\.)+[a-zA-Z]{2,}\b', report_text)
-    threat_intel['IoCs']['File hashes'] = re.findall(r'\b[a-fA-F0-9]{32,}\b', report_text)
-    threat_intel['IoCs']['Email addresses'] = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', report_text)
+    threat_intel['IoCs'] = ioc_scanner.extract_iocs(report_text, unique=True)
 
     # Extract Tactics, Techniques, and Procedures (TTPs)
-    tactics = {
-        'Initial Access': 'TA0001',
-        'Execution': 'TA0002',
-        'Lateral Movement': 'TA0008'
-    }
-    techniques = {
-        'Spear Phishing Attachment': 'T1566.001',
-        'PowerShell': 'T1059.001'
-    }
-    for tactic, code in tactics.items():
-        if tactic.lower() in report_text.lower():
-            threat_intel['TTPs']['Tactics'].append([code, tactic])
-    for technique, code in techniques.items():
-        if technique.lower() in report_text.lower():
-            threat_intel['TTPs']['Techniques'].append([code, technique])
+    for match in TTP_MATCHER.finditer(report_text):
+        kind, code = match.payload
+        if [code, match.keyword] not in threat_intel['TTPs'][kind]:
+            threat_intel['TTPs'][kind].append([code, match.keyword])
 
     # Extract Threat Actor(s) using spaCy NER
     doc = nlp(report_text)
@@ -65,12 +62,15 @@ def extract_threat_intelligence(report_text):
             threat_intel['Threat Actor(s)'].append(ent.text)
 
     # Extract Malware details
-    malware_names = re.findall(r'\b[A-Z][a-zA-Z]+\b', report_text)
-    for name in malware_names:
-        if name.lower() in report_text.lower() and name not in threat_intel['Threat Actor(s)']:
-            malware_details = get_malware_details(name)
-            if malware_details:
-                threat_intel['Malware'].append(malware_details)
+    ranked = MALWARE_RANKER.rank(report_text, doc, re.findall(r'\b[A-Z][a-zA-Z]+\b', report_text),
+                                 exclude=threat_intel['Threat Actor(s)'])
+    import vt_client
+    vt_results = vt_client.shared_client().file_reports(ranked.names)
+    for name in ranked.names:
+        malware_details = format_malware_details(name, vt_results[name])
+        if malware_details:
+            threat_intel['Malware'].append(malware_details)
+    threat_intel['Malware lookups'] = ranked.summary()
 
     # Extract Targeted Entities using spaCy NER
     for ent in doc.ents:
@@ -81,11 +81,12 @@ def extract_threat_intelligence(report_text):
 
 def get_malware_details(malware_name):
     """Query VirusTotal API for malware details."""
-    url = f"https://www.virustotal.com/api/v3/files/{malware_name}"
-    headers = {"x-apikey": VIRUSTOTAL_API_KEY}
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        data = response.json()
+    import vt_client
+    return format_malware_details(malware_name, vt_client.shared_client().file_report(malware_name))
+
+def format_malware_details(malware_name, data):
+    """Pick the reported fields from a VirusTotal file object (None if not found)."""
+    if data:
         attributes = data.get('data', {}).get('attributes', {})
         return {
             'Name': malware_name,
@@ -99,7 +100,12 @@ def get_malware_details(malware_name):
     return None
 
 # Example Usage
-report_text = '''
+if __name__ == "__main__":
+    # Ensure the API key is loaded
+    if not VIRUSTOTAL_API_KEY:
+        raise ValueError("API key not found. Make sure it is set in the .env file.")
+
+    report_text = '''
 The APT33 group, suspected to be from Iran, has launched a new campaign targeting
 the energy sector organizations.
 The attack utilizes Shamoon malware, known for its destructive capabilities. The threat
@@ -110,5 +116,5 @@ attachment. The malware's behavior was observed communicating with IP address
 PowerShell scripts.
 '''
 
-result = extract_threat_intelligence(report_text)
-print(result)
\ No newline at end of file
+    result = extract_threat_intelligence(report_text)
+    print(result)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""Rule-based alternative to the statistical NER for the actor and target stages.
+
+A blank English pipeline with a sentencizer and an entity_ruler whose
+patterns come from gazetteers: ATT&CK group names and aliases, vendor naming
+conventions ("Charming Kitten", "Volt Typhoon", APT29), countries and
+industry sectors. No tagger, parser or statistical NER runs, so it is much
+faster than en_core_web_sm. It only finds entities it has been told about.
+
+Labels: THREAT_ACTOR, GPE (countries) and SECTOR. For ATT&CK groups and
+sectors the canonical name is in ent.ent_id_ ("APT33", "Energy Sector").
+"""
+from typing import TYPE_CHECKING, Dict, Iterator
+
+from analysis import LazyPipeline
+from keyword_matcher import COMMON_WORD_GROUPS
+
+if TYPE_CHECKING:
+    from spacy.language import Language
+
+ENGINE_NAME = 'rules'
+
+COUNTRIES = (
+    'Afghanistan', 'Albania', 'Algeria', 'Angola', 'Argentina', 'Armenia', 'Australia', 'Austria', 'Azerbaijan',
+    'Bahrain', 'Bangladesh', 'Belarus', 'Belgium', 'Bolivia', 'Bosnia and Herzegovina', 'Brazil', 'Bulgaria',
+    'Cambodia', 'Cameroon', 'Canada', 'Chile', 'China', 'Colombia', 'Costa Rica', 'Croatia', 'Cuba', 'Cyprus',
+    'Czech Republic', 'Czechia', 'Denmark', 'Ecuador', 'Egypt', 'Estonia', 'Ethiopia', 'Finland', 'France',
+    'Georgia', 'Germany', 'Ghana', 'Greece', 'Hong Kong', 'Hungary', 'Iceland', 'India', 'Indonesia', 'Iran',
+    'Iraq', 'Ireland', 'Israel', 'Italy', 'Japan', 'Jordan', 'Kazakhstan', 'Kenya', 'Kuwait', 'Kyrgyzstan',
+    'Laos', 'Latvia', 'Lebanon', 'Libya', 'Lithuania', 'Luxembourg', 'Malaysia', 'Malta', 'Mexico', 'Moldova',
+    'Mongolia', 'Montenegro', 'Morocco', 'Myanmar', 'Nepal', 'Netherlands', 'New Zealand', 'Nigeria',
+    'North Korea', 'North Macedonia', 'Norway', 'Oman', 'Pakistan', 'Palestine', 'Panama', 'Peru',
+    'Philippines', 'Poland', 'Portugal', 'Qatar', 'Romania', 'Russia', 'Saudi Arabia', 'Serbia', 'Singapore',
+    'Slovakia', 'Slovenia', 'South Africa', 'South Korea', 'Spain', 'Sri Lanka', 'Sudan', 'Sweden',
+    'Switzerland', 'Syria', 'Taiwan', 'Tajikistan', 'Thailand', 'Tunisia', 'Turkey', 'Turkmenistan', 'Uganda',
+    'Ukraine', 'United Arab Emirates', 'UAE', 'United Kingdom', 'UK', 'United States', 'USA', 'US', 'Uruguay',
+    'Uzbekistan', 'Venezuela', 'Vietnam', 'Yemen', 'Zimbabwe', 'Europe', 'Middle East', 'Asia', 'Africa',
+    'Latin America', 'Southeast Asia', 'Gulf'
+)
+
+SECTORS = (
+    'energy', 'oil and gas', 'petrochemical', 'nuclear', 'utilities', 'utility', 'water', 'financial', 'finance',
+    'banking', 'insurance', 'cryptocurrency', 'healthcare', 'health', 'pharmaceutical', 'government',
+    'defense', 'defence', 'military', 'aerospace', 'aviation', 'telecommunications', 'telecom', 'technology',
+    'it', 'software', 'semiconductor', 'manufacturing', 'industrial', 'chemical', 'automotive', 'maritime',
+    'shipping', 'transportation', 'logistics', 'retail', 'hospitality', 'education', 'academic', 'research',
+    'media', 'legal', 'critical infrastructure', 'construction', 'engineering', 'mining', 'agriculture'
+)
+
+# A sector word only counts when followed by one of these ("energy sector organizations")
+SECTOR_NOUNS = ('sector', 'sectors', 'industry', 'industries', 'organizations', 'organisations', 'companies',
+                'firms', 'entities', 'providers', 'agencies', 'institutions', 'operators', 'targets', 'victims')
+
+# Last word of vendor-style actor names ("Charming Kitten", "Lazarus Group")
+ACTOR_SUFFIXES = ('group', 'team', 'gang', 'panda', 'bear', 'kitten', 'spider', 'chollima', 'tiger', 'typhoon',
+                  'sandstorm', 'blizzard', 'sleet', 'tempest', 'hail', 'dust', 'rain', 'snow')
+
+# Sentence-initial words the naming-convention pattern must not absorb ("The Lazarus Group")
+LEADING_STOPWORDS = ('the', 'a', 'an', 'this', 'that', 'these', 'in', 'on', 'by', 'and', 'then', 'when', 'while',
+                     'after', 'before', 'since', 'both', 'also', 'however', 'meanwhile')
+
+
+def actor_patterns(index=None) -> Iterator[Dict]:
+    """Patterns for ATT&CK groups (canonical name as id) and actor naming conventions."""
+    if index is not None:
+        for group in index.groups():
+            for name in (group.name,) + group.aliases:
+                if name.casefold() not in COMMON_WORD_GROUPS:
+                    yield {'label': 'THREAT_ACTOR', 'pattern': name, 'id': group.name}
+    yield {'label': 'THREAT_ACTOR', 'pattern': [{'TEXT': {'REGEX': r'^(?:APT|TA|FIN|UNC)\d+$'}}]}
+    yield {'label': 'THREAT_ACTOR',
+           'pattern': [{'IS_TITLE': True, 'LOWER': {'NOT_IN': list(LEADING_STOPWORDS)}},
+                       {'IS_TITLE': True, 'OP': '*'},
+                       {'LOWER': {'IN': list(ACTOR_SUFFIXES)}, 'IS_TITLE': True}]}
+
+
+def country_patterns() -> Iterator[Dict]:
+    for country in COUNTRIES:
+        yield {'label': 'GPE', 'pattern': country, 'id': country}
+
+
+def sector_patterns(case_sensitive: bool) -> Iterator[Dict]:
+    """"<sector> <noun>" phrases; only "IT ..." is case-sensitive, or "it targets" would count."""
+    for sector in SECTORS:
+        if (sector == 'it') != case_sensitive:
+            continue
+        if sector == 'it':
+            name, words = 'IT', 'IT'
+        else:
+            name = ' '.join(word if word == 'and' else word.capitalize() for word in sector.split())
+            words = sector
+        for noun in SECTOR_NOUNS:
+            yield {'label': 'SECTOR', 'pattern': f'{words} {noun}', 'id': f'{name} Sector'}
+
+
+def rule_pipeline(index=None) -> 'Language':
+    """Blank English pipeline: sentencizer + gazetteer entity rulers (no tagger, parser or NER).
+
+    Gazetteer entries are phrase patterns (one PhraseMatcher pass over the
+    tokens); only the actor naming conventions need the token Matcher.
+    """
+    import spacy
+    nlp = spacy.blank('en')
+    nlp.add_pipe('sentencizer')
+    ruler = nlp.add_pipe('entity_ruler')
+    ruler.add_patterns(list(actor_patterns(index)) + list(country_patterns()) + list(sector_patterns(True)))
+    sectors = nlp.add_pipe('entity_ruler', name='sector_ruler', config={'phrase_matcher_attr': 'LOWER'})
+    sectors.add_patterns(list(sector_patterns(False)))
+    return nlp
+
+
+def lazy_rule_pipeline(index=None) -> LazyPipeline:
+    """rule_pipeline() built the first time a stage parses a report."""
+    return LazyPipeline(ENGINE_NAME, ['sentencizer', 'entity_ruler', 'sector_ruler'],
+                        loader=lambda: rule_pipeline(index))
+
+
+def entity_name(ent) -> str:
+    """Canonical name of a rule-based entity (its pattern id), else its text."""
+    return ent.ent_id_ or ent.text
@@ -0,0 +1,184 @@
+"""Incremental extraction for reports that grow by appended text (live incident notes).
+
+    report = IncrementalReport(ThreatIntelExtractor())
+    report.append(first_paragraphs)
+    results = report.append(next_paragraph)  # same layout as process_report()
+
+Only the open tail of the report is kept: the text after the last cut.
+Each append() analyzes that tail plus the new text. The cut is
+sentence-aligned and lies at least `overlap` characters before the end.
+Hits starting before the cut are final: they are stored as a Chunk and
+merged into the deduplicated output. Hits after it are provisional and are
+found again by the next append. An update therefore costs the new text plus
+about overlap characters, however long the report already is.
+
+The spaCy Doc covers only the tail, so an entity whose label depends on
+context before the cut can differ from a parse of the whole report.
+Each malware name is looked up once per report.
+"""
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, NamedTuple, Tuple
+
+import ioc_scanner
+from analysis import EntityHit, ReportHits
+from ioc_scanner import IocMatch
+from keyword_matcher import KeywordMatch, group_ttps
+from malware_candidates import Evidence
+from stream_scan import DEFAULT_OVERLAP, _cut_point
+
+if TYPE_CHECKING:
+    from semantic_ttps import ScoredTtp
+
+# A new sentence or line starts after these
+SENTENCE_ENDS = ('. ', '! ', '? ', '.\n', '!\n', '?\n', '\n')
+
+
+class Chunk(NamedTuple):
+    """Final hits of one settled piece of the report; offsets are into the whole report."""
+    start: int
+    end: int
+    iocs: List[IocMatch]
+    keywords: List[KeywordMatch]  # tactic, technique and group hits
+    entities: List[EntityHit]
+    proposed: List[EntityHit]  # names the legacy malware heuristic proposed
+    scored: List['ScoredTtp']  # TTP scorer candidates whose best sentence starts here
+
+
+def sentence_cut(text: str, limit: int, window: int) -> int:
+    """Start of the last sentence or line beginning in (limit - window, limit]; else a whitespace cut."""
+    lower = max(limit - window, 0)
+    best = 0
+    for end in SENTENCE_ENDS:
+        i = text.rfind(end, lower, limit - len(end) + 1)
+        if i >= 0:
+            best = max(best, i + len(end))
+    return best or _cut_point(text, limit)
+
+
+class IncrementalReport:
+    """Extraction state of one growing report for a cltest3.ThreatIntelExtractor.
+
+    The result cache is bypassed; the report is not complete until its last append.
+    """
+
+    def __init__(self, extractor, overlap: int = DEFAULT_OVERLAP):
+        self.extractor = extractor
+        self.overlap = overlap
+        self.chunks: List[Chunk] = []
+        self.length = 0  # characters appended so far
+        self.tail = ''  # text after the last cut
+        self.tail_start = 0  # report offset of tail[0]
+        # Settled output, deduplicated by first appearance across all chunks
+        self._iocs: Dict[Tuple[str, str], IocMatch] = {}
+        self._keywords: Dict[Tuple, KeywordMatch] = {}
+        self._entities: Dict[Tuple[str, str], EntityHit] = {}
+        self._evidence = Evidence()
+        self._malware_details: Dict[str, Dict] = {}
+        self._scored: List['ScoredTtp'] = []
+        # Provisional hits in the tail, replaced on every append
+        self._open = Chunk(0, 0, [], [], [], [], [])
+        self._open_evidence = Evidence()
+
+    def append(self, text: str) -> Dict[str, Any]:
+        """Add text to the end of the report and return the results for everything so far."""
+        self.length += len(text)
+        window = self.tail + text
+        doc = None
+        if self.extractor.nlp_stages:
+            with self.extractor.profiler.stage('nlp'):
+                doc = self.extractor.nlp(window)
+        hits = self.extractor.find_hits(window, doc, offset=self.tail_start)
+        scored = []
+        if self.extractor.ttp_scorer and 'ttps' in self.extractor.stages:
+            with self.extractor.profiler.stage('ttps'):
+                scored = self.extractor.ttp_scorer.candidates(window, doc, offset=self.tail_start)
+
+        cut = 0
+        if len(window) > 2 * self.overlap:
+            cut = sentence_cut(window, len(window) - self.overlap, self.overlap)
+        if cut:
+            self._settle(self._split(hits, scored, 0, cut), window, doc)
+        self._open = self._split(hits, scored, cut, len(window))
+        if 'malware' in self.extractor.stages:
+            self._open_evidence = self.extractor.malware_ranker.collect(
+                window, doc if self.extractor.nlp_stages else None,
+                [hit.name for hit in self._open.proposed], pos=cut)
+        self.tail = window[cut:]
+        self.tail_start += cut
+        return self.results()
+
+    def _split(self, hits: ReportHits, scored: List['ScoredTtp'], pos: int, endpos: int) -> Chunk:
+        """The hits starting in window[pos:endpos]."""
+        start, end = self.tail_start + pos, self.tail_start + endpos
+        return Chunk(start, end, *([hit for hit in group if start <= hit.start < end]
+                                   for group in (hits.iocs, hits.keywords, hits.entities, hits.proposed, scored)))
+
+    def _settle(self, chunk: Chunk, window: str, doc):
+        """Keep a chunk of final hits and merge it into the settled output."""
+        self.chunks.append(chunk)
+        merge_chunk(chunk, self._iocs, self._keywords, self._entities, self._scored)
+        if 'malware' in self.extractor.stages:
+            self._evidence.update(self.extractor.malware_ranker.collect(
+                window, doc if self.extractor.nlp_stages else None, [hit.name for hit in chunk.proposed],
+                endpos=chunk.end - self.tail_start))
+
+    def results(self) -> Dict[str, Any]:
+        """Settled plus provisional hits, in the layout of ThreatIntelExtractor.process_report()."""
+        return chunk_results(self.extractor, chain(self._iocs.values(), self._open.iocs),
+                             chain(self._keywords.values(), self._open.keywords),
+                             chain(self._entities.values(), self._open.entities),
+                             self._evidence.copy().update(self._open_evidence), self._malware_details,
+                             scored=chain(self._scored, self._open.scored))
+
+
+def merge_chunk(chunk: Chunk, iocs: Dict[Tuple[str, str], IocMatch], keywords: Dict[Tuple, KeywordMatch],
+                entities: Dict[Tuple[str, str], EntityHit], scored: List['ScoredTtp']):
+    """Add a chunk's hits to the deduplicated ones, keeping each first appearance."""
+    scored.extend(chunk.scored)
+    for match in chunk.iocs:
+        iocs.setdefault((match.type, match.value), match)
+    for match in chunk.keywords:
+        keywords.setdefault(match.payload, match)
+    for hit in chunk.entities:
+        entities.setdefault((hit.label, hit.name), hit)
+
+
+def chunk_results(extractor, iocs: Iterable[IocMatch], keywords: Iterable[KeywordMatch],
+                  entities: Iterable[EntityHit], evidence: Evidence, malware_details: Dict[str, Dict],
+                  lookup: bool = True, scored: Iterable['ScoredTtp'] = ()) -> Dict[str, Any]:
+    """Merged hits in the layout of ThreatIntelExtractor.process_report().
+
+    Malware names missing from malware_details are looked up and added to it.
+    Without lookup, 'Malware' holds the ranked names, as in analyze_offline().
+    scored are the TTP scorer candidates of all chunks; the best per technique is kept.
+    """
+    keywords = list(keywords)
+    entities = list(entities)
+    actors = list(dict.fromkeys(chain(
+        (match.payload[2] for match in keywords if match.payload[0] == 'group'),
+        (hit.name for hit in entities if hit.label == 'THREAT_ACTOR'))))
+    results = {}
+    for stage in extractor.stages:
+        if stage == 'iocs':
+            results['IoCs'] = ioc_scanner.group_iocs(iocs, extractor.ioc_labels, unique=True)
+        elif stage == 'ttps':
+            results['TTPs'] = group_ttps(keywords)
+            if extractor.ttp_scorer:
+                results['TTPs']['Scored techniques'] = extractor.ttp_scorer.group(extractor.ttp_scorer.top(scored))
+        elif stage == 'actors':
+            results['Threat Actor(s)'] = actors
+        elif stage == 'targets':
+            results['Targeted Entities'] = list(dict.fromkeys(
+                hit.name for hit in entities if hit.label != 'THREAT_ACTOR'))
+        elif stage == 'malware':
+            group_names = [match.payload[2] for match in keywords if match.payload[0] == 'group']
+            ranked = extractor.malware_ranker.select(evidence, exclude=group_names)
+            if lookup:
+                new_names = [name for name in ranked.names if name not in malware_details]
+                if new_names:
+                    malware_details.update(extractor.get_malware_details_batch(new_names))
+                results['Malware'] = [malware_details[name] for name in ranked.names if malware_details[name]]
+            else:
+                results['Malware'] = ranked.names
+            results['Malware lookups'] = ranked.summary()
+    return results
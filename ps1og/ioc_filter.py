@@ -0,0 +1,259 @@
+"""Column-wise validation and normalization of raw IoC candidates with NumPy.
+
+    ioc_filter = IocFilter(drop=INVALID | VERSION | UNKNOWN_TLD | PRIVATE)
+    matches = ioc_filter.scan_batch(texts)  # validated, canonical IocMatches per text
+
+The candidates of a whole batch are checked together: one array per
+property instead of one Python branch per match.
+
+- IPv4: octets are parsed into a (candidates x 4) integer array from the
+  bytes of the padded strings. Then each address is packed and compared
+  against the private and reserved networks.
+- Hashes: length 32/40/64 and hex digits only.
+- Domains and emails: the top-level domain must be a known one. This drops
+  file names like m.exe or Kavach.msi, and detection names like
+  Win.Trojan.Agent.
+- Version numbers: an IPv4-shaped value right after "version", "build" or
+  "release" is a version.
+
+Values are canonicalized: lower case, and defanged forms such as hxxp,
+[.], (dot) and [@] are refanged. Every candidate gets a bit set of flags.
+The ones in `drop` remove it; the others are kept and can be read from
+Verdicts.flags.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+import ioc_scanner
+from ioc_scanner import IocMatch
+from ioc_store import pack_ip
+
+# Verdict flags
+INVALID = 1  # octet above 255 or with a leading zero, or a hash of the wrong length or alphabet
+VERSION = 2  # IPv4-shaped version number
+UNKNOWN_TLD = 4  # domain or email whose last label is not a top-level domain
+PRIVATE = 8  # RFC 1918 address
+RESERVED = 16  # loopback, link-local, CGNAT, documentation, multicast and other special-purpose ranges
+DEFANGED = 32  # the raw value was defanged; informational
+
+FLAG_NAMES = {'invalid': INVALID, 'version': VERSION, 'tld': UNKNOWN_TLD, 'private': PRIVATE,
+              'reserved': RESERVED, 'defanged': DEFANGED}
+DEFAULT_DROP = INVALID | VERSION | UNKNOWN_TLD
+
+# Applied in order to the lower-cased value
+REFANG = (('hxxp', 'http'), ('[.]', '.'), ('(.)', '.'), ('{.}', '.'), ('[dot]', '.'), ('(dot)', '.'),
+          ('[@]', '@'), ('[at]', '@'), ('(at)', '@'), ('[:]', ':'))
+
+# Words that make a following dotted quad a version number, as the context ends
+VERSION_WORDS = (' version ', ' version: ', ' ver ', ' ver. ', ' v. ', ' build ', ' release ')
+CONTEXT_CHARS = 12  # text before a candidate that is checked for them
+
+PRIVATE_NETWORKS = (('10.0.0.0', 8), ('172.16.0.0', 12), ('192.168.0.0', 16))
+RESERVED_NETWORKS = (
+    ('0.0.0.0', 8), ('100.64.0.0', 10), ('127.0.0.0', 8), ('169.254.0.0', 16), ('192.0.0.0', 24),
+    ('192.0.2.0', 24), ('198.18.0.0', 15), ('198.51.100.0', 24), ('203.0.113.0', 24), ('224.0.0.0', 4),
+    ('240.0.0.0', 4)
+)
+
+# Generic TLDs seen in reports plus every country code. zip and mov are real
+# TLDs but in reports they are nearly always file names, so they are left out.
+GENERIC_TLDS = '''
+    com net org info biz edu gov mil int name pro mobi aero asia cat coop jobs museum tel travel xxx arpa
+    app dev xyz top online site club shop store tech space website live cloud icu vip work buzz link click
+    fun life world today news blog email host press digital network support services solutions agency
+    group company page download win bid loan date review stream trade party science men racing cricket
+    kim country gdn ooo rest bar fit monster cyou sbs cfd quest lol
+'''
+COUNTRY_TLDS = '''
+    ac ad ae af ag ai al am ao aq ar as at au aw ax az ba bb bd be bf bg bh bi bj bm bn bo br bs bt bw by
+    bz ca cc cd cf cg ch ci ck cl cm cn co cr cu cv cw cx cy cz de dj dk dm do dz ec ee eg er es et eu fi
+    fj fk fm fo fr ga gd ge gf gg gh gi gl gm gn gp gq gr gs gt gu gw gy hk hm hn hr ht hu id ie il im in
+    io iq ir is it je jm jo jp ke kg kh ki km kn kp kr kw ky kz la lb lc li lk lr ls lt lu lv ly ma mc md
+    me mg mh mk ml mm mn mo mp mq mr ms mt mu mv mw mx my mz na nc ne nf ng ni nl no np nr nu nz om pa pe
+    pf pg ph pk pl pm pn pr ps pt pw py qa re ro rs ru rw sa sb sc sd se sg sh si sk sl sm sn so sr ss st
+    su sv sx sy sz tc td tf tg th tj tk tl tm tn to tr tt tv tw tz ua ug uk us uy uz va vc ve vg vi vn vu
+    wf ws ye yt za zm zw
+'''
+TLDS = np.array(sorted(set(GENERIC_TLDS.split() + COUNTRY_TLDS.split())))
+
+IP_WIDTH = 15  # longest dotted quad
+
+
+class Verdicts(NamedTuple):
+    values: List[str]  # canonical values, aligned with the input
+    flags: np.ndarray  # uint8 bit set per candidate
+
+
+def _networks(networks: Sequence[Tuple[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    masks = np.array([(0xFFFFFFFF << (32 - bits)) & 0xFFFFFFFF for _, bits in networks], dtype=np.uint32)
+    bases = np.array([pack_ip(address) for address, _ in networks], dtype=np.uint32)
+    return bases, masks
+
+
+PRIVATE_BASES, PRIVATE_MASKS = _networks(PRIVATE_NETWORKS)
+RESERVED_BASES, RESERVED_MASKS = _networks(RESERVED_NETWORKS)
+
+
+def code_points(values: np.ndarray) -> np.ndarray:
+    """(candidates x width) uint32 matrix of a str array's UTF-32 code points; 0 pads."""
+    values = np.ascontiguousarray(values)
+    width = values.dtype.itemsize // 4
+    if not width:
+        return np.zeros((len(values), 1), dtype=np.uint32)
+    return values.view(np.uint32).reshape(len(values), width)
+
+
+def from_code_points(codes: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(codes).view(f'<U{codes.shape[1]}').reshape(len(codes))
+
+
+def lower(codes: np.ndarray) -> np.ndarray:
+    """ASCII lower case of a code point matrix (IoC patterns only match ASCII letters)."""
+    upper = (codes >= ord('A')) & (codes <= ord('Z'))
+    return codes + upper.astype(np.uint32) * 32
+
+
+def refang(values: np.ndarray) -> np.ndarray:
+    """Lower-cased, refanged copies of a string array.
+
+    Only values with a bracket or 'hxxp' go through the (slower) string replacements.
+    """
+    codes = lower(code_points(values))
+    values = from_code_points(codes)
+    marked = np.flatnonzero(((codes == ord('[')) | (codes == ord('(')) | (codes == ord('{'))).any(axis=1)
+                            | (np.strings.find(values, 'hxxp') >= 0))
+    if len(marked):
+        defanged = values[marked]
+        for old, new in REFANG:
+            defanged = np.strings.replace(defanged, old, new)
+        values = values.copy()
+        values[marked] = defanged
+    return values
+
+
+def parse_ipv4(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(packed uint32 addresses, validity) of dotted quads given as code points, parsed column by column."""
+    count, width = codes.shape
+    if width < IP_WIDTH + 1:
+        codes = np.pad(codes, ((0, 0), (0, IP_WIDTH + 1 - width)))
+    too_long = codes[:, IP_WIDTH:].any(axis=1)
+    chars = codes[:, :IP_WIDTH].astype(np.int32)
+    digits = (chars >= ord('0')) & (chars <= ord('9'))
+    dots = chars == ord('.')
+    field = np.minimum(np.cumsum(dots, axis=1), 4)  # octet each character belongs to; 4 = overflow
+    octets = np.zeros((count, 5), dtype=np.int32)
+    lengths = np.zeros((count, 5), dtype=np.int8)
+    leading_zero = np.zeros((count, 5), dtype=bool)
+    rows = np.arange(count)
+    for column in range(IP_WIDTH):
+        digit = digits[:, column]
+        octet = field[:, column]
+        value = chars[:, column] - ord('0')
+        first = digit & (lengths[rows, octet] == 0)
+        leading_zero[rows[first], octet[first]] = value[first] == 0
+        octets[rows[digit], octet[digit]] = octets[rows[digit], octet[digit]] * 10 + value[digit]
+        lengths[rows[digit], octet[digit]] += 1
+    lengths = lengths[:, :4]
+    valid = (~too_long & (dots.sum(axis=1) == 3) & (digits | dots | (chars == 0)).all(axis=1)
+             & (lengths >= 1).all(axis=1) & (lengths <= 3).all(axis=1) & (octets[:, :4] <= 255).all(axis=1)
+             & ~(leading_zero[:, :4] & (lengths > 1)).any(axis=1))
+    shifts = np.array([24, 16, 8, 0], dtype=np.uint32)
+    packed = (octets[:, :4].astype(np.uint32) << shifts).sum(axis=1, dtype=np.uint32)
+    return packed, valid
+
+
+def _in_networks(packed: np.ndarray, bases: np.ndarray, masks: np.ndarray) -> np.ndarray:
+    return ((packed[:, None] & masks[None, :]) == bases[None, :]).any(axis=1)
+
+
+def check(kinds: Sequence[str], values: Sequence[str], contexts: Sequence[str]) -> Verdicts:
+    """Flags and canonical values for candidates of the given IoC types.
+
+    contexts holds the text just before each IP candidate (for version
+    numbers); other entries are ignored.
+    """
+    count = len(values)
+    flags = np.zeros(count, dtype=np.uint8)
+    if not count:
+        return Verdicts([], flags)
+    kinds = np.array(kinds)
+    raw = np.array(values, dtype=str)
+    canonical = refang(raw)
+    flags[canonical != from_code_points(lower(code_points(raw)))] |= DEFANGED
+
+    ips = np.flatnonzero(kinds == 'ip')
+    if len(ips):
+        packed, valid = parse_ipv4(code_points(canonical[ips]))
+        flags[ips[~valid]] |= INVALID
+        flags[ips[valid & _in_networks(packed, PRIVATE_BASES, PRIVATE_MASKS)]] |= PRIVATE
+        flags[ips[valid & _in_networks(packed, RESERVED_BASES, RESERVED_MASKS)]] |= RESERVED
+        before = np.strings.add(' ', from_code_points(lower(code_points(np.array(contexts, dtype=str)[ips]))))
+        version = np.zeros(len(ips), dtype=bool)
+        for word in VERSION_WORDS:
+            version |= np.strings.endswith(before, word)
+        flags[ips[version]] |= VERSION
+
+    hashes = np.flatnonzero(kinds == 'hash')
+    if len(hashes):
+        codes = code_points(canonical[hashes])
+        hex_digits = (((codes >= ord('0')) & (codes <= ord('9'))) | ((codes >= ord('a')) & (codes <= ord('f')))
+                      | (codes == 0))
+        good = np.isin((codes != 0).sum(axis=1), list(ioc_scanner.HASH_LENGTHS)) & hex_digits.all(axis=1)
+        flags[hashes[~good]] |= INVALID
+
+    names = np.flatnonzero((kinds == 'domain') | (kinds == 'email'))
+    if len(names):
+        tlds = np.strings.rpartition(canonical[names], '.')[2]
+        flags[names[~np.isin(tlds, TLDS)]] |= UNKNOWN_TLD
+
+    return Verdicts(canonical.tolist(), flags)
+
+
+class IocFilter:
+    """Drops and canonicalizes IoC matches a batch at a time."""
+
+    def __init__(self, drop: int = DEFAULT_DROP):
+        self.drop = drop
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> 'IocFilter':
+        """From flag names such as ('invalid', 'version', 'tld', 'private')."""
+        drop = 0
+        for name in names:
+            if name not in FLAG_NAMES:
+                raise ValueError(f"Unknown IoC flag: {name}")
+            drop |= FLAG_NAMES[name]
+        return cls(drop)
+
+    def verdicts(self, texts: Sequence[str], matches: Sequence[Sequence[IocMatch]]) -> Verdicts:
+        """Verdicts for the matches of every text, flattened in order.
+
+        Each match is checked in its original form, text[start:end], so defanged ones are flagged.
+        """
+        kinds, values, contexts = [], [], []
+        for text, text_matches in zip(texts, matches):
+            for match in text_matches:
+                kinds.append(match.type)
+                values.append(text[match.start:match.end])
+                contexts.append(text[max(match.start - CONTEXT_CHARS, 0):match.start] if match.type == 'ip' else '')
+        return check(kinds, values, contexts)
+
+    def filter(self, texts: Sequence[str], matches: Sequence[Sequence[IocMatch]]) -> List[List[IocMatch]]:
+        """The kept matches of every text, with canonical values."""
+        verdicts = self.verdicts(texts, matches)
+        keep = (verdicts.flags & self.drop) == 0
+        kept = []
+        i = 0
+        for text_matches in matches:
+            kept.append([match._replace(value=verdicts.values[i + n])
+                         for n, match in enumerate(text_matches) if keep[i + n]])
+            i += len(text_matches)
+        return kept
+
+    def scan_batch(self, texts: Sequence[str]) -> List[List[IocMatch]]:
+        """ioc_scanner.scan_iocs over every text, validated in one pass."""
+        return self.filter(texts, [list(ioc_scanner.scan_iocs(text)) for text in texts])
+
+    def fingerprint(self) -> Dict[str, int]:
+        return {'drop': self.drop}
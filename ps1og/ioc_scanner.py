@@ -0,0 +1,96 @@
+import re
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# Separators as reports write them: plain, or defanged so the indicator is not
+# clickable (example[.]com, 192.168.1(.)1, ops[at]example{.}org). They are part
+# of the one pattern, so defanged indicators cost no extra pass over the text.
+_DOT = r'(?:\.|[\[({](?:\.|[dD][oO][tT])[\])}])'
+_AT = r'(?:@|[\[(](?:@|[aA][tT])[\])])'
+
+# Every IoC type lives in one alternation so the report is scanned exactly once.
+# The shared lookbehind rejects positions inside a word before any branch is
+# tried, which is what keeps the combined pattern faster than separate findalls.
+# Order matters: emails come before domains so the domain part of an address is
+# consumed by the email match and never reported again as a separate domain.
+# Labels and octets are possessive: a separator can only follow the whole run,
+# and without backtracking into it the separator alternatives cost next to nothing.
+IOC_PATTERN = re.compile(rf'''
+    (?<![\w.%+-])
+    (?:
+          (?P<email>[A-Za-z0-9._%+-]++{_AT}(?:[A-Za-z0-9-]++{_DOT})+[A-Za-z]{{2,}}\b)
+        | (?P<ip>(?:\d{{1,3}}+{_DOT}){{3}}\d{{1,3}}+(?!{_DOT}?\w))
+        | (?P<hash>[A-Fa-f0-9]{{32,}}\b)
+        | (?P<domain>(?:[A-Za-z0-9-]++{_DOT})+[A-Za-z]{{2,}}\b)
+    )
+''', re.VERBOSE)
+
+# Defanged separators inside a matched value, and what they stand for
+DEFANGED_SEPARATOR = re.compile(r'[\[({](?:\.|dot|(?P<at>@|at))[\])}]', re.IGNORECASE)
+
+IOC_TYPES = ('ip', 'domain', 'hash', 'email')
+HASH_LENGTHS = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+
+# Output keys used by dsr1test2.py; other callers pass their own labels.
+DEFAULT_LABELS = {
+    'ip': 'IP addresses',
+    'domain': 'Domains',
+    'hash': 'File hashes',
+    'email': 'Email addresses',
+}
+
+
+class IocMatch(NamedTuple):
+    """An indicator found in a text; value is refanged, text[start:end] is the original form."""
+    type: str
+    value: str
+    start: int
+    end: int
+
+
+def refang(value: str) -> str:
+    """Plain form of a defanged indicator: example[.]com -> example.com, ops[at]x.org -> ops@x.org."""
+    return DEFANGED_SEPARATOR.sub(lambda match: '@' if match.group('at') else '.', value)
+
+
+def _valid_ip(value: str) -> bool:
+    return all(int(octet) <= 255 for octet in value.split('.'))
+
+
+def scan_iocs(text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[IocMatch]:
+    """Yield every validated IoC in text, in order of appearance, in a single pass.
+
+    Defanged indicators are found by the same pass; only their matched span is refanged.
+    """
+    if endpos is None:
+        endpos = len(text)
+    for match in IOC_PATTERN.finditer(text, pos, endpos):
+        kind = match.lastgroup
+        value = match.group()
+        if kind != 'hash' and ('[' in value or '(' in value or '{' in value):
+            value = refang(value)
+        if kind == 'ip' and not _valid_ip(value):
+            continue
+        if kind == 'hash' and len(value) not in HASH_LENGTHS:
+            continue
+        yield IocMatch(kind, value, match.start(), match.end())
+
+
+def group_iocs(matches, labels: Dict[str, str] = DEFAULT_LABELS, unique: bool = False) -> Dict[str, List[str]]:
+    """Group typed matches into the {label: [values]} layout the extractors return."""
+    grouped = {labels[kind]: [] for kind in IOC_TYPES if kind in labels}
+    seen = set()
+    for match in matches:
+        label = labels.get(match.type)
+        if label is None:
+            continue
+        if unique:
+            if (match.type, match.value) in seen:
+                continue
+            seen.add((match.type, match.value))
+        grouped[label].append(match.value)
+    return grouped
+
+
+def extract_iocs(text: str, labels: Dict[str, str] = DEFAULT_LABELS, unique: bool = False) -> Dict[str, List[str]]:
+    """Extract Indicators of Compromise from text with one scan."""
+    return group_iocs(scan_iocs(text), labels, unique)
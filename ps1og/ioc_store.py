@@ -0,0 +1,227 @@
+"""Compact store of the indicators seen across many reports.
+
+    store = IocStore()
+    store.add_report('a.txt', text)  # or store.add('a.txt', ioc_scanner.scan_iocs(text))
+    store.reports('192.168.1.1')     # ['a.txt', ...]
+    store.sightings('example.com')   # occurrences across all reports
+
+Every distinct indicator is stored once and gets an integer id. Values are
+stored compactly:
+
+- IPv4 addresses: packed into 32-bit integers
+- hashes: their raw digest bytes (half the size of the hex string)
+- domains and emails: lower-cased strings, interned in the store's own
+  table so every distinct name is one object
+
+Per-indicator type codes and sighting counts live in typed arrays.
+
+Report ids are interned to integers too. The indicator -> reports index is
+a CSR layout: each indicator's report numbers sit contiguously in one flat
+array. Reports added since the last merge wait in a per-indicator pending
+dict that queries read alongside the CSR arrays, so a query never rebuilds
+anything. The pending reports are merged (a NumPy sort of the postings) by
+freeze(), or by add() once they outnumber the indexed ones, which keeps the
+merge cost amortized constant per pair. Adding the same report id again
+counts its sightings again but lists the report once per indicator.
+"""
+import socket
+from array import array
+from itertools import chain
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import ioc_scanner
+from ioc_scanner import IocMatch
+
+KINDS = ioc_scanner.IOC_TYPES  # ('ip', 'domain', 'hash', 'email'); array code = position
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+HEX_DIGITS = '0123456789abcdefABCDEF'
+EMPTY = array('I')
+MIN_MERGE_PAIRS = 1 << 16  # pending (indicator, report) pairs add() lets pile up before merging
+
+
+class Indicator(NamedTuple):
+    type: str
+    value: str
+    sightings: int
+    reports: int
+
+
+def pack_ip(value: str) -> int:
+    # inet_aton() is much faster than four int() calls, but reads a leading zero as octal
+    if value[0] != '0' and '.0' not in value:
+        try:
+            return int.from_bytes(socket.inet_aton(value), 'big')
+        except OSError:
+            pass
+    a, b, c, d = value.split('.')
+    return int(a) << 24 | int(b) << 16 | int(c) << 8 | int(d)
+
+
+def unpack_ip(packed: int) -> str:
+    return f'{packed >> 24}.{packed >> 16 & 255}.{packed >> 8 & 255}.{packed & 255}'
+
+
+def classify(value: str) -> Optional[str]:
+    """IoC type of a single indicator string as ioc_scanner would report it, without a regex scan."""
+    if '@' in value:
+        return 'email'
+    if len(value) in ioc_scanner.HASH_LENGTHS and not value.strip(HEX_DIGITS):
+        return 'hash'
+    if '.' not in value:
+        return None
+    parts = value.split('.')
+    if len(parts) == 4 and all(map(str.isdigit, parts)):
+        return 'ip'
+    return 'domain'
+
+
+class IocStore:
+    """Deduplicated indicators, their sightings and the reports that mention them."""
+
+    def __init__(self):
+        self.report_ids: List[str] = []
+        self._report_numbers: Dict[str, int] = {}
+        # Per-type key -> indicator id; the keys are the compact values themselves
+        self._ips: Dict[int, int] = {}
+        self._hashes: Dict[bytes, int] = {}
+        self._names: Dict[str, int] = {}  # domains and emails (an '@' tells them apart)
+        # Per indicator id
+        self._kinds = array('B')
+        self._keys: List = []  # packed IP int, digest bytes or interned string
+        self._sightings = array('I')
+        self._last_report = array('i')  # guards against pairing an indicator with a report twice
+        # CSR index of the merged indicators: the reports of indicator i are
+        # postings[offsets[i]:offsets[i + 1]]
+        self._offsets = array('I', [0])
+        self._postings = array('I')
+        # Indicator id -> report numbers added since the last merge
+        self._pending: Dict[int, List[int]] = {}
+        self._pending_pairs = 0
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def __contains__(self, value: str) -> bool:
+        return self.indicator_id(value) is not None
+
+    def _key(self, kind: str, value: str):
+        if kind == 'ip':
+            return self._ips, pack_ip(value)
+        if kind == 'hash':
+            return self._hashes, bytes.fromhex(value)
+        return self._names, value.lower()
+
+    def add(self, report_id: str, matches: Iterable[IocMatch]) -> int:
+        """Record a report's IoC matches (ioc_scanner.scan_iocs); returns how many indicators were new."""
+        report = self._report_numbers.get(report_id)
+        readded = report is not None
+        if not readded:
+            report = self._report_numbers[report_id] = len(self.report_ids)
+            self.report_ids.append(report_id)
+        new = 0
+        for match in matches:
+            table, key = self._key(match.type, match.value)
+            indicator = table.get(key)
+            if indicator is None:
+                indicator = table[key] = len(self._kinds)
+                self._kinds.append(KIND_CODES[match.type])
+                self._keys.append(key)
+                self._sightings.append(0)
+                self._last_report.append(-1)
+                new += 1
+            self._sightings[indicator] += 1
+            if self._last_report[indicator] == report:
+                continue
+            self._last_report[indicator] = report
+            if readded and report in self._report_numbers_of(indicator):
+                continue
+            pending = self._pending.get(indicator)
+            if pending is None:
+                self._pending[indicator] = [report]
+            else:
+                pending.append(report)
+            self._pending_pairs += 1
+        if self._pending_pairs > max(len(self._postings), MIN_MERGE_PAIRS):
+            self.freeze()
+        return new
+
+    def add_report(self, report_id: str, text: str) -> int:
+        return self.add(report_id, ioc_scanner.scan_iocs(text))
+
+    def indicator_id(self, value: str, kind: Optional[str] = None) -> Optional[int]:
+        value = value.strip()
+        if kind is not None:
+            table, key = self._key(kind, value)
+            return table.get(key)
+        # classify() and _key() in one pass, since every query runs this
+        if '@' in value:
+            return self._names.get(value.lower())
+        if len(value) in ioc_scanner.HASH_LENGTHS and not value.strip(HEX_DIGITS):
+            return self._hashes.get(bytes.fromhex(value))
+        parts = value.split('.')
+        if len(parts) == 4 and all(map(str.isdigit, parts)):
+            return self._ips.get(pack_ip(value))
+        return self._names.get(value.lower()) if len(parts) > 1 else None
+
+    def value(self, indicator: int) -> Tuple[str, str]:
+        """(type, canonical value) of an indicator id."""
+        kind = KINDS[self._kinds[indicator]]
+        key = self._keys[indicator]
+        if kind == 'ip':
+            return kind, unpack_ip(key)
+        if kind == 'hash':
+            return kind, key.hex()
+        return kind, key
+
+    def sightings(self, value: str, kind: Optional[str] = None) -> int:
+        """Occurrences of an indicator across all reports (0 if never seen)."""
+        indicator = self.indicator_id(value, kind)
+        return 0 if indicator is None else self._sightings[indicator]
+
+    def freeze(self):
+        """Merge the pending reports into the CSR arrays; add() does this on its own as they pile up."""
+        if not self._pending:
+            return
+        count = len(self._kinds)
+        old_offsets = np.frombuffer(self._offsets, dtype=np.uint32)
+        old_ids = np.repeat(np.arange(len(old_offsets) - 1, dtype=np.uint32), np.diff(old_offsets))
+        new_ids = np.repeat(np.fromiter(self._pending, dtype=np.uint32, count=len(self._pending)),
+                            [len(reports) for reports in self._pending.values()])
+        new_reports = np.fromiter(chain.from_iterable(self._pending.values()), dtype=np.uint32,
+                                  count=self._pending_pairs)
+        ids = np.concatenate((old_ids, new_ids))
+        # Stable, so each indicator keeps its merged reports first, then the pending ones in order
+        order = np.argsort(ids, kind='stable')
+        postings = np.concatenate((np.frombuffer(self._postings, dtype=np.uint32), new_reports))[order]
+        offsets = np.zeros(count + 1, dtype=np.uint32)
+        np.cumsum(np.bincount(ids, minlength=count), out=offsets[1:])
+        self._offsets, self._postings = array('I', offsets.tobytes()), array('I', postings.tobytes())
+        self._pending, self._pending_pairs = {}, 0
+
+    def _report_numbers_of(self, indicator: int) -> Iterable[int]:
+        """Report numbers of an indicator: the merged ones, then the pending ones."""
+        offsets = self._offsets
+        merged = self._postings[offsets[indicator]:offsets[indicator + 1]] if indicator + 1 < len(offsets) else EMPTY
+        pending = self._pending.get(indicator)
+        return merged + array('I', pending) if pending else merged
+
+    def reports(self, value: str, kind: Optional[str] = None) -> List[str]:
+        """Ids of the reports that mention an indicator, in the order they were added."""
+        indicator = self.indicator_id(value, kind)
+        if indicator is None:
+            return []
+        report_ids = self.report_ids
+        return [report_ids[report] for report in self._report_numbers_of(indicator)]
+
+    def indicators(self, kind: Optional[str] = None) -> Iterator[Indicator]:
+        """Every stored indicator with its sightings and report count."""
+        self.freeze()
+        for indicator in range(len(self._kinds)):
+            if kind is None or KINDS[self._kinds[indicator]] == kind:
+                yield Indicator(*self.value(indicator), self._sightings[indicator],
+                                self._offsets[indicator + 1] - self._offsets[indicator])
+
+    def most_sighted(self, n: int = 10, kind: Optional[str] = None) -> List[Indicator]:
+        return sorted(self.indicators(kind), key=lambda indicator: -indicator.sightings)[:n]
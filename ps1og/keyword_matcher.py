@@ -0,0 +1,176 @@
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Words are runs of letters/digits; other punctuation is a token of its own.
+# Whitespace and hyphens only separate tokens, so "spear-phishing",
+# "spear phishing" and "Spear  Phishing" all produce the same token sequence.
+TOKEN_PATTERN = re.compile(r'[^\W_]+|[^\w\s-]')
+
+# ATT&CK kinds whose names only match with ATT&CK's own casing: "Sofacy" but not "sofacy"
+CASE_SENSITIVE_KINDS = frozenset({'group'})
+# ATT&CK groups named or aliased with dictionary words; they are left out of the vocabulary
+COMMON_WORD_GROUPS = frozenset({'silence', 'inception', 'equation', 'snake', 'machete', 'patchwork', 'strider',
+                                'cleaver', 'axiom', 'krypton', 'sidewinder', 'dragonfly', 'honeybee', 'leviathan'})
+
+
+class KeywordMatch(NamedTuple):
+    keyword: str
+    payload: Any
+    start: int
+    end: int
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded token sequence used for both keywords and text."""
+    return [token.casefold() for token in TOKEN_PATTERN.findall(text)]
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over word tokens.
+
+    Matching only happens on token (word) boundaries and is case-insensitive,
+    except for keywords added with case_sensitive=True.
+    finditer() makes one pass over the text; its cost depends on the number of
+    tokens in the text, not on how many keywords were added.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (keyword, token length, payload, exact tokens or None) of keywords
+        # ending exactly there, and the same merged with everything reachable through failure links
+        self._own: List[List[Tuple[str, int, Any, Optional[List[str]]]]] = [[]]
+        self._out: List[List[Tuple[str, int, Any, Optional[List[str]]]]] = [[]]
+        self._built = True
+        self.max_tokens = 0
+        self.size = 0
+
+    def add(self, keyword: str, payload: Any = None, case_sensitive: bool = False):
+        """Register keyword; payload is returned with every match of it.
+
+        A case_sensitive keyword only matches text spelled with its casing.
+        """
+        tokens = tokenize(keyword)
+        if not tokens:
+            return
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._own.append([])
+            state = next_state
+        exact = TOKEN_PATTERN.findall(keyword) if case_sensitive else None
+        self._own[state].append((keyword, len(tokens), payload, exact))
+        self.max_tokens = max(self.max_tokens, len(tokens))
+        self.size += 1
+        self._built = False
+
+    def add_all(self, keywords: Iterable[Tuple[str, Any]]):
+        for keyword, payload in keywords:
+            self.add(keyword, payload)
+        return self
+
+    def build(self):
+        """Compute failure links (breadth-first) and merge outputs along them."""
+        self._out = [list(outputs) for outputs in self._own]
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(token, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+        self._built = True
+        return self
+
+    def finditer(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[KeywordMatch]:
+        """Yield every keyword occurrence, with character offsets, in one linear pass."""
+        if not self._built:
+            self.build()
+        if endpos is None:
+            endpos = len(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        # The last max_tokens tokens, to recover match starts and casing
+        recent = deque(maxlen=max(self.max_tokens, 1))
+        state = 0
+        for match in TOKEN_PATTERN.finditer(text, pos, endpos):
+            token = match.group().casefold()
+            recent.append(match)
+            while state and token not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(token, 0)
+            if out[state]:
+                end = match.end()
+                for keyword, length, payload, exact in out[state]:
+                    if exact is not None and any(recent[i - length].group() != word for i, word in enumerate(exact)):
+                        continue
+                    yield KeywordMatch(keyword, payload, recent[-length].start(), end)
+
+    def findall(self, text: str) -> List[KeywordMatch]:
+        return list(self.finditer(text))
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, Any]) -> 'KeywordMatcher':
+        """Build a matcher whose payloads are the mapping values."""
+        return cls().add_all(mapping.items()).build()
+
+
+def attack_keywords(index) -> Iterator[Tuple[str, Tuple[str, str, str]]]:
+    """(keyword, (kind, ATT&CK id, canonical name)) for every tactic, technique and group alias.
+
+    Group names in COMMON_WORD_GROUPS are left out.
+    """
+    for tactic in index.tactics():
+        yield tactic.name, ('tactic', tactic.id, tactic.name)
+    for technique in index.techniques():
+        yield technique.name, ('technique', technique.id, technique.name)
+    for group in index.groups():
+        for name in (group.name,) + group.aliases:
+            if name.casefold() not in COMMON_WORD_GROUPS:
+                yield name, ('group', group.id, group.name)
+
+
+def add_attack_keywords(matcher: KeywordMatcher, index) -> KeywordMatcher:
+    """Add attack_keywords(index), CASE_SENSITIVE_KINDS with their ATT&CK casing."""
+    for keyword, payload in attack_keywords(index):
+        matcher.add(keyword, payload, case_sensitive=payload[0] in CASE_SENSITIVE_KINDS)
+    return matcher
+
+
+def attack_matcher(index) -> KeywordMatcher:
+    """Matcher over the full ATT&CK vocabulary of a loaded attack_index.AttackIndex."""
+    return add_attack_keywords(KeywordMatcher(), index).build()
+
+
+def ttp_matcher(tactics: Dict[str, str], techniques: Dict[str, str], index=None) -> KeywordMatcher:
+    """Matcher over keyword -> ATT&CK id mappings, extended with the full index vocabulary if given."""
+    matcher = KeywordMatcher()
+    matcher.add_all((name, ('tactic', code, name.title())) for name, code in tactics.items())
+    matcher.add_all((name, ('technique', code, name.title())) for name, code in techniques.items())
+    if index is not None:
+        add_attack_keywords(matcher, index)
+    return matcher.build()
+
+
+def group_ttps(matches: Iterable[KeywordMatch]) -> Dict[str, List[List[str]]]:
+    """Collapse tactic/technique hits into the {'Tactics': [[id, name]], 'Techniques': [...]} layout."""
+    ttps = {'Tactics': [], 'Techniques': []}
+    keys = {'tactic': 'Tactics', 'technique': 'Techniques'}
+    seen = set()
+    for match in matches:
+        kind, code, name = match.payload
+        if kind in keys and code not in seen:
+            seen.add(code)
+            ttps[keys[kind]].append([code, name])
+    return ttps
@@ -48,22 +48,28 @@
 
 
 
-import re
+import sys
 import requests
+import ioc_scanner
+import attack_index
+from keyword_matcher import KeywordMatcher
 
 
 class ThreatIntelligenceExtractor:
     def __init__(self, api_key=None):
         self.api_key = api_key  # For VirusTotal or other APIs
+        self._threat_actors = None
+        self._ttp_matcher = None
+        self._actor_matcher = None
 
     def extract_iocs(self, text):
-        iocs = {
-            "IP addresses": re.findall(r'\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b', text),
-            "Domains": re.findall(r'[a-zA-Z0-9-]+\.[a-zA-Z]{2,}', text),
-            "File Hashes": re.findall(r'\b[a-fA-F0-9]{32}\b|\b[a-fA-F0-9]{40}\b|\b[a-fA-F0-9]{64}\b', text),
-            "Email Addresses": re.findall(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', text),
+        labels = {
+            "ip": "IP addresses",
+            "domain": "Domains",
+            "hash": "File Hashes",
+            "email": "Email Addresses",
         }
-        return iocs
+        return ioc_scanner.extract_iocs(text, labels, unique=True)
 
     def fetch_ttps(self):
         # Fetch TTPs from MITRE ATT&CK Framework
@@ -81,25 +87,42 @@ class ThreatIntelligenceExtractor:
         }
 
     def extract_ttps(self, text):
-        ttp_mapping = self.fetch_ttps()  # Get the complete TTP dictionary
+        if self._ttp_matcher is None:
+            # Compile the complete TTP dictionary into one keyword automaton
+            self._ttp_matcher = KeywordMatcher.from_mapping(self.fetch_ttps())
         extracted_tactics = []
         extracted_techniques = []
-        for keyword, tactic in ttp_mapping.items():
-            if keyword.lower() in text.lower():
-                extracted_tactics.append(tactic)
-                extracted_techniques.append(keyword)
+        for match in self._ttp_matcher.finditer(text):
+            if match.keyword not in extracted_techniques:
+                extracted_tactics.append(match.payload)
+                extracted_techniques.append(match.keyword)
         return {"Tactics": extracted_tactics, "Techniques": extracted_techniques}
 
     def fetch_threat_actors(self):
-        # Fetch threat actor names from MITRE ATT&CK
-        url = "https://attack.mitre.org/groups/"
-        response = requests.get(url).text
-        actors = re.findall(r'<td><a href=".*?">(.*?)</a></td>', response)
-        return actors
+        # Threat actor names and aliases from the local, memory-mapped ATT&CK index
+        # (python attack_index.py build enterprise-attack.json) instead of scraping
+        # https://attack.mitre.org/groups/ on every call. Without the index no actors are matched.
+        if self._threat_actors is None:
+            index = attack_index.try_load_index()
+            if index is None:
+                print("ATT&CK index not built (python attack_index.py build enterprise-attack.json); "
+                      "threat actors will not be matched", file=sys.stderr)
+            actors = []
+            for group in index.groups() if index else ():
+                actors.append(group.name)
+                actors.extend(group.aliases)
+            self._threat_actors = actors
+        return self._threat_actors
 
     def extract_threat_actors(self, text):
-        threat_actors = self.fetch_threat_actors()
-        return [actor for actor in threat_actors if actor.lower() in text.lower()]
+        if self._actor_matcher is None:
+            threat_actors = self.fetch_threat_actors()
+            self._actor_matcher = KeywordMatcher().add_all((actor, actor) for actor in threat_actors).build()
+        found = []
+        for match in self._actor_matcher.finditer(text):
+            if match.payload not in found:
+                found.append(match.payload)
+        return found
 
     def enrich_malware(self, hash_value):
         if not self.api_key:
@@ -0,0 +1,185 @@
+"""Rank and filter malware-name candidates before any VirusTotal lookup.
+
+The extractors used to look up every capitalized word or phrase ("The",
+"Iran", repeats included). A candidate is now looked up only if enough
+evidence points to a malware family:
+
+- the ATT&CK software gazetteer (malware and tool names and aliases); tool
+  names only count written exactly as in ATT&CK, and never when they are
+  ordinary words ("at", "net", "ping")
+- context cues such as "Shamoon malware" or "a backdoor called Foo"
+- NER labels from an already parsed Doc (PRODUCT supports a name; GPE,
+  PERSON, DATE and the like rule it out)
+"""
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
+
+CUE_WORDS = ('malware', 'ransomware', 'trojan', 'backdoor', 'wiper', 'rat', 'loader', 'dropper', 'implant',
+             'worm', 'botnet', 'stealer', 'infostealer', 'spyware', 'rootkit', 'keylogger', 'variant', 'family')
+
+# A capitalized or digit-bearing name: "Shamoon", "NotPetya", "njRAT", "PlugX-2"
+_NAME = r'(?:[A-Z][\w-]*|[a-z]+[A-Z0-9][\w-]*)'
+_CUES = '|'.join(CUE_WORDS)
+
+# "<name> malware" or "malware (called|named|dubbed|known as) <name>"; cue words match
+# in any case, and the cue after a name is not consumed so it can introduce the next one
+CUE_PATTERN = re.compile(
+    rf'\b(?P<before>{_NAME})(?=\s+(?i:{_CUES})s?\b)'
+    rf'|\b(?i:{_CUES})s?,?\s+(?:(?i:called|named|dubbed|known\s+as)\s+)?(?P<after>{_NAME})'
+)
+
+# Capitalized words a cue often follows or precedes that are never names
+STOPWORDS = frozenset(word.casefold() for word in (
+    'The', 'This', 'That', 'These', 'Those', 'A', 'An', 'Its', 'Their', 'Our', 'New', 'Same', 'Such', 'Which',
+    'Any', 'Each', 'Other', 'Known', 'Called', 'Named', 'Custom', 'Unknown', 'Malicious', 'Destructive',
+    'Was', 'Is', 'And', 'Or', 'With', 'Using', 'Via', 'From', 'By'
+) + CUE_WORDS)
+
+GAZETTEER_SCORES = {'malware': 3, 'tool': 2}
+# Kinds whose names are matched case-sensitively: "Mimikatz" but not "mimikatz the team"
+CASE_SENSITIVE_KINDS = frozenset({'tool'})
+# ATT&CK software named with dictionary words; their gazetteer hits are ignored
+COMMON_WORD_NAMES = frozenset({'at', 'net', 'ping', 'cmd', 'route', 'ftp', 'reg', 'expand', 'tor'})
+CUE_SCORE = 2
+SUPPORTING_LABELS = {'PRODUCT': 1, 'WORK_OF_ART': 1}
+EXCLUDING_LABELS = frozenset({'GPE', 'NORP', 'LOC', 'PERSON', 'DATE', 'TIME', 'CARDINAL', 'ORDINAL',
+                              'LANGUAGE', 'MONEY', 'PERCENT', 'QUANTITY', 'FAC', 'EVENT', 'LAW'})
+EXCLUDED_SCORE = -5
+DEFAULT_MIN_SCORE = 2
+
+
+class Candidate(NamedTuple):
+    name: str
+    score: int
+    reasons: Tuple[str, ...]
+
+
+class RankedCandidates(NamedTuple):
+    candidates: List[Candidate]  # best first; only these are looked up
+    proposed: int  # lookups the unfiltered extractor would have made
+
+    @property
+    def names(self) -> List[str]:
+        return [candidate.name for candidate in self.candidates]
+
+    @property
+    def lookups_saved(self) -> int:
+        return self.proposed - len(self.candidates)
+
+    def summary(self) -> Dict[str, int]:
+        return {'candidates': self.proposed, 'lookups': len(self.candidates), 'lookups_saved': self.lookups_saved}
+
+
+def software_gazetteer(index) -> Iterable[Tuple[str, Tuple[str, str, str]]]:
+    """(name, (kind, ATT&CK id, canonical name)) for every software name and alias."""
+    for software in index.software():
+        for name in (software.name,) + software.aliases:
+            yield name, (software.kind, software.id, software.name)
+
+
+class Evidence:
+    """Votes for each candidate name; one report's evidence can be gathered in pieces and merged."""
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}  # casefolded -> display name
+        self.votes: Dict[str, Dict[str, int]] = {}  # casefolded -> reason -> score, one vote per reason
+        self.canonical: Set[str] = set()  # keys whose display name came from the gazetteer
+        self.labels: Dict[str, str] = {}  # casefolded entity text -> NER label
+        self.proposed = 0
+
+    def support(self, name: str, score: int, reason: str, canonical: bool = False):
+        key = name.casefold()
+        if key in STOPWORDS:
+            return
+        if canonical:
+            self.canonical.add(key)
+            self.names[key] = name
+        elif key not in self.names:
+            self.names[key] = name
+        self.votes.setdefault(key, {})[reason] = score
+
+    def update(self, other: 'Evidence') -> 'Evidence':
+        """Fold in evidence from another piece of the same report."""
+        for key, name in other.names.items():
+            if key in other.canonical or key not in self.names:
+                self.names[key] = name
+        self.canonical.update(other.canonical)
+        for key, reasons in other.votes.items():
+            self.votes.setdefault(key, {}).update(reasons)
+        self.labels.update(other.labels)
+        self.proposed += other.proposed
+        return self
+
+    def copy(self) -> 'Evidence':
+        return Evidence().update(self)
+
+
+class MalwareRanker:
+    """Scores malware-name candidates; reused across reports."""
+
+    def __init__(self, index=None, min_score: int = DEFAULT_MIN_SCORE, max_lookups: Optional[int] = None):
+        self.min_score = min_score
+        self.max_lookups = max_lookups
+        self.gazetteer: Optional[KeywordMatcher] = None
+        if index is not None:
+            self.gazetteer = KeywordMatcher().add_all(software_gazetteer(index)).build()
+
+    def rank(self, text: str, doc: Optional['Doc'] = None, proposed: Iterable[str] = (),
+             exclude: Iterable[str] = ()) -> RankedCandidates:
+        """Dedupe, score and filter candidates found in text.
+
+        proposed are the names the caller's own heuristic came up with; they are
+        scored alongside gazetteer and cue hits and only counted, never trusted.
+        exclude holds names known to be something else (threat actors).
+        """
+        return self.select(self.collect(text, doc, proposed), exclude)
+
+    def collect(self, text: str, doc: Optional['Doc'] = None, proposed: Iterable[str] = (),
+                pos: int = 0, endpos: Optional[int] = None) -> Evidence:
+        """Evidence from text; with pos/endpos, only from hits starting in text[pos:endpos]."""
+        if endpos is None:
+            endpos = len(text)
+        evidence = Evidence()
+        if self.gazetteer is not None:
+            for match in self.gazetteer.finditer(text):
+                if pos <= match.start < endpos:
+                    kind, _, canonical = match.payload
+                    if match.keyword.casefold() in COMMON_WORD_NAMES:
+                        continue
+                    if kind in CASE_SENSITIVE_KINDS and text[match.start:match.end] != match.keyword:
+                        continue
+                    evidence.support(canonical, GAZETTEER_SCORES.get(kind, 1), f'attack:{kind}', canonical=True)
+        for match in CUE_PATTERN.finditer(text):
+            if pos <= match.start() < endpos:
+                evidence.support(match.group('before') or match.group('after'), CUE_SCORE, 'context')
+        for name in proposed:
+            evidence.proposed += 1
+            evidence.support(name, 0, 'proposed')
+        if doc is not None:
+            for ent in doc.ents:
+                if pos <= ent.start_char < endpos:
+                    evidence.labels[ent.text.casefold()] = ent.label_
+        return evidence
+
+    def select(self, evidence: Evidence, exclude: Iterable[str] = ()) -> RankedCandidates:
+        """Score the collected evidence (NER labels included) and keep the names worth a lookup."""
+        excluded = {name.casefold() for name in exclude}
+        candidates = []
+        for key, reasons in evidence.votes.items():
+            label = evidence.labels.get(key)
+            if label in SUPPORTING_LABELS:
+                reasons = {**reasons, f'ner:{label}': SUPPORTING_LABELS[label]}
+            elif label in EXCLUDING_LABELS:
+                reasons = {**reasons, f'ner:{label}': EXCLUDED_SCORE}
+            score = sum(reasons.values())
+            if score >= self.min_score and key not in excluded:
+                candidates.append(Candidate(evidence.names[key], score, tuple(reasons)))
+        candidates.sort(key=lambda candidate: -candidate.score)
+        if self.max_lookups is not None:
+            candidates = candidates[:self.max_lookups]
+        return RankedCandidates(candidates, evidence.proposed)
@@ -0,0 +1,107 @@
+"""Local stand-in for the VirusTotal v3 API, for offline tests and benchmarks.
+
+    python mock_vt_server.py --port 8765 --latency 0.2
+    VT_BASE_URL=http://127.0.0.1:8765/api/v3 python cltest3.py report.txt
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+# Known samples; any other name answers 404 like the real API
+SAMPLES = {
+    'shamoon': {
+        'md5': 'b14299fd4d1cbfb4cc7486d978398214',
+        'sha1': '4744df6ac02ff0a3f9ad0bf47b15854bbebb73c9',
+        'sha256': '4744df6ac02ff0a3f9ad0bf47b15854bbebb73c9a6c5b0c5cd3ab0e8bd1f4b0a',
+        'ssdeep': '3072:Qq2dD5JnvYyJmNwQ:Qq2dDjvYyJ',
+        'tlsh': 'T1A0E32A1B7E8C4E5B6C7D8E9F0A1B2C3D4E5F6A7B8C9D0E1F2A3B4C5D6E7F8A9B0C1D2',
+        'tags': ['wiper', 'disttrack'],
+    },
+}
+
+
+class MockVirusTotal(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.0, rate_limit: int = 0):
+        super().__init__(address, MockHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit  # answer 429 after this many requests per second (0 = never)
+        self.lock = threading.Lock()
+        self.hits = {}
+        self.window = (0, 0)
+
+    def record(self, path: str) -> bool:
+        """Count a request; return False if it should be rate limited."""
+        with self.lock:
+            self.hits[path] = self.hits.get(path, 0) + 1
+            second, count = self.window
+            now = int(time.time())
+            count = count + 1 if now == second else 1
+            self.window = (now, count)
+            return not self.rate_limit or count <= self.rate_limit
+
+    @property
+    def total_requests(self) -> int:
+        with self.lock:
+            return sum(self.hits.values())
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not self.server.record(self.path):
+            return self._send(429, {'error': {'code': 'QuotaExceededError'}})
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if url.path.startswith('/api/v3/files/'):
+            name = unquote(url.path.rsplit('/', 1)[-1]).lower()
+            attributes = SAMPLES.get(name)
+        elif url.path == '/api/v3/search':
+            name = parse_qs(url.query).get('query', [''])[0].lower()
+            attributes = SAMPLES.get(name)
+        else:
+            attributes = None
+
+        if attributes is None:
+            return self._send(404, {'error': {'code': 'NotFoundError'}})
+        self._send(200, {'data': {'type': 'file', 'id': attributes['sha256'], 'attributes': attributes}})
+
+
+def start(port: int = 0, latency: float = 0.0, rate_limit: int = 0) -> MockVirusTotal:
+    """Start the mock server on a background thread; base URL is http://127.0.0.1:{port}/api/v3."""
+    server = MockVirusTotal(('127.0.0.1', port), latency, rate_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--rate-limit', type=int, default=0, help='requests/second before answering 429')
+    args = parser.parse_args()
+    server = MockVirusTotal(('127.0.0.1', args.port), args.latency, args.rate_limit)
+    print(f'mock VirusTotal on http://127.0.0.1:{args.port}/api/v3')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+from typing import Iterator, List, Tuple
+
+from PyPDF2 import PdfReader
+
+from batch import map_batches
+
+# Inserted between pages so the last word of a page is not glued to the first
+# word of the next one
+PAGE_SEPARATOR = '\n'
+
+
+def page_count(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def iter_pdf_pages(file_path: str, n_process: int = 1, pages_per_task: int = 4) -> Iterator[str]:
+    """Yield the text of each page in order, as soon as it has been extracted.
+
+    With n_process > 1 pages are extracted in parallel worker processes, a
+    bounded number of tasks ahead of the consumer.
+    """
+    if n_process == 1:
+        for page in PdfReader(file_path).pages:
+            yield (page.extract_text() or '') + PAGE_SEPARATOR
+        return
+    tasks = ((file_path, number) for number in range(page_count(file_path)))
+    yield from map_batches(_extract_pages, tasks, pages_per_task, n_process)
+
+
+# Per-worker reader cache so each process parses the PDF structure once
+_readers = {}
+
+
+def _extract_pages(tasks: List[Tuple[str, int]]) -> List[str]:
+    texts = []
+    for file_path, number in tasks:
+        reader = _readers.get(file_path)
+        if reader is None:
+            _readers.clear()
+            reader = _readers[file_path] = PdfReader(file_path)
+        texts.append((reader.pages[number].extract_text() or '') + PAGE_SEPARATOR)
+    return texts
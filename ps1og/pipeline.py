@@ -0,0 +1,154 @@
+"""Asyncio pipeline that overlaps reading, analysis and VirusTotal lookups across many reports.
+
+    ingest --queue--> analyze (process pool) --queue--> enrich (VirusTotal) --> results
+
+    python pipeline.py reports/*.txt reports/*.pdf --workers 4
+
+Ingestion reads each source on a thread; PDFs go through pdf_source. The
+regex, TTP and NLP stages run in worker processes. They share this
+process's loaded cltest3.ThreatIntelExtractor (prefork.py). The malware
+stage ranks candidates there, but the lookups happen in the enrichment
+stage. It awaits VirusTotal on the event loop, so many reports can wait on
+the network while the workers parse the next ones.
+
+The queues between stages are bounded, so a slow stage holds back the ones
+before it and only a few reports per stage are in memory. Results come out
+in completion order, tagged with their source. Reports already in the
+extractor's result cache skip both stages.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, NamedTuple, Tuple, Union
+
+import cltest3
+import prefork
+from cltest3 import ThreatIntelExtractor, parse_stages
+
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_LOOKUPS = 32  # reports enriched concurrently
+
+# A file path (.pdf read page by page) or a (source id, text) pair
+Source = Union[str, Tuple[str, str]]
+
+
+class PipelineResult(NamedTuple):
+    source: str
+    results: Dict[str, Any]
+    latency: float  # seconds from the start of reading to finished enrichment
+
+
+def read_source(path: str) -> str:
+    if path.lower().endswith('.pdf'):
+        import pdf_source
+        return ''.join(pdf_source.iter_pdf_pages(path))
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+
+async def run_pipeline(sources: Iterable[Source], extractor: ThreatIntelExtractor, workers: int = 1,
+                       queue_size: int = DEFAULT_QUEUE_SIZE,
+                       lookups: int = DEFAULT_LOOKUPS) -> AsyncIterator[PipelineResult]:
+    """Extract every source, yielding results as they complete.
+
+    The workers share this extractor's loaded model (prefork.py); in this
+    process it serves the result cache and the VirusTotal lookups.
+    """
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue(queue_size)  # read, waiting for a worker
+    analyzed = asyncio.Queue(queue_size)  # analyzed, waiting for lookups
+    output = asyncio.Queue(queue_size)
+    context, initializer, initargs = extractor.worker_pool_setup()
+    pool = ProcessPoolExecutor(workers, mp_context=context, initializer=initializer, initargs=initargs)
+    # A fork-context executor forks all its workers on the first submit
+    pool.submit(int).result()
+    prefork.unfreeze()
+
+    async def ingest():
+        for source in sources:
+            start = time.perf_counter()
+            if isinstance(source, str):
+                source_id, text = source, await asyncio.to_thread(read_source, source)
+            else:
+                source_id, text = source
+            await pending.put((source_id, text, start))
+
+    async def analyze():
+        while (item := await pending.get()) is not None:
+            source_id, text, start = item
+            results = extractor.result_cache.get(text)
+            cached = results is not None
+            if not cached:
+                results = await loop.run_in_executor(pool, cltest3._analyze_offline, text)
+            await analyzed.put((source_id, text, start, results, cached))
+
+    async def enrich():
+        while (item := await analyzed.get()) is not None:
+            source_id, text, start, results, cached = item
+            if not cached:
+                if 'Malware' in results:
+                    names = results['Malware']
+                    details = await extractor.get_malware_details_async(names)
+                    results['Malware'] = [details[name] for name in names if details[name]]
+                extractor.result_cache.put(text, results)
+            await output.put(PipelineResult(source_id, results, time.perf_counter() - start))
+
+    # Two per worker, so a worker never idles while a result travels back
+    analyzers = [asyncio.create_task(analyze()) for _ in range(2 * workers)]
+    enrichers = [asyncio.create_task(enrich()) for _ in range(lookups)]
+    tasks = [asyncio.create_task(ingest()), *analyzers, *enrichers]
+
+    async def supervise():
+        # Shut the stages down in order; on any failure cancel the rest
+        try:
+            await tasks[0]
+            for _ in analyzers:
+                await pending.put(None)
+            await asyncio.gather(*analyzers)
+            for _ in enrichers:
+                await analyzed.put(None)
+            await asyncio.gather(*enrichers)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            await output.put(None)
+
+    supervisor = asyncio.create_task(supervise())
+    try:
+        while (result := await output.get()) is not None:
+            yield result
+        await supervisor
+    finally:
+        for task in (supervisor, *tasks):
+            task.cancel()
+        pool.shutdown(cancel_futures=True)
+
+
+async def print_results(args, extractor: ThreatIntelExtractor):
+    async for result in run_pipeline(args.paths, extractor, args.workers, args.queue_size, args.lookups):
+        print(json.dumps({'source': result.source, **result.results}))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='report files (.pdf or text); one JSON result per line is printed')
+    parser.add_argument('--workers', type=int, default=1, help='analysis processes')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help='reports waiting per stage')
+    parser.add_argument('--lookups', type=int, default=DEFAULT_LOOKUPS,
+                        help='reports whose VirusTotal lookups run at once')
+    parser.add_argument('--only', type=parse_stages, metavar='STAGES', help='comma-separated stages to run')
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='model')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    asyncio.run(print_results(args, ThreatIntelExtractor(args.only, args.ner)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Worker pools forked from a parent that has already loaded the extractor.
+
+    context, initializer, initargs = prefork.worker_setup(extractor, cltest3._init_shared_worker)
+    pool = context.Pool(4, initializer, initargs)
+    prefork.unfreeze()
+
+Without it, every worker builds its own cltest3.ThreatIntelExtractor: the
+spaCy model (or the rule pipeline), the keyword automata, the malware
+gazetteer and the mapping dicts. Resident memory then grows with the number
+of workers. Here the parent builds and warms up the extractor once. It then
+moves every live object into the garbage collector's permanent generation
+(gc.freeze) and forks. The workers read the parent's objects from
+copy-on-write pages. The cyclic collector never scans frozen objects, so its
+bookkeeping writes do not copy those pages. Once the pool has forked, the
+parent unfreezes (unfreeze()) so its own garbage, including cycles through
+objects made before the fork, is collected again.
+
+Refcount changes still copy the pages of objects a worker touches. Most of a
+spaCy model is NumPy buffers, whose pages stay shared. The ATT&CK index is
+an mmap of one file, so its pages are shared either way.
+
+The extractor reaches the workers as an initializer argument. A forked
+process inherits its arguments rather than unpickling them. The initializer
+installs a shallow copy with its own result cache and no profiler
+(ThreatIntelExtractor.for_worker()): a SQLite connection must not cross a
+fork. This needs the fork start method. Where it is missing,
+ThreatIntelExtractor.worker_pool_setup() falls back to workers that build
+their own extractor.
+"""
+import gc
+import multiprocessing
+from multiprocessing.context import BaseContext
+from typing import Callable, Tuple
+
+# Analyzed once before the fork, so first-call work is done in the parent
+WARM_UP_TEXT = ('APT33 used spear phishing and PowerShell against the energy sector, '
+                'beaconing to 192.168.1.1 and example.com.')
+
+
+def available() -> bool:
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def warm_up(extractor):
+    """Build what the extractor creates lazily (the NLP pipeline, first-call caches) so workers inherit it."""
+    if extractor.nlp_stages:
+        extractor.nlp.load()
+    extractor.for_worker()._analyze_report(WARM_UP_TEXT, lookup=False)
+
+
+def worker_setup(extractor, initializer: Callable) -> Tuple[BaseContext, Callable, tuple]:
+    """Fork context, initializer and initargs for a pool whose workers share extractor's loaded state.
+
+    initializer(extractor) installs the worker's copy. Create the pool right
+    away, before other threads start or big objects are built: what exists at
+    the fork is what the workers share. Call unfreeze() once it has forked.
+    """
+    warm_up(extractor)
+    gc.collect()
+    gc.freeze()
+    return multiprocessing.get_context('fork'), initializer, (extractor,)
+
+
+def unfreeze():
+    """Return the frozen objects to the collector once the pool's workers have forked; a no-op otherwise."""
+    gc.unfreeze()
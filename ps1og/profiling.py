@@ -0,0 +1,320 @@
+"""Per-stage wall/CPU/allocation profiling of the extraction pipeline.
+
+    profiler = Profiler([JsonLinesSink('trace.jsonl')], track_allocations=True)
+    with profiler.report('report.pdf'):
+        with profiler.stage('iocs'):
+            ...
+    print(format_breakdown(profiler.totals()))
+
+Each report and each stage inside it becomes a Span handed to the sinks:
+JSON lines, a Prometheus text-format file, or OpenTelemetry-style spans sent
+as OTLP/HTTP JSON to a local collector. A disabled Profiler (the default
+everywhere) costs one attribute check per stage.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+DEFAULT_OTLP_ENDPOINT = 'http://127.0.0.1:4318/v1/traces'
+
+
+class Span(NamedTuple):
+    name: str  # 'report' or the stage name
+    report: Optional[str]
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int  # wall clock, for exporters
+    wall: float  # seconds
+    cpu: float  # thread CPU seconds
+    alloc_bytes: Optional[int]  # net bytes still allocated at the end (with track_allocations)
+    peak_bytes: Optional[int]  # peak traced bytes above the start during the span
+
+
+class Totals(NamedTuple):
+    calls: int
+    wall: float
+    cpu: float
+    alloc_bytes: int
+    peak_bytes: int
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def _accumulate(totals: Dict[str, List], span: Span):
+    """Fold a span into per-name [calls, wall, cpu, alloc_bytes, peak_bytes] totals."""
+    item = totals.setdefault(span.name, [0, 0.0, 0.0, 0, 0])
+    item[0] += 1
+    item[1] += span.wall
+    item[2] += span.cpu
+    item[3] += span.alloc_bytes or 0
+    item[4] = max(item[4], span.peak_bytes or 0)
+
+
+class Profiler:
+    """Records report and stage spans and forwards them to the sinks.
+
+    Stages nest under the report open on the current thread; a stage outside
+    any report (e.g. reading the next input file) is recorded on its own.
+    """
+
+    def __init__(self, sinks: Iterable = (), enabled: bool = True, track_allocations: bool = False):
+        self.sinks = list(sinks)
+        self.enabled = enabled
+        self.track_allocations = track_allocations
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self._totals: Dict[str, List] = {}
+        self._reports = 0
+        if enabled and track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def _span(self, name: str, report: Optional[str], trace_id: str, parent_id: Optional[str],
+              span_id: str) -> Iterator[None]:
+        if self.track_allocations:
+            # reset_peak() is global, so the enclosing span's peak so far is
+            # saved on a per-thread stack and the child's peak folded back in
+            stack = self.local.__dict__.setdefault('peaks', [])
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+            stack.append(current)
+            start_bytes = current
+            tracemalloc.reset_peak()
+        start_ns = time.time_ns()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.thread_time() - cpu
+            alloc_bytes = peak_bytes = None
+            if self.track_allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, stack.pop())
+                if stack:
+                    stack[-1] = max(stack[-1], peak)
+                alloc_bytes, peak_bytes = current - start_bytes, peak - start_bytes
+            self._record(Span(name, report, trace_id, span_id, parent_id, start_ns, wall, cpu,
+                              alloc_bytes, peak_bytes))
+
+    def _record(self, span: Span):
+        with self.lock:
+            _accumulate(self._totals, span)
+            for sink in self.sinks:
+                sink.emit(span)
+
+    def report(self, report_id: Optional[str] = None):
+        """Context for one report; stages opened inside it become its children."""
+        if not self.enabled:
+            return nullcontext()
+        return self._report(report_id)
+
+    @contextmanager
+    def _report(self, report_id: Optional[str]) -> Iterator[None]:
+        with self.lock:
+            self._reports += 1
+            if report_id is None:
+                report_id = str(self._reports)
+        trace_id, span_id = _new_id(16), _new_id(8)
+        previous = getattr(self.local, 'current', None)
+        self.local.current = (report_id, trace_id, span_id)
+        try:
+            with self._span('report', report_id, trace_id, None, span_id):
+                yield
+        finally:
+            self.local.current = previous
+
+    def stage(self, name: str):
+        """Context timing one stage: iocs, ttps, actors, malware, targets, nlp, io, cache..."""
+        if not self.enabled:
+            return nullcontext()
+        current = getattr(self.local, 'current', None)
+        if current is None:
+            return self._span(name, None, _new_id(16), None, _new_id(8))
+        report_id, trace_id, parent_id = current
+        return self._span(name, report_id, trace_id, parent_id, _new_id(8))
+
+    def totals(self) -> Dict[str, Totals]:
+        with self.lock:
+            return {name: Totals(*values) for name, values in self._totals.items()}
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+# Shared disabled instance; extractors default to it
+DISABLED = Profiler(enabled=False)
+
+
+class BreakdownSink:
+    """Collects the stage spans of each report and prints a breakdown when the report closes."""
+
+    def __init__(self, stream=None, labels: Optional[Dict[str, str]] = None):
+        self.stream = stream or sys.stderr
+        self.labels = labels or {}
+        self.pending: Dict[str, Dict[str, List]] = {}
+
+    def emit(self, span: Span):
+        if span.report is None:
+            return
+        stages = self.pending.setdefault(span.trace_id, {})
+        _accumulate(stages, span)
+        if span.name != 'report':
+            return
+        del self.pending[span.trace_id]
+        print(f'report {self.labels.get(span.report, span.report)}', file=self.stream)
+        print(format_breakdown({name: Totals(*values) for name, values in stages.items()}), file=self.stream)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """One JSON object per span."""
+
+    def __init__(self, path: str):
+        self.file = sys.stdout if path == '-' else open(path, 'a', encoding='utf-8')
+
+    def emit(self, span: Span):
+        self.file.write(json.dumps(span._asdict()) + '\n')
+
+    def close(self):
+        self.file.flush()
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class PrometheusSink:
+    """Per-stage counters in the Prometheus text format, rewritten to path on close.
+
+    Point node_exporter's textfile collector at the file, or serve render()
+    from a /metrics endpoint.
+    """
+
+    def __init__(self, path: Optional[str] = None, prefix: str = 'ps1og'):
+        self.path = path
+        self.prefix = prefix
+        self.totals: Dict[str, List] = {}
+
+    def emit(self, span: Span):
+        _accumulate(self.totals, span)
+
+    def render(self) -> str:
+        metrics = (('calls_total', 'counter', 'Stage executions', 0),
+                   ('wall_seconds_total', 'counter', 'Wall-clock seconds spent in the stage', 1),
+                   ('cpu_seconds_total', 'counter', 'Thread CPU seconds spent in the stage', 2),
+                   ('alloc_bytes_total', 'counter', 'Net bytes allocated by the stage (tracemalloc)', 3))
+        lines = []
+        for suffix, kind, help_text, column in metrics:
+            name = f'{self.prefix}_stage_{suffix}'
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for stage, totals in sorted(self.totals.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {totals[column]}')
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        if self.path:
+            with open(self.path, 'w', encoding='utf-8') as file:
+                file.write(self.render())
+
+
+class OtlpSink:
+    """OpenTelemetry-style spans posted as OTLP/HTTP JSON to a local collector in batches."""
+
+    def __init__(self, endpoint: str = DEFAULT_OTLP_ENDPOINT, service_name: str = 'ps1og', batch_size: int = 512,
+                 timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.spans: List[Span] = []
+
+    def emit(self, span: Span):
+        self.spans.append(span)
+        if len(self.spans) >= self.batch_size:
+            self.flush()
+
+    @staticmethod
+    def _attributes(span: Span) -> List[Dict]:
+        attributes = [('ps1og.report', {'stringValue': span.report or ''}),
+                      ('ps1og.cpu_seconds', {'doubleValue': span.cpu})]
+        if span.alloc_bytes is not None:
+            attributes.append(('ps1og.alloc_bytes', {'intValue': str(span.alloc_bytes)}))
+            attributes.append(('ps1og.peak_bytes', {'intValue': str(span.peak_bytes)}))
+        return [{'key': key, 'value': value} for key, value in attributes]
+
+    def _encode(self, spans: List[Span]) -> Dict:
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'ps1og.profiling'}, 'spans': [{
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                **({'parentSpanId': span.parent_id} if span.parent_id else {}),
+                'name': span.name,
+                'kind': 1,  # SPAN_KIND_INTERNAL
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.start_ns + int(span.wall * 1e9)),
+                'attributes': self._attributes(span)
+            } for span in spans]}]
+        }]}
+
+    def flush(self):
+        spans, self.spans = self.spans, []
+        if not spans:
+            return
+        request = urllib.request.Request(self.endpoint, json.dumps(self._encode(spans)).encode(),
+                                         {'Content-Type': 'application/json'})
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError as e:
+            print(f'profiling: could not export {len(spans)} spans to {self.endpoint}: {e}', file=sys.stderr)
+
+    def close(self):
+        self.flush()
+
+
+def make_sink(spec: str):
+    """Sink from 'jsonl:PATH' ('-' for stdout), 'prometheus:PATH' or 'otlp[:URL]'."""
+    kind, _, target = spec.partition(':')
+    if kind == 'jsonl':
+        return JsonLinesSink(target or '-')
+    if kind == 'prometheus':
+        return PrometheusSink(target or 'ps1og.prom')
+    if kind == 'otlp':
+        return OtlpSink(target or DEFAULT_OTLP_ENDPOINT)
+    raise ValueError(f'Unknown profiling sink: {spec}')
+
+
+def from_env() -> Profiler:
+    """Profiler configured from PROFILE_SINKS (comma-separated sink specs; disabled when unset)
+    and PROFILE_ALLOCATIONS=1."""
+    specs = [spec for spec in os.getenv('PROFILE_SINKS', '').split(',') if spec]
+    if not specs:
+        return DISABLED
+    return Profiler([make_sink(spec) for spec in specs],
+                    track_allocations=os.getenv('PROFILE_ALLOCATIONS') == '1')
+
+
+def format_breakdown(totals: Dict[str, Totals]) -> str:
+    """Table of per-stage totals, with each stage's share of the report (or batch) wall time."""
+    overall = totals.get('report')
+    reference = overall.wall if overall else sum(item.wall for item in totals.values())
+    lines = [f'  {"stage":<10}{"calls":>7}{"wall ms":>11}{"cpu ms":>10}{"share":>8}{"alloc KB":>11}{"peak KB":>10}']
+    for name, item in sorted(totals.items(), key=lambda entry: (entry[0] == 'report', -entry[1].wall)):
+        share = item.wall / reference * 100 if reference else 0.0
+        lines.append(f'  {name:<10}{item.calls:>7}{item.wall * 1000:>11.2f}{item.cpu * 1000:>10.2f}'
+                     f'{share:>7.1f}%{item.alloc_bytes / 1024:>11.1f}{item.peak_bytes / 1024:>10.1f}')
+    return '\n'.join(lines)
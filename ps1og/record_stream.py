@@ -0,0 +1,142 @@
+"""Reports streamed one record at a time out of huge text files or stdin.
+
+    for text in iter_records('dump.log', delimiter='\\n\\n'):
+        ...
+    reports = iter_records('-', json_field='text')  # JSON lines on stdin
+
+A file holds many reports separated by a delimiter (a blank line by
+default), or one JSON object per line whose json_field holds the text.
+Records come out as a generator, so piping them into process_reports() keeps
+memory bounded by the batches in flight, not by the input size.
+
+Regular files are memory-mapped. Each record is sliced straight out of the
+mapping, and the pages already consumed are released (MADV_DONTNEED) so they
+do not pile up in the resident set. Pipes and stdin are read in chunk_size
+blocks, carrying only the unfinished record over. A record longer than
+max_record_bytes is cut at its last whitespace and yielded in pieces, so one
+missing delimiter cannot pull the rest of the input into memory;
+max_record_bytes=None never cuts (a record that must be parsed whole).
+Blank records are skipped. Invalid UTF-8 is replaced, not fatal.
+"""
+import io
+import json
+import mmap
+import sys
+from typing import BinaryIO, Iterator, Optional
+
+DEFAULT_DELIMITER = '\n\n'
+DEFAULT_CHUNK_SIZE = 1 << 20  # bytes read per block from pipes and stdin
+DEFAULT_MAX_RECORD_BYTES = 64 << 20
+RELEASE_BYTES = 8 << 20  # consumed mapping released in steps of this size
+
+# Whitespace a record may be cut at without splitting a token or a UTF-8 sequence
+_WHITESPACE = (b' ', b'\n', b'\t', b'\r')
+
+
+def iter_records(source: str, delimiter: str = DEFAULT_DELIMITER, json_field: Optional[str] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_record_bytes: Optional[int] = DEFAULT_MAX_RECORD_BYTES) -> Iterator[str]:
+    """Report texts of a file path, or of stdin for '-', in input order.
+
+    With json_field, records are JSON lines and each one's json_field is the
+    text (a line that is a JSON string is taken as is); delimiter is ignored.
+    """
+    separator = b'\n' if json_field is not None else delimiter.encode('utf-8')
+    if not separator:
+        raise ValueError('the record delimiter must not be empty')
+    if source == '-':
+        records = iter_chunked(sys.stdin.buffer, separator, chunk_size, max_record_bytes)
+    else:
+        records = iter_file(source, separator, chunk_size, max_record_bytes)
+    for record in records:
+        if not record.strip():
+            continue
+        text = record.decode('utf-8', errors='replace')
+        yield text if json_field is None else json_text(text, json_field)
+
+
+def json_text(line: str, field: str) -> str:
+    value = json.loads(line)
+    if isinstance(value, dict):
+        value = value.get(field)
+    if not isinstance(value, str):
+        raise ValueError(f'JSON line without a "{field}" string: {line[:80]!r}')
+    return value
+
+
+def iter_file(path: str, separator: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              max_record_bytes: Optional[int] = DEFAULT_MAX_RECORD_BYTES) -> Iterator[bytes]:
+    """Raw records of a file: from a memory mapping when it can be mapped, else read in chunks."""
+    with open(path, 'rb') as file:
+        try:
+            view = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):  # empty file, FIFO, /dev/stdin
+            yield from iter_chunked(file, separator, chunk_size, max_record_bytes)
+            return
+        with view:
+            yield from iter_mapped(view, separator, max_record_bytes)
+
+
+def iter_mapped(view: mmap.mmap, separator: bytes,
+                max_record_bytes: Optional[int] = DEFAULT_MAX_RECORD_BYTES) -> Iterator[bytes]:
+    """Raw records of a read-only mapping; its pages are released once consumed."""
+    if hasattr(view, 'madvise'):
+        view.madvise(mmap.MADV_SEQUENTIAL)
+    released = 0
+    start = 0
+    size = len(view)
+    if max_record_bytes is None:
+        max_record_bytes = size
+    while start < size:
+        end = view.find(separator, start, start + max_record_bytes + len(separator))
+        if end == -1 and size - start > max_record_bytes:
+            end = _whitespace_cut(view, start, start + max_record_bytes)
+            next_start = end
+        else:
+            end = size if end == -1 else end
+            next_start = end + len(separator)
+        yield view[start:end]
+        start = next_start
+        if hasattr(mmap, 'MADV_DONTNEED') and start - released >= RELEASE_BYTES:
+            page_end = start - start % mmap.PAGESIZE
+            view.madvise(mmap.MADV_DONTNEED, released, page_end - released)
+            released = page_end
+
+
+def iter_chunked(file: BinaryIO, separator: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_record_bytes: Optional[int] = DEFAULT_MAX_RECORD_BYTES) -> Iterator[bytes]:
+    """Raw records of a stream read chunk_size bytes at a time."""
+    buffer = bytearray()
+    while True:
+        chunk = file.read1(chunk_size) if isinstance(file, io.BufferedIOBase) else file.read(chunk_size)
+        if not chunk:
+            break
+        # A separator may straddle the previous chunk and this one
+        search_from = max(len(buffer) - len(separator) + 1, 0)
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(separator, search_from)
+            if end == -1:
+                break
+            yield bytes(buffer[start:end])
+            start = search_from = end + len(separator)
+        while max_record_bytes is not None and len(buffer) - start > max_record_bytes:
+            end = _whitespace_cut(buffer, start, start + max_record_bytes)
+            yield bytes(buffer[start:end])
+            start = end
+        del buffer[:start]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _whitespace_cut(data, start: int, limit: int) -> int:
+    """Position after the last whitespace byte in data[start:limit], or limit if there is none."""
+    cut = max(data.rfind(space, start, limit) for space in _WHITESPACE)
+    return cut + 1 if cut > start else limit
+
+
+def parse_delimiter(value: str) -> str:
+    r"""CLI delimiter with backslash escapes: '\n\n', '\x1e', '----\n'."""
+    return value.encode('latin-1', errors='backslashreplace').decode('unicode_escape')
+
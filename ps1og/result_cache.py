@@ -0,0 +1,143 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+DEFAULT_MEMORY_ITEMS = 1024
+DEFAULT_DISK_BYTES = 256 * 1024 * 1024
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFC, whitespace runs collapsed, trimmed."""
+    return ' '.join(unicodedata.normalize('NFC', text).split())
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of everything that affects extraction output (version, mappings, model)."""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class ResultCache:
+    """Two-tier cache of extraction results keyed by report content and ruleset fingerprint.
+
+    The memory tier is an LRU of decoded results; the optional disk tier is a
+    SQLite table bounded by total payload bytes, evicting least recently used
+    rows. Entries written under another fingerprint are dropped on open, so a
+    change to the mappings, ATT&CK index or model invalidates them automatically.
+    Returned results are shared; callers must not mutate them.
+    """
+
+    def __init__(self, ruleset: str, path: Optional[str] = None, memory_items: int = DEFAULT_MEMORY_ITEMS,
+                 disk_bytes: int = DEFAULT_DISK_BYTES):
+        self.ruleset = ruleset
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.memory: 'OrderedDict[str, Any]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(key TEXT PRIMARY KEY, ruleset TEXT, body TEXT, size INTEGER, used REAL)'
+            )
+            self.conn.execute('DELETE FROM results WHERE ruleset != ?', (ruleset,))
+            self.conn.commit()
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+        return f'{self.ruleset}:{digest}'
+
+    def _remember(self, key: str, result: Any):
+        self.memory[key] = result
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get(self, text: str, key: Optional[str] = None) -> Optional[Any]:
+        key = key or self.key(text)
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return self.memory[key]
+            if self.conn is not None:
+                row = self.conn.execute('SELECT body FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self.conn.execute('UPDATE results SET used = ? WHERE key = ?', (time.time(), key))
+                    self.conn.commit()
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+                    self.stats['disk_hits'] += 1
+                    return result
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, text: str, result: Any, key: Optional[str] = None):
+        key = key or self.key(text)
+        with self.lock:
+            self._remember(key, result)
+            if self.conn is None:
+                return
+            body = json.dumps(result)
+            self.conn.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                              (key, self.ruleset, body, len(body), time.time()))
+            self._evict_disk()
+            self.conn.commit()
+
+    def _evict_disk(self):
+        (total,) = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()
+        if total <= self.disk_bytes:
+            return
+        rows = self.conn.execute('SELECT key, size FROM results ORDER BY used').fetchall()
+        for key, size in rows:
+            if total <= self.disk_bytes:
+                break
+            self.conn.execute('DELETE FROM results WHERE key = ?', (key,))
+            total -= size
+            self.stats['evictions'] += 1
+
+    def get_or_compute(self, text: str, compute: Callable[[str], Any]) -> Any:
+        key = self.key(text)
+        result = self.get(text, key)
+        if result is None:
+            result = compute(text)
+            self.put(text, result, key)
+        return result
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        total = hits + self.stats['misses']
+        return hits / total if total else 0.0
+
+    def close(self):
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+                self.conn = None
+
+
+def from_env(ruleset: str) -> ResultCache:
+    """Cache configured from RESULT_CACHE_PATH (disk tier, off when unset) and RESULT_CACHE_ITEMS."""
+    return ResultCache(ruleset, os.getenv('RESULT_CACHE_PATH'),
+                       int(os.getenv('RESULT_CACHE_ITEMS', DEFAULT_MEMORY_ITEMS)))
+
+
+def model_fingerprint(model: str, components: Iterable[str]) -> Dict[str, Any]:
+    """Identity of a spaCy pipeline for use in fingerprint(), without loading it."""
+    try:
+        version = importlib.metadata.version(model)
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    return {'model': model, 'version': version, 'components': sorted(components)}
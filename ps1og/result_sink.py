@@ -0,0 +1,195 @@
+"""Flat, typed extraction records written in bulk: Parquet, Arrow IPC or JSON lines.
+
+One row per hit instead of one nested dict per report:
+
+    report_id  type                                   value              offset
+    a.txt      ip|domain|hash|email|tactic|technique   192.168.1.1        412
+               |actor|target|malware
+
+Rows accumulate in plain column buffers and are written as one Arrow record
+batch every batch_rows rows, so peak memory depends on the batch size, not
+on the corpus. The offset buffer is handed to Arrow without a copy, and the
+type column is dictionary-encoded against a fixed dictionary. Malware rows
+have no offset: VirusTotal confirms names, not occurrences. pyarrow is only
+imported for the Parquet and Arrow formats.
+"""
+import abc
+import json
+import sys
+from array import array
+from typing import Collection, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from analysis import ReportHits
+
+RECORD_TYPES = ('ip', 'domain', 'hash', 'email', 'tactic', 'technique', 'actor', 'target', 'malware')
+DEFAULT_BATCH_ROWS = 65536
+NO_OFFSET = -1
+
+# Record types each extraction stage produces
+STAGE_RECORD_TYPES = {
+    'iocs': ('ip', 'domain', 'hash', 'email'),
+    'ttps': ('tactic', 'technique'),
+    'actors': ('actor',),
+    'targets': ('target',),
+    'malware': ('malware',)
+}
+
+
+class Record(NamedTuple):
+    report_id: str
+    type: str
+    value: str
+    offset: Optional[int]
+
+
+def report_records(report_id: str, hits: ReportHits, malware: Iterable[str] = (),
+                   types: Collection[str] = RECORD_TYPES) -> Iterator[Record]:
+    """Records of the given types for one report's positioned hits
+    (cltest3.ThreatIntelExtractor.find_hits) and its confirmed malware names.
+
+    A keyword in both the built-in mappings and the ATT&CK index, or a sector
+    found by two rules, is one record.
+    """
+    seen = set()
+
+    def record(kind: str, value: str, offset: Optional[int]) -> Iterator[Record]:
+        if kind in types and (kind, value, offset) not in seen:
+            seen.add((kind, value, offset))
+            yield Record(report_id, kind, value, offset)
+
+    for match in hits.iocs:
+        yield from record(match.type, match.value, match.start)
+    for match in hits.keywords:
+        kind, code, name = match.payload
+        if kind == 'group':
+            yield from record('actor', name, match.start)
+        else:
+            yield from record(kind, code, match.start)
+    for hit in hits.entities:
+        yield from record('actor' if hit.label == 'THREAT_ACTOR' else 'target', hit.name, hit.start)
+    for name in malware:
+        yield from record('malware', name, None)
+
+
+def schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('report_id', pa.string()),
+        ('type', pa.dictionary(pa.int8(), pa.string())),
+        ('value', pa.string()),
+        ('offset', pa.int64())
+    ])
+
+
+class ColumnarSink(abc.ABC):
+    """Buffers records column by column and hands full batches to write_batch()."""
+
+    def __init__(self, batch_rows: int = DEFAULT_BATCH_ROWS):
+        self.batch_rows = batch_rows
+        self.type_codes = {kind: code for code, kind in enumerate(RECORD_TYPES)}
+        self.rows = 0
+        self._reset()
+
+    def _reset(self):
+        self.report_ids: List[str] = []
+        self.types = array('b')
+        self.values: List[str] = []
+        self.offsets = array('q')
+        self.missing_offsets = 0
+
+    def write(self, records: Iterable[Record]):
+        for report_id, kind, value, offset in records:
+            self.report_ids.append(report_id)
+            self.types.append(self.type_codes[kind])
+            self.values.append(value)
+            if offset is None:
+                offset = NO_OFFSET
+                self.missing_offsets += 1
+            self.offsets.append(offset)
+            if len(self.values) >= self.batch_rows:
+                self.flush()
+
+    def record_batch(self):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        size = len(self.values)
+        types = pa.DictionaryArray.from_arrays(pa.Array.from_buffers(pa.int8(), size, [None, pa.py_buffer(self.types)]),
+                                               pa.array(RECORD_TYPES, pa.string()))
+        offsets = pa.Array.from_buffers(pa.int64(), size, [None, pa.py_buffer(self.offsets)])
+        if self.missing_offsets:
+            offsets = pc.if_else(pc.equal(offsets, NO_OFFSET), pa.scalar(None, pa.int64()), offsets)
+        return pa.RecordBatch.from_arrays([pa.array(self.report_ids, pa.string()), types,
+                                           pa.array(self.values, pa.string()), offsets], schema=schema())
+
+    def flush(self):
+        if self.values:
+            self.rows += len(self.values)
+            self.write_batch(self.record_batch())
+            self._reset()
+
+    @abc.abstractmethod
+    def write_batch(self, batch):
+        """Write one pyarrow.RecordBatch."""
+
+    def close(self):
+        self.flush()
+
+
+class ParquetSink(ColumnarSink):
+
+    def __init__(self, path: str, batch_rows: int = DEFAULT_BATCH_ROWS):
+        import pyarrow.parquet as pq
+        super().__init__(batch_rows)
+        self.writer = pq.ParquetWriter(path, schema())
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+class ArrowSink(ColumnarSink):
+    """Arrow IPC file (Feather v2); memory-mappable by pyarrow, Polars or DuckDB."""
+
+    def __init__(self, path: str, batch_rows: int = DEFAULT_BATCH_ROWS):
+        import pyarrow as pa
+        super().__init__(batch_rows)
+        self.writer = pa.ipc.new_file(path, schema())
+
+    def write_batch(self, batch):
+        self.writer.write_batch(batch)
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+class JsonLinesSink:
+    """One compact JSON object per record, written as it arrives ('-' for stdout)."""
+
+    def __init__(self, path: str = '-'):
+        self.file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+        self.rows = 0
+
+    def write(self, records: Iterable[Record]):
+        for record in records:
+            self.file.write(json.dumps(record._asdict(), separators=(',', ':')) + '\n')
+            self.rows += 1
+
+    def close(self):
+        self.file.flush()
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+FORMATS: Dict[str, type] = {'.parquet': ParquetSink, '.arrow': ArrowSink, '.feather': ArrowSink, '.ipc': ArrowSink}
+
+
+def open_sink(path: str, batch_rows: int = DEFAULT_BATCH_ROWS):
+    """Sink chosen by extension: .parquet, .arrow/.feather/.ipc, anything else (or '-') JSON lines."""
+    for extension, sink in FORMATS.items():
+        if path.endswith(extension):
+            return sink(path, batch_rows)
+    return JsonLinesSink(path)
@@ -0,0 +1,281 @@
+"""Confidence-scored ATT&CK technique matching by sentence similarity.
+
+Keyword matching (keyword_matcher.py) only finds a technique whose name or
+alias appears verbatim. "delivered via spear-phishing emails containing a
+malicious attachment" never says "Spearphishing Attachment". Here every
+technique's name and description is embedded once into a row of a NumPy
+matrix, which is saved next to the ATT&CK index. Each report's sentences are
+embedded the same way and scored against every technique with one matrix
+multiply. The best sentence per technique gives its confidence (cosine
+similarity, 0..1), and the top k above min_confidence are returned.
+
+The embedding needs no model. The technique texts define a vocabulary of
+crudely stemmed words, weighted by inverse document frequency. A truncated
+SVD of that TF-IDF matrix (latent semantic analysis) gives the DIMENSIONS-wide
+vectors, and the projection is saved with them. A sentence's vector is
+the sum of its words' projection rows. Its length is taken from the full
+TF-IDF vector, so words the techniques never use lower the confidence.
+Adjacent words whose concatenation is in the vocabulary count as that word,
+so "spear-phishing" matches "spearphishing".
+
+Sentence boundaries come from the parsed Doc when it has them (the rule
+pipeline's sentencizer); otherwise the text is split at sentence-ending
+punctuation.
+
+ThreatIntelExtractor(ttp_scorer=...) adds the scores to results['TTPs'] as
+'Scored techniques': [[id, name, confidence]], also for reports analyzed in
+shards or increments (sharding.py, incremental.py): each piece scores the
+sentences starting in it and the best score per technique wins. Scoring is
+opt-in: cltest3.py --semantic-ttps, or SEMANTIC_TTPS=1 for dsr1test2.py.
+
+    python semantic_ttps.py build [-o ttp_vectors.npz]
+    python semantic_ttps.py match report.txt
+"""
+import argparse
+import os
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import attack_index
+from keyword_matcher import tokenize
+
+if TYPE_CHECKING:
+    from spacy.tokens import Doc
+
+DIMENSIONS = 256
+SUFFIXES = ('ations', 'ation', 'ings', 'ing', 'ions', 'ion', 'ies', 'ed', 'es', 'ly', 's')
+# Function words, left out on both sides so they neither match nor dilute
+STOPWORDS = frozenset('a an and are as at be by for from has have in into is it its of on or that the their '
+                      'they this to was were which with'.split())
+NAME_REPEATS = 2  # the technique name counts this many times in its text
+MIN_WORDS = 3  # shorter sentences are not scored
+DEFAULT_MIN_CONFIDENCE = 0.25
+DEFAULT_TOP_K = 5
+DEFAULT_VECTORS_PATH = os.getenv(
+    'TTP_VECTORS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ttp_vectors.npz'))
+
+SENTENCE_PATTERN = re.compile(r'[^.!?\n]+(?:[.!?]+|\n|$)')
+# Citations, markdown links and code spans in ATT&CK descriptions
+DESCRIPTION_NOISE = re.compile(r'\(Citation:[^)]*\)|\]\([^)]*\)|https?://\S+|</?code>')
+
+
+class ScoredTtp(NamedTuple):
+    id: str
+    name: str
+    confidence: float
+    start: int  # span of the best-matching sentence
+    end: int
+
+
+def stem(word: str) -> str:
+    """Strip one common English suffix and a final e: services, service -> servic."""
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:-1] if word.endswith('e') and len(word) > 3 else word
+
+
+def words(text: str) -> List[str]:
+    return [stem(token) for token in tokenize(text) if token.isalnum() and token not in STOPWORDS]
+
+
+def technique_text(technique: attack_index.Technique) -> str:
+    """Name (repeated) and the first paragraph of the description, without citations and links."""
+    description = DESCRIPTION_NOISE.sub(' ', technique.description.split('\n', 1)[0])
+    return ' '.join([technique.name] * NAME_REPEATS + [description])
+
+
+class TechniqueVectors:
+    """Normalized LSA vectors of the ATT&CK techniques and the projection that embeds new text."""
+
+    def __init__(self, ids: np.ndarray, names: np.ndarray, vocabulary: np.ndarray, idf: np.ndarray,
+                 projection: np.ndarray, matrix: np.ndarray, index_fingerprint: str):
+        self.ids = ids
+        self.names = names
+        self.vocabulary = vocabulary  # stemmed words
+        self.idf = idf  # (words,) float32
+        self.projection = projection  # (words, dimensions) float32
+        self.matrix = matrix  # (techniques, dimensions) float32, unit rows
+        self.index_fingerprint = index_fingerprint
+        self.columns = {word: i for i, word in enumerate(vocabulary.tolist())}
+
+    @classmethod
+    def build(cls, index: attack_index.AttackIndex) -> 'TechniqueVectors':
+        techniques = list(index.techniques())
+        counts = [Counter(words(technique_text(technique))) for technique in techniques]
+        vocabulary = sorted(set().union(*counts))
+        columns = {word: i for i, word in enumerate(vocabulary)}
+        tfidf = np.zeros((len(techniques), len(vocabulary)), dtype=np.float32)
+        for row, technique_counts in enumerate(counts):
+            for word, count in technique_counts.items():
+                tfidf[row, columns[word]] = count
+        df = np.count_nonzero(tfidf, axis=0)
+        idf = (np.log((1 + len(techniques)) / (1 + df)) + 1).astype(np.float32)
+        tfidf *= idf
+        _, _, vt = np.linalg.svd(tfidf, full_matrices=False)
+        projection = np.ascontiguousarray(vt[:DIMENSIONS].T)
+        matrix = tfidf @ projection
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        return cls(np.array([technique.id for technique in techniques]),
+                   np.array([technique.name for technique in techniques]), np.array(vocabulary),
+                   idf, projection, matrix, index.fingerprint())
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            np.savez(file, ids=self.ids, names=self.names, vocabulary=self.vocabulary, idf=self.idf,
+                     projection=self.projection, matrix=self.matrix,
+                     index_fingerprint=np.array(self.index_fingerprint))
+
+    @classmethod
+    def load(cls, path: str) -> 'TechniqueVectors':
+        with np.load(path) as data:
+            return cls(data['ids'], data['names'], data['vocabulary'], data['idf'], data['projection'],
+                       data['matrix'], str(data['index_fingerprint']))
+
+    def embed(self, sentences: List[List[str]]) -> np.ndarray:
+        """Unit vectors of stemmed-word sentences, scaled down by their out-of-vocabulary weight."""
+        rows, columns, weights = [], [], []
+        unknown = np.zeros(len(sentences), dtype=np.float32)
+        max_idf = self.idf.max()
+        for row, sentence in enumerate(sentences):
+            found = Counter()
+            skip = False
+            for i, word in enumerate(sentence):
+                if skip:
+                    skip = False
+                    continue
+                joined = self.columns.get(word + sentence[i + 1]) if i + 1 < len(sentence) else None
+                if joined is not None:
+                    found[joined] += 1
+                    skip = True
+                elif word in self.columns:
+                    found[self.columns[word]] += 1
+                else:
+                    unknown[row] += max_idf ** 2
+            for column, count in found.items():
+                rows.append(row)
+                columns.append(column)
+                weights.append(count)
+        columns = np.asarray(columns, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float32) * self.idf[columns]
+        vectors = np.zeros((len(sentences), self.projection.shape[1]), dtype=np.float32)
+        np.add.at(vectors, np.asarray(rows, dtype=np.int64), weights[:, None] * self.projection[columns])
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=len(sentences)) + unknown)
+        return vectors / np.maximum(norms, 1e-12)[:, None].astype(np.float32)
+
+
+def load_vectors(index: attack_index.AttackIndex, path: str = DEFAULT_VECTORS_PATH) -> TechniqueVectors:
+    """The saved vectors of this index; built and saved first if missing or built from another index."""
+    if os.path.exists(path):
+        vectors = TechniqueVectors.load(path)
+        if vectors.index_fingerprint == index.fingerprint():
+            return vectors
+    vectors = TechniqueVectors.build(index)
+    vectors.save(path)
+    return vectors
+
+
+def sentence_spans(text: str, doc: Optional['Doc'] = None) -> List[Tuple[int, int]]:
+    """Character spans of the sentences: from the Doc when it has sentence boundaries."""
+    if doc is not None and doc.has_annotation('SENT_START'):
+        return [(sentence.start_char, sentence.end_char) for sentence in doc.sents]
+    return [match.span() for match in SENTENCE_PATTERN.finditer(text)]
+
+
+class SemanticTtpMatcher:
+    """Scores the sentences of a report against every technique vector."""
+
+    def __init__(self, vectors: TechniqueVectors, min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                 top_k: int = DEFAULT_TOP_K):
+        self.vectors = vectors
+        self.min_confidence = min_confidence
+        self.top_k = top_k
+
+    def score(self, text: str, doc: Optional['Doc'] = None) -> List[ScoredTtp]:
+        """The top_k techniques at or above min_confidence, best first."""
+        return self.top(self.candidates(text, doc))
+
+    def candidates(self, text: str, doc: Optional['Doc'] = None, pos: int = 0, endpos: Optional[int] = None,
+                   offset: int = 0) -> List[ScoredTtp]:
+        """Every technique at or above min_confidence, by its best sentence starting in text[pos:endpos].
+
+        Spans are shifted by offset. top() of the candidates of every piece of
+        a report (sharding.py, incremental.py) equals score() of the whole report.
+        """
+        if endpos is None:
+            endpos = len(text)
+        spans, sentences = [], []
+        for start, end in sentence_spans(text, doc):
+            if not pos <= start < endpos:
+                continue
+            sentence = words(text[start:end])
+            if len(sentence) >= MIN_WORDS:
+                spans.append((start + offset, end + offset))
+                sentences.append(sentence)
+        if not spans:
+            return []
+        scores = self.vectors.embed(sentences) @ self.vectors.matrix.T  # (sentences, techniques)
+        best_sentence = scores.argmax(axis=0)
+        best = scores[best_sentence, np.arange(scores.shape[1])]
+        return [ScoredTtp(str(self.vectors.ids[i]), str(self.vectors.names[i]), round(float(best[i]), 3),
+                          *spans[best_sentence[i]])
+                for i in np.flatnonzero(best >= self.min_confidence)]
+
+    def top(self, hits: Iterable[ScoredTtp]) -> List[ScoredTtp]:
+        """The best hit of each technique, top_k of them, best first."""
+        best: Dict[str, ScoredTtp] = {}
+        for hit in hits:
+            if hit.id not in best or hit.confidence > best[hit.id].confidence:
+                best[hit.id] = hit
+        return sorted(best.values(), key=lambda hit: -hit.confidence)[:self.top_k]
+
+    @staticmethod
+    def group(hits: Iterable[ScoredTtp]) -> List[List]:
+        """[[id, name, confidence]], in the style of keyword_matcher.group_ttps()."""
+        return [[hit.id, hit.name, hit.confidence] for hit in hits]
+
+    def fingerprint(self) -> Dict:
+        return {'index': self.vectors.index_fingerprint, 'dimensions': self.vectors.matrix.shape[1],
+                'min_confidence': self.min_confidence, 'top_k': self.top_k}
+
+
+def try_load_matcher(index: Optional[attack_index.AttackIndex], path: str = DEFAULT_VECTORS_PATH,
+                     min_confidence: float = DEFAULT_MIN_CONFIDENCE,
+                     top_k: int = DEFAULT_TOP_K) -> Optional[SemanticTtpMatcher]:
+    """A matcher over the index's technique vectors, or None without an index."""
+    if index is None:
+        return None
+    return SemanticTtpMatcher(load_vectors(index, path), min_confidence, top_k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help='embed every technique of the ATT&CK index and save the matrix')
+    build_cmd.add_argument('-o', '--output', default=DEFAULT_VECTORS_PATH)
+    match_cmd = commands.add_parser('match', help='print the scored techniques of a text file')
+    match_cmd.add_argument('path')
+    match_cmd.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE)
+    match_cmd.add_argument('--top-k', type=int, default=DEFAULT_TOP_K)
+    args = parser.parse_args()
+
+    index = attack_index.load_index()
+    if args.command == 'build':
+        vectors = TechniqueVectors.build(index)
+        vectors.save(args.output)
+        print(f'wrote {args.output}: {len(vectors.ids)} techniques, {len(vectors.vocabulary)} words, '
+              f'{vectors.matrix.shape[1]} dimensions ({os.path.getsize(args.output) / 1024:.0f} KB)')
+    else:
+        matcher = try_load_matcher(index, min_confidence=args.min_confidence, top_k=args.top_k)
+        with open(args.path, 'r', encoding='utf-8') as file:
+            text = file.read()
+        for hit in matcher.score(text):
+            print(f'{hit.confidence:.3f}  {hit.id:<10} {hit.name}  <- {text[hit.start:hit.end].strip()[:80]!r}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""Long-running extraction service that keeps ThreatIntelExtractor and its models warm.
+
+    python service.py --port 8080 --workers 4
+    python service.py --unix-socket /tmp/ps1og.sock --only iocs,ttps
+    curl --data-binary @report.txt http://127.0.0.1:8080/extract
+    curl http://127.0.0.1:8080/metrics
+
+POST /extract takes the report text as the request body and answers with the
+same JSON as cltest3.py. Reports wait in a bounded queue that dispatcher
+threads drain in micro-batches (one nlp.pipe call each). A full queue is
+answered at once with 503 and Retry-After instead of piling up latency.
+GET /metrics reports queue depth, counters and latency percentiles.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional
+
+import cltest3
+import prefork
+from cltest3 import ThreatIntelExtractor
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_TIMEOUT = 60.0
+
+
+class Job:
+    __slots__ = ('text', 'future', 'enqueued')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class LatencyWindow:
+    """Latencies of the most recent requests, for percentile reporting."""
+
+    def __init__(self, size: int = 4096):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentiles(self, points: Iterable[int] = (50, 90, 99)) -> Dict[str, float]:
+        """Nearest-rank percentiles in milliseconds."""
+        with self.lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return {}
+        return {f'p{point}': samples[min(len(samples) - 1, len(samples) * point // 100)] * 1000
+                for point in points}
+
+
+def _init_warm_worker(stages: List[str], ner: str):
+    """Pool initializer: build the worker's extractor and load its model up front."""
+    cltest3._init_worker(stages, ner)
+    if cltest3._worker_extractor.nlp_stages:
+        cltest3._worker_extractor.nlp.load()
+
+
+class ExtractionService:
+    """Bounded queue of reports in front of warm extractors.
+
+    With workers == 1 a single dispatcher thread runs the extractor in this
+    process. With more, each dispatcher thread feeds one process of a pool. The
+    workers are forked after this process has loaded the extractor, and share
+    it (prefork.py); without fork each loads its own once at startup.
+    """
+
+    def __init__(self, stages: Optional[Iterable[str]] = None, workers: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, batch_size: int = DEFAULT_BATCH_SIZE, ner: str = 'model'):
+        self.extractor = ThreatIntelExtractor(stages, ner)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue: 'queue.Queue[Optional[Job]]' = queue.Queue(queue_size)
+        self.latency = LatencyWindow()
+        self.lock = threading.Lock()
+        self.counters = {'accepted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'batches': 0}
+        self.in_flight = 0
+        self.started = time.time()
+
+        self.pool = None
+        if workers > 1 and prefork.available():
+            # Forked before the dispatcher and server threads start
+            context, initializer, initargs = prefork.worker_setup(self.extractor, cltest3._init_shared_worker)
+            self.pool = context.Pool(workers, initializer, initargs)
+            prefork.unfreeze()
+        elif workers > 1:
+            self.pool = multiprocessing.Pool(workers, initializer=_init_warm_worker,
+                                             initargs=(self.extractor.stages, ner))
+        elif self.extractor.nlp_stages:
+            self.extractor.nlp.load()
+        self.threads = [threading.Thread(target=self._dispatch, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def submit(self, text: str) -> Future:
+        """Queue a report; raises queue.Full when the service is saturated."""
+        job = Job(text)
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            self._count('rejected')
+            raise
+        self._count('accepted')
+        return job.future
+
+    def _next_batch(self) -> List[Job]:
+        """Block for one job, then take whatever else is already queued up to batch_size."""
+        first = self.queue.get()
+        if first is None:
+            return []
+        jobs = [first]
+        while len(jobs) < self.batch_size:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self.queue.put(None)  # leave the stop signal for the next get
+                break
+            jobs.append(job)
+        return jobs
+
+    def _process(self, texts: List[str]) -> List[Dict[str, Any]]:
+        if self.pool is None:
+            return self.extractor.process_batch(texts)
+        return self.pool.apply(cltest3._process_batch, (texts,))
+
+    def _dispatch(self):
+        while True:
+            jobs = self._next_batch()
+            if not jobs:
+                return
+            with self.lock:
+                self.in_flight += len(jobs)
+            try:
+                results = self._process([job.text for job in jobs])
+            except Exception as e:
+                for job in jobs:
+                    job.future.set_exception(e)
+                self._count('failed', len(jobs))
+            else:
+                now = time.perf_counter()
+                for job, result in zip(jobs, results):
+                    self.latency.add(now - job.enqueued)
+                    job.future.set_result(result)
+                self._count('completed', len(jobs))
+            finally:
+                self._count('batches')
+                with self.lock:
+                    self.in_flight -= len(jobs)
+
+    def metrics(self) -> Dict[str, Any]:
+        uptime = time.time() - self.started
+        with self.lock:
+            counters = dict(self.counters)
+            in_flight = self.in_flight
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'in_flight': in_flight,
+            'workers': self.workers,
+            'stages': self.extractor.stages,
+            **counters,
+            'uptime_seconds': uptime,
+            'reports_per_second': counters['completed'] / uptime if uptime else 0.0,
+            'latency_ms': self.latency.percentiles()
+        }
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so clients are not bound by connection setup
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            return self._send(200, self.server.service.metrics())
+        if self.path == '/healthz':
+            return self._send(200, {'status': 'ok'})
+        self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        text = self.rfile.read(length).decode('utf-8', errors='replace')
+        if self.path != '/extract':
+            return self._send(404, {'error': 'not found'})
+        try:
+            future = self.server.service.submit(text)
+        except queue.Full:
+            return self._send(503, {'error': 'queue full'}, {'Retry-After': '1'})
+        try:
+            result = future.result(self.server.timeout_seconds)
+        except TimeoutError:
+            return self._send(504, {'error': 'timed out'})
+        except Exception as e:
+            return self._send(500, {'error': str(e)})
+        self._send(200, result)
+
+
+class UnixServiceHandler(ServiceHandler):
+    disable_nagle_algorithm = False  # TCP_NODELAY does not apply to AF_UNIX
+
+
+class ExtractionHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: ExtractionService, timeout_seconds: float = DEFAULT_TIMEOUT):
+        super().__init__(address, ServiceHandler)
+        self.service = service
+        self.timeout_seconds = timeout_seconds
+
+
+class ExtractionUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: ExtractionService, timeout_seconds: float = DEFAULT_TIMEOUT):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, UnixServiceHandler)
+        self.service = service
+        self.timeout_seconds = timeout_seconds
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080, help='0 picks a free port')
+    parser.add_argument('--unix-socket', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=1, help='extractor processes')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='reports waiting before requests are rejected with 503')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='max reports per nlp.pipe call')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds before answering 504')
+    parser.add_argument('--only', type=cltest3.parse_stages, metavar='STAGES', help='stages to run')
+    parser.add_argument('--ner', choices=ThreatIntelExtractor.NER_ENGINES, default='model',
+                        help='statistical spaCy model, or fast gazetteer rules')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    service = ExtractionService(args.only, args.workers, args.queue_size, args.batch_size, args.ner)
+    if args.unix_socket:
+        server = ExtractionUnixServer(args.unix_socket, service, args.timeout)
+        print(f'listening on unix:{args.unix_socket}', flush=True)
+    else:
+        server = ExtractionHTTPServer((args.host, args.port), service, args.timeout)
+        print(f'listening on http://{args.host}:{server.server_address[1]}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Sharded analysis of very large single reports, across a process pool.
+
+    results = analyze_sharded(ThreatIntelExtractor(), text, n_process=8)
+
+The report is cut into sentence-aligned shards of about shard_size
+characters. Each shard is analyzed together with the first `overlap`
+characters of the next one, so a hit that starts near the end of a shard is
+complete and its entities keep their right-hand context. Hits are kept by
+the shard they start in. Offsets are into the whole report, and each hit is
+found once. The shards' hits and malware evidence are merged like
+incremental.py merges chunks, and the VirusTotal lookups run once, in the
+calling process.
+
+No Doc is longer than shard_size + overlap characters, so spaCy's
+max_length no longer limits the report size. cltest3 analyzes reports
+longer than ThreatIntelExtractor.MAX_DOC_CHARS this way, in-process. As with
+incremental.py, an entity whose label depends on text in another shard can
+differ from a parse of the whole report. The result cache is bypassed.
+"""
+from typing import Any, Dict, Iterator, List, Tuple
+
+from analysis import ReportHits
+from batch import map_batches
+from incremental import Chunk, chunk_results, merge_chunk, sentence_cut
+from malware_candidates import Evidence
+from stream_scan import DEFAULT_OVERLAP
+
+DEFAULT_SHARD_SIZE = 100_000  # characters
+
+# (shard text plus overlap, report offset of its first character, characters it owns)
+Shard = Tuple[str, int, int]
+
+
+def shard_bounds(text: str, shard_size: int = DEFAULT_SHARD_SIZE, overlap: int = DEFAULT_OVERLAP) -> List[int]:
+    """Start offsets of the shards, each at the start of a sentence or line where there is one."""
+    starts = [0]
+    while len(text) - starts[-1] > shard_size:
+        limit = starts[-1] + shard_size
+        cut = sentence_cut(text, limit, min(overlap, shard_size // 2))
+        starts.append(cut if cut > starts[-1] else limit)
+    return starts
+
+
+def iter_shards(text: str, shard_size: int = DEFAULT_SHARD_SIZE, overlap: int = DEFAULT_OVERLAP) -> Iterator[Shard]:
+    starts = shard_bounds(text, shard_size, overlap)
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        yield text[start:end + overlap], start, end - start
+
+
+def shard_hits(extractor, shard: Shard) -> Tuple[Chunk, Evidence]:
+    """The hits starting in the part of the shard it owns, and its malware evidence."""
+    window, offset, length = shard
+    doc = None
+    if extractor.nlp_stages:
+        with extractor.profiler.stage('nlp'):
+            doc = extractor.nlp(window)
+    hits = extractor.find_hits(window, doc, offset)
+    end = offset + length
+    scored = []
+    if extractor.ttp_scorer and 'ttps' in extractor.stages:
+        with extractor.profiler.stage('ttps'):
+            scored = extractor.ttp_scorer.candidates(window, doc, endpos=length, offset=offset)
+    chunk = Chunk(offset, end, *([hit for hit in group if hit.start < end]
+                                 for group in (hits.iocs, hits.keywords, hits.entities, hits.proposed)), scored)
+    evidence = Evidence()
+    if 'malware' in extractor.stages:
+        with extractor.profiler.stage('malware'):
+            evidence = extractor.malware_ranker.collect(window, doc, [hit.name for hit in chunk.proposed],
+                                                        endpos=length)
+    return chunk, evidence
+
+
+def iter_shard_hits(extractor, text: str, n_process: int = 1, shard_size: int = DEFAULT_SHARD_SIZE,
+                    overlap: int = DEFAULT_OVERLAP) -> Iterator[Tuple[Chunk, Evidence]]:
+    """shard_hits() for every shard, in order.
+
+    With n_process > 1 the shards are analyzed by worker processes that share
+    the extractor's loaded model (ThreatIntelExtractor.worker_pool_setup()).
+    """
+    shards = iter_shards(text, shard_size, overlap)
+    if n_process == 1:
+        return (shard_hits(extractor, shard) for shard in shards)
+    context, initializer, initargs = extractor.worker_pool_setup()
+    return map_batches(_shard_hits, shards, 1, n_process, initializer, initargs, mp_context=context)
+
+
+def find_hits_sharded(extractor, text: str, n_process: int = 1, shard_size: int = DEFAULT_SHARD_SIZE,
+                      overlap: int = DEFAULT_OVERLAP) -> Tuple[ReportHits, Evidence]:
+    """Every positioned hit, as extractor.find_hits(text) finds them, and the malware evidence."""
+    hits = ReportHits([], [], [], [])
+    evidence = Evidence()
+    for chunk, chunk_evidence in iter_shard_hits(extractor, text, n_process, shard_size, overlap):
+        for group, found in zip(hits, (chunk.iocs, chunk.keywords, chunk.entities, chunk.proposed)):
+            group.extend(found)
+        evidence.update(chunk_evidence)
+    return hits, evidence
+
+
+def analyze_sharded(extractor, text: str, n_process: int = 1, shard_size: int = DEFAULT_SHARD_SIZE,
+                    overlap: int = DEFAULT_OVERLAP, lookup: bool = True) -> Dict[str, Any]:
+    """Results of extractor.process_report(text), computed shard by shard."""
+    iocs, keywords, entities, scored = {}, {}, {}, []
+    evidence = Evidence()
+    for chunk, chunk_evidence in iter_shard_hits(extractor, text, n_process, shard_size, overlap):
+        merge_chunk(chunk, iocs, keywords, entities, scored)
+        evidence.update(chunk_evidence)
+    return chunk_results(extractor, iocs.values(), keywords.values(), entities.values(), evidence, {}, lookup,
+                         scored)
+
+
+def _shard_hits(shards: List[Shard]) -> List[Tuple[Chunk, Evidence]]:
+    import cltest3
+    return [shard_hits(cltest3._worker_extractor, shard) for shard in shards]
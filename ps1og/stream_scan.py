@@ -0,0 +1,64 @@
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional
+
+# Carried-over text between chunks; must exceed the longest IoC or keyword
+# match so anything that starts before a cut is complete when it is emitted.
+DEFAULT_OVERLAP = 1024
+
+
+class StreamMatch(NamedTuple):
+    stage: str
+    match: NamedTuple  # IocMatch / KeywordMatch with offsets into the whole stream
+
+
+def _cut_point(buffer: str, limit: int) -> int:
+    """Last position <= limit that follows whitespace, so no token is split."""
+    for i in range(limit, 0, -1):
+        if buffer[i - 1].isspace():
+            return i
+    return limit
+
+
+def scan_chunks(chunks: Iterable[str], scanners: Dict[str, Callable], overlap: int = DEFAULT_OVERLAP,
+                base_offset: int = 0) -> Iterator[StreamMatch]:
+    """Run every scanner over a stream of text chunks as if over their concatenation.
+
+    scanners map a stage name to a callable (text, pos, endpos) -> iterable of
+    matches with start/end fields (ioc_scanner.scan_iocs, KeywordMatcher.finditer).
+    Only the current chunk plus a whitespace-aligned tail of `overlap`
+    characters is held in memory; matches spanning chunk boundaries are found
+    once, and offsets are relative to the start of the stream.
+    """
+    buffer = ''
+    offset = base_offset  # stream offset of buffer[0]
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) <= 2 * overlap:
+            continue
+        cut = _cut_point(buffer, len(buffer) - overlap)
+        yield from _emit(buffer, scanners, offset, cut)
+        buffer = buffer[cut:]
+        offset += cut
+    if buffer:
+        yield from _emit(buffer, scanners, offset, None)
+
+
+def _emit(buffer: str, scanners: Dict[str, Callable], offset: int,
+          cut: Optional[int]) -> Iterator[StreamMatch]:
+    """Scan buffer and emit matches starting before cut (all of them when cut is None)."""
+    results = []
+    for stage, scan in scanners.items():
+        for match in scan(buffer, 0, len(buffer)):
+            if cut is not None and match.start >= cut:
+                continue
+            results.append(StreamMatch(stage, match._replace(start=match.start + offset,
+                                                              end=match.end + offset)))
+    results.sort(key=lambda item: item.match.start)
+    yield from results
+
+
+def collect(matches: Iterable[StreamMatch]) -> Dict[str, list]:
+    """Split a scan_chunks result by stage."""
+    by_stage: Dict[str, list] = {}
+    for stage, match in matches:
+        by_stage.setdefault(stage, []).append(match)
+    return by_stage
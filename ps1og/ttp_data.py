@@ -1,18 +1,37 @@
-# from mitreattackdata import MitreAttackData
-from mitreattack.stix20 import MitreAttackData
-# Initialize the MitreAttackData object
-attack_data = MitreAttackData("ps1/enterprise-attack.json")
+# Compiled, memory-mapped ATT&CK index (replaces parsing the full bundle with MitreAttackData)
+# Rebuild offline with: python attack_index.py build enterprise-attack.json
+# Loaded on first use; without the index every list below is empty.
+import sys
+from functools import lru_cache
+
+from attack_index import try_load_index
+
+
+@lru_cache(maxsize=None)
+def attack_data():
+    index = try_load_index()
+    if index is None:
+        print('ATT&CK index not built (python attack_index.py build enterprise-attack.json); '
+              'no techniques, groups or tactics', file=sys.stderr)
+    return index
 
 
 # Retrieve techniques and their associated tactics
-techniques = attack_data.get_techniques()
-# print(techniques)
+def techniques():
+    return list(attack_data().techniques()) if attack_data() else []
+
+
+def groups():
+    return list(attack_data().groups()) if attack_data() else []
+
 
+def tactics():
+    return list(attack_data().tactics()) if attack_data() else []
 
-groups = attack_data.get_groups()
-# print(groups)
 
-tactics = attack_data.get_tactics()
-print(tactics)
+if __name__ == '__main__':
+    # print(techniques())
+    # print(groups())
+    print(tactics())
 
-# https://mitreattack-python.readthedocs.io/en/latest/mitre_attack_data/mitre_attack_data.html#mitreattackdata
\ No newline at end of file
+# https://mitreattack-python.readthedocs.io/en/latest/mitre_attack_data/mitre_attack_data.html#mitreattackdata
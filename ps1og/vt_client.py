@@ -0,0 +1,256 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+VT_BASE_URL = "https://www.virustotal.com/api/v3"
+
+# (requests per second, burst) for the VirusTotal API quota tiers.
+# The public API allows 4 lookups/minute; premium quotas are per contract,
+# the values below are a conservative default that callers can override.
+QUOTA_TIERS = {
+    'public': (4 / 60, 4),
+    'premium': (1000 / 60, 50),
+    'unlimited': (None, None),
+}
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float]):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        if self.rate is None:
+            return
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server answered 429."""
+        if self.rate is None:
+            return
+        with self.lock:
+            self._refill()
+            self.tokens = 0
+
+
+class ResponseCache:
+    """SQLite-backed cache of API responses with TTL and negative (404) entries."""
+
+    def __init__(self, path: str, ttl: float = DEFAULT_TTL, negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ':memory:':
+            self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses '
+            '(key TEXT PRIMARY KEY, status INTEGER, body TEXT, expires REAL)'
+        )
+        self.conn.commit()
+
+    def get(self, key: str):
+        """Return (hit, body); body is None for a cached 404."""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT status, body, expires FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or row[2] < time.time():
+            return False, None
+        status, body, _ = row
+        return True, (json.loads(body) if status == 200 else None)
+
+    def put(self, key: str, status: int, body: Optional[dict]):
+        ttl = self.ttl if status == 200 else self.negative_ttl
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)',
+                (key, status, json.dumps(body) if body is not None else None, time.time() + ttl)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class VirusTotalClient:
+    """Pooled, rate-limited, cached and coalescing VirusTotal API client.
+
+    Lookups can be fanned out with file_reports()/searches(); duplicate names
+    share one in-flight request and answers (including 404s) are cached on disk.
+    Without an API key every lookup answers None at once: VirusTotal would
+    refuse it anyway, after the public tier's rate limit.
+    """
+
+    def __init__(self, api_key: Optional[str], base_url: str = VT_BASE_URL, tier: str = 'public',
+                 cache_path: Optional[str] = None, ttl: float = DEFAULT_TTL,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL, max_workers: int = 8,
+                 timeout: float = 10, max_retries: int = 3):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['x-apikey'] = api_key
+
+        self.bucket = TokenBucket(*QUOTA_TIERS[tier])
+        if cache_path is None:
+            cache_path = os.getenv('VT_CACHE_PATH', 'vt_cache.sqlite3')
+        self.cache = ResponseCache(cache_path, ttl, negative_ttl)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.inflight: Dict[str, Future] = {}
+        self.inflight_lock = threading.Lock()
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'errors': 0, 'skipped': 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, stat: str):
+        # Updated from the pool threads
+        with self.stats_lock:
+            self.stats[stat] += 1
+
+    def _fetch(self, path: str) -> Optional[dict]:
+        url = f'{self.base_url}/{path}'
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            self._count('requests')
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except requests.exceptions.RequestException:
+                self._count('errors')
+                return None
+            if response.status_code == 200:
+                try:
+                    body = response.json()
+                except ValueError:  # not JSON, e.g. a proxy's error page
+                    self._count('errors')
+                    return None
+                self.cache.put(path, 200, body)
+                return body
+            if response.status_code == 404:
+                self.cache.put(path, 404, None)
+                return None
+            if response.status_code == 429 and attempt < self.max_retries:
+                self.bucket.drain()
+                time.sleep(float(response.headers.get('Retry-After', 2 ** attempt)))
+                continue
+            # Quota exhausted, auth failures and server errors are not cached
+            self._count('errors')
+            return None
+        return None
+
+    def _done(self, path: str, future: Future):
+        with self.inflight_lock:
+            self.inflight.pop(path, None)
+
+    def submit(self, path: str) -> Future:
+        """Schedule a GET of path, reusing the cache or an identical in-flight request."""
+        if not self.api_key:
+            self._count('skipped')
+            return _resolved(None)
+        hit, body = self.cache.get(path)
+        if hit:
+            self._count('cache_hits')
+            return _resolved(body)
+        with self.inflight_lock:
+            future = self.inflight.get(path)
+            if future is not None:
+                self._count('coalesced')
+                return future
+            future = self.executor.submit(self._fetch, path)
+            self.inflight[path] = future
+        future.add_done_callback(lambda f: self._done(path, f))
+        return future
+
+    def get(self, path: str) -> Optional[dict]:
+        return self.submit(path).result()
+
+    def file_report(self, name: str) -> Optional[dict]:
+        """GET /files/{name}; None when VirusTotal has no such file."""
+        return self.get(f'files/{name}')
+
+    def search(self, query: str) -> Optional[dict]:
+        """GET /search?query={query}."""
+        return self.get(f'search?query={requests.utils.quote(query)}')
+
+    def file_reports(self, names: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Look up many names concurrently; duplicates are requested once."""
+        futures = {name: self.submit(f'files/{name}') for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def searches(self, queries: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Run many searches concurrently; duplicates are requested once."""
+        futures = {query: self.submit(f'search?query={requests.utils.quote(query)}') for query in queries}
+        return {query: future.result() for query, future in futures.items()}
+
+    async def searches_async(self, queries: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """searches() for asyncio code: the requests run on the client's threads while the caller awaits."""
+        futures = {query: asyncio.wrap_future(self.submit(f'search?query={requests.utils.quote(query)}'))
+                   for query in queries}
+        return {query: await future for query, future in futures.items()}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+        self.cache.close()
+
+
+def _resolved(body: Optional[dict]) -> Future:
+    future = Future()
+    future.set_result(body)
+    return future
+
+
+_shared_clients: Dict[int, VirusTotalClient] = {}
+
+
+def shared_client() -> VirusTotalClient:
+    """Per-process client configured from VIRUSTOTAL_API_KEY, VT_BASE_URL, VT_TIER and VT_CACHE_PATH.
+
+    Created lazily so worker processes forked by process_reports get their own
+    session and thread pool instead of inheriting the parent's.
+    """
+    pid = os.getpid()
+    client = _shared_clients.get(pid)
+    if client is None:
+        _shared_clients.clear()
+        client = VirusTotalClient(
+            os.getenv('VIRUSTOTAL_API_KEY'),
+            base_url=os.getenv('VT_BASE_URL', VT_BASE_URL),
+            tier=os.getenv('VT_TIER', 'public'),
+        )
+        _shared_clients[pid] = client
+    return client